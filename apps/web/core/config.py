@@ -28,6 +28,16 @@ class WebConfig(LabConfig):
         description="Secret key for session signing"
     )
 
+    # Resources shared by all cached labs (see LabCache)
+    lab_memory_budget_mb: int = Field(
+        default=0, ge=0,
+        description="DuckDB memory in MiB divided across the open labs of a node (0 = no budget)"
+    )
+    lab_threads_budget: int = Field(
+        default=0, ge=0,
+        description="DuckDB threads divided across the open labs of a node (0 = no budget)"
+    )
+
     def ensure_directories(self, include_subdirs: bool = False):
         """
         SaaS-specific directory ensuring.
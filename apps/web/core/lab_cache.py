@@ -9,6 +9,7 @@ from arbolab.config import DEFAULT_CONFIG_FILENAME
 from arbolab.core.security import LabRole
 from arbolab.lab import Lab
 
+from apps.web.core.config import load_web_config
 from apps.web.core.paths import ensure_workspace_paths, resolve_workspace_paths
 
 
@@ -20,10 +21,36 @@ class _LabEntry:
 
 
 class LabCache:
-    def __init__(self, max_size: int = 8, ttl_seconds: int = 900) -> None:
+    """
+    Open labs per (workspace, role), evicted by TTL, LRU and config changes.
+
+    VIEWER labs are opened read-only, unless the ADMIN lab of their workspace is
+    already open: then they are served from it (`Lab.viewer`) and take read-only
+    cursors from its DuckDB instance, since DuckDB forbids opening the file a
+    second time next to a writer in one process. For the same reason opening the
+    ADMIN lab evicts a read-only viewer, and evicting the ADMIN lab evicts the
+    viewer it serves. Only ADMIN labs count towards `max_size`; the budget shares go
+    to every lab with its own DuckDB instance, read-only viewers included.
+
+    `memory_budget_mb` and `threads_budget` are divided evenly across the open labs
+    and cap the DuckDB limits configured per workspace, so one tenant's analytics
+    cannot take the memory or CPUs of the whole node. Shares are recomputed
+    only when the set of open ADMIN labs changes, not on every cache hit.
+    """
+    def __init__(
+        self,
+        max_size: int = 8,
+        ttl_seconds: int = 900,
+        memory_budget_mb: int = 0,
+        threads_budget: int = 0,
+    ) -> None:
         self._max_size = max_size
         self._ttl = timedelta(seconds=ttl_seconds)
+        self._memory_budget_mb = memory_budget_mb
+        self._threads_budget = threads_budget
         self._entries: dict[tuple[UUID, LabRole], _LabEntry] = {}
+        # ADMIN labs the current budget shares were applied to
+        self._budgeted: set[Lab] = set()
         self._lock = Lock()
 
     def get(self, workspace_id: UUID, role: LabRole) -> Lab:
@@ -32,24 +59,43 @@ class LabCache:
 
         with self._lock:
             self._evict_expired(now)
-            entry = self._entries.get(key)
-            if entry and not self._config_changed(entry, workspace_id):
-                entry.last_used = now
-                return entry.lab
+            lab = self._get(key, now)
+            self._evict_lru_if_needed()
+            self._rebalance()
+            return lab
 
-            if entry:
-                self._evict_key(key)
+    def _get(self, key: tuple[UUID, LabRole], now: datetime) -> Lab:
+        workspace_id, role = key
+        admin_key = (workspace_id, LabRole.ADMIN)
+        admin = None
+        if role == LabRole.VIEWER and admin_key in self._entries:
+            # Refreshes the ADMIN lab first; if it is reopened, its viewer is evicted with it
+            admin = self._get(admin_key, now)
+
+        entry = self._entries.get(key)
+        if entry and not self._config_changed(entry, workspace_id):
+            entry.last_used = now
+            return entry.lab
+
+        if entry:
+            self._evict_key(key)
+        if role == LabRole.ADMIN:
+            # A read-only viewer holds its own connection to the file
+            self._evict_key((workspace_id, LabRole.VIEWER))
 
+        if admin is not None:
+            lab, config_mtime = admin.viewer(), self._entries[admin_key].config_mtime
+        else:
             lab, config_mtime = self._create_lab(workspace_id, role)
-            self._entries[key] = _LabEntry(lab=lab, last_used=now, config_mtime=config_mtime)
-            self._evict_lru_if_needed()
-            return lab
+        self._entries[key] = _LabEntry(lab=lab, last_used=now, config_mtime=config_mtime)
+        return lab
 
     def invalidate(self, workspace_id: UUID) -> None:
         with self._lock:
             keys = [key for key in self._entries if key[0] == workspace_id]
             for key in keys:
                 self._evict_key(key)
+            self._rebalance()
 
     def _create_lab(self, workspace_id: UUID, role: LabRole) -> tuple[Lab, float | None]:
         paths = resolve_workspace_paths(workspace_id)
@@ -64,6 +110,22 @@ class LabCache:
         config_mtime = config_path.stat().st_mtime if config_path.exists() else None
         return lab, config_mtime
 
+    def _rebalance(self) -> None:
+        """Divides the budgets evenly across the open labs if they changed since the last call."""
+        if not (self._memory_budget_mb or self._threads_budget):
+            return
+        owners = {entry.lab for entry in self._entries.values() if not entry.lab.database.is_reader}
+        if owners == self._budgeted:
+            return
+        self._budgeted = owners
+        if not owners:
+            return
+        count = len(owners)
+        memory_mb = max(1, self._memory_budget_mb // count) if self._memory_budget_mb else 0
+        threads = max(1, self._threads_budget // count) if self._threads_budget else 0
+        for lab in owners:
+            lab.database.set_budget(memory_limit_mb=memory_mb, threads=threads)
+
     def _evict_expired(self, now: datetime) -> None:
         expired_keys = [
             key for key, entry in self._entries.items()
@@ -73,8 +135,11 @@ class LabCache:
             self._evict_key(key)
 
     def _evict_lru_if_needed(self) -> None:
-        while len(self._entries) > self._max_size:
-            oldest_key = min(self._entries, key=lambda k: self._entries[k].last_used)
+        while True:
+            admins = [key for key in self._entries if key[1] == LabRole.ADMIN]
+            if len(admins) <= self._max_size:
+                return
+            oldest_key = min(admins, key=lambda k: self._entries[k].last_used)
             self._evict_key(oldest_key)
 
     def _config_changed(self, entry: _LabEntry, workspace_id: UUID) -> bool:
@@ -88,6 +153,9 @@ class LabCache:
         return current_mtime > entry.config_mtime
 
     def _evict_key(self, key: tuple[UUID, LabRole]) -> None:
+        if key[1] == LabRole.ADMIN:
+            # The viewer takes its cursors from the ADMIN lab's database
+            self._evict_key((key[0], LabRole.VIEWER))
         entry = self._entries.pop(key, None)
         if not entry:
             return
@@ -99,7 +167,8 @@ class LabCache:
             pass
 
 
-_LAB_CACHE = LabCache()
+_config = load_web_config()
+_LAB_CACHE = LabCache(memory_budget_mb=_config.lab_memory_budget_mb, threads_budget=_config.lab_threads_budget)
 
 
 def get_cached_lab(workspace_id: UUID, role: LabRole) -> Lab:
@@ -185,6 +185,7 @@ async def sidebar_left(
 
 # Register Routers
 app.include_router(api.router)
+app.include_router(api.data_router)
 app.include_router(workspaces_router.router)
 app.include_router(explorer_router.router)
 app.include_router(settings_router.router)
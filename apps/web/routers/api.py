@@ -1,10 +1,15 @@
-from typing import Any
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from typing import Any, Literal
 from uuid import UUID
 
 from arbolab.core.security import LabRole
+from arbolab.database import NativeCursor
 from arbolab.lab import Lab
+from arbolab.models.core import DataVariant
+from arbolab.services.variant_reader import VariantReader, arrow_ipc_chunks
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlmodel import Session as SaasSession
 from sqlmodel import select
 
@@ -21,6 +26,14 @@ from apps.web.models.auth import UserWorkspaceAssociation, Workspace
 from apps.web.models.user import User
 
 router = APIRouter(prefix="/api/entities", tags=["entities"])
+data_router = APIRouter(prefix="/api/data", tags=["data"])
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# JSON payloads are for small previews only (see specs/api.md 6.5)
+MAX_JSON_POINTS = 5_000
+MAX_PLOT_WIDTH = 10_000
+# Rows per Arrow record batch; bounds the memory one streamed response buffers
+MAX_ARROW_BATCH_ROWS = 100_000
 
 # --- Dependency Injection for Multi-Tenancy ---
 
@@ -162,10 +175,17 @@ def ensure_admin(lab: Lab):
 
 @router.get("/recipes/export/json")
 async def api_export_recipe(lab: Lab = Depends(get_lab)):
-    """Downloads the current recipe JSON file."""
-    recipe_path = lab.layout.recipe_path("current.json")
-    if not recipe_path.exists():
+    """Downloads the current recipe JSON file (materialized from the recipe journal)."""
+    if not lab.recipe_journal.exists():
         raise HTTPException(status_code=404, detail="Recipe file not found")
+    if lab.role != LabRole.ADMIN:
+        # Read-only access must not write current.json into the workspace
+        return Response(
+            content=lab.recipe_journal.load().model_dump_json(indent=2),
+            media_type="application/json",
+            headers={"Content-Disposition": 'attachment; filename="current.json"'},
+        )
+    recipe_path = lab.recipe_journal.materialize()
     return FileResponse(
         path=recipe_path,
         media_type="application/json",
@@ -238,3 +258,130 @@ async def api_delete_entity(entity_type: str, entity_id: int, lab: Lab = Depends
             return {"status": "deleted"}
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
+
+
+# --- Variant data (Arrow / capped JSON) ---
+
+def _load_variant(lab: Lab, variant_id: int) -> DataVariant:
+    with lab.database.session() as session:
+        variant = session.get(DataVariant, variant_id)
+        if not variant:
+            raise HTTPException(status_code=404, detail="Variant not found")
+        session.expunge(variant)
+        return variant
+
+def _time_range(start: datetime | None, end: datetime | None) -> tuple[datetime | None, datetime | None]:
+    # Variant timestamps are naive UTC
+    def naive(value: datetime | None) -> datetime | None:
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(UTC).replace(tzinfo=None)
+    return naive(start), naive(end)
+
+def _columns(columns: str | None) -> list[str] | None:
+    return [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+
+def _stream_and_close(chunks: Iterator[bytes], con: NativeCursor) -> Iterator[bytes]:
+    try:
+        yield from chunks
+    finally:
+        con.close()
+
+@data_router.get("/variants/{variant_id}/arrow")
+def api_variant_arrow(
+    variant_id: int,
+    columns: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    batch_size: int = 100_000,
+    lab: Lab = Depends(get_lab),
+):
+    """
+    Streams a variant slice as an Arrow IPC stream, batch by batch from a DuckDB
+    record batch reader (no intermediate Python objects). Batches hold at most
+    MAX_ARROW_BATCH_ROWS rows. The cursor is held until the client has read the
+    stream, so it comes from the streaming pool of the workspace database.
+    """
+    variant = _load_variant(lab, variant_id)
+    con = lab.database.get_native_con(streaming=True)
+    try:
+        reader = VariantReader(lab.store, con).record_batches(
+            variant, _columns(columns), _time_range(start, end),
+            batch_size=min(max(1, batch_size), MAX_ARROW_BATCH_ROWS),
+        )
+    except ValueError as e:
+        con.close()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception:
+        con.close()
+        raise
+    return StreamingResponse(
+        _stream_and_close(arrow_ipc_chunks(reader), con),
+        media_type=ARROW_STREAM_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename=variant-{variant_id}.arrows"},
+    )
+
+@data_router.get("/variants/{variant_id}")
+def api_variant_json(
+    variant_id: int,
+    columns: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    max_points: int = 1_000,
+    lab: Lab = Depends(get_lab),
+):
+    """
+    JSON fallback for small previews: at most `max_points` (capped at MAX_JSON_POINTS)
+    rows, downsampled at an even stride when the slice is larger.
+    """
+    variant = _load_variant(lab, variant_id)
+    con = lab.database.get_native_con()
+    try:
+        df, downsampled = VariantReader(lab.store, con).sample(
+            variant, _columns(columns), _time_range(start, end),
+            max_points=min(max(1, max_points), MAX_JSON_POINTS),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    finally:
+        con.close()
+    return {
+        "variant_id": variant_id,
+        "time_column": variant.time_column,
+        "columns": df.columns,
+        "downsampled": downsampled,
+        "data": df.to_dict(as_series=False),
+    }
+
+@data_router.get("/variants/{variant_id}/downsampled")
+def api_variant_downsampled(
+    variant_id: int,
+    width: int = 1_000,
+    columns: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    method: Literal["minmax", "lttb"] = "minmax",
+    lab: Lab = Depends(get_lab),
+):
+    """
+    Plot data: every numeric channel reduced to a few points per pixel of a plot
+    `width` pixels wide (min-max per bucket or LTTB), cached per (variant, range, width).
+    """
+    variant = _load_variant(lab, variant_id)
+    width = min(max(1, width), MAX_PLOT_WIDTH)
+    try:
+        channels = lab.downsampler.downsample(
+            variant, _columns(columns), _time_range(start, end), width=width, method=method,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    return {
+        "variant_id": variant_id,
+        "time_column": variant.time_column,
+        "width": width,
+        "method": method,
+        "channels": {
+            name: {"time": df[variant.time_column].to_list(), "values": df[name].to_list()}
+            for name, df in channels.items()
+        },
+    }
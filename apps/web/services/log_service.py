@@ -2,11 +2,11 @@
 
 from __future__ import annotations
 
-import json
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Literal
 
+from arbolab.core.recipes.journal import RecipeJournal
 from pydantic import BaseModel, Field
 
 from apps.web.core.log_config import log_flags
@@ -42,33 +42,31 @@ class LogService:
         workspace_root: Path,
         since: datetime | None = None
     ) -> list[LogEntry]:
-        """Read recent recipe steps from the workspace recipe file."""
+        """Read recent recipe steps from the workspace recipe journal."""
         if not log_flags.LOG_RECIPE_ENABLED:
             return []
         
-        recipe_path = workspace_root / "recipes" / "current.json"
-        print(f"[LogService] Looking for recipe at: {recipe_path}")
-        print(f"[LogService] Recipe file exists: {recipe_path.exists()}")
+        journal = RecipeJournal(workspace_root / "recipes")
         
-        if not recipe_path.exists():
+        if not journal.exists():
             # Return a placeholder log so user knows no recipes yet
             return [LogEntry(
                 level="info",
                 source="recipe",
                 action="info",
-                message=f"No recipe file yet at {recipe_path}"
+                message=f"No recipe file yet at {journal.journal_dir}"
             )]
         
+        # Only the tail of the journal is read; older segments are skipped entirely
         try:
-            with open(recipe_path, encoding="utf-8") as f:
-                data = json.load(f)
-                print(f"[LogService] Loaded recipe with {len(data.get('steps', []))} steps")
-        except (OSError, json.JSONDecodeError) as e:
+            start = max(0, journal.step_count - log_flags.LOG_MAX_ENTRIES)
+            steps = [step.model_dump(mode="json") for step in journal.iter_steps(start)]
+        except (OSError, ValueError) as e:
             print(f"[LogService] Error loading recipe: {e}")
             return []
         
         entries = []
-        for step in data.get("steps", []):
+        for step in steps:
             step_time = step.get("timestamp")
             if step_time:
                 if isinstance(step_time, str):
@@ -0,0 +1,102 @@
+"""
+Throughput benchmark: MetadataImporter on a large sensor_deployments.csv.
+
+Generates a metadata package with `--rows` sensor deployments (plus the parent
+project, experiments, things, units and sensors), validates it and imports it into a
+fresh workspace. It then measures an incremental re-import of the unchanged package,
+one after renaming 1% of the deployments, and a full (non-incremental) upsert.
+With `--batch-size` the resources are streamed in batches; the peak RSS of the
+process is reported to compare memory use.
+
+Usage:
+    python packages/arbolab/scripts/bench_metadata_import.py --rows 1000000
+    python packages/arbolab/scripts/bench_metadata_import.py --rows 1000000 --batch-size 100000
+"""
+import argparse
+import json
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+from arbolab.lab import Lab
+from arbolab.services.importer import MetadataImporter
+
+
+def _write_package(pkg_dir: Path, rows: int, parents: int) -> Path:
+    pkg_dir.mkdir(parents=True)
+    parent_ids = pl.int_range(1, parents + 1, eager=True)
+
+    pl.DataFrame({"id": [1], "name": ["Bench"]}).write_csv(pkg_dir / "projects.csv")
+    pl.DataFrame({
+        "id": parent_ids, "project_id": 1, "kind": "tree", "name": "Tree " + parent_ids.cast(pl.String),
+    }).write_csv(pkg_dir / "things.csv")
+    pl.DataFrame({
+        "id": parent_ids, "project_id": 1, "name": "Experiment " + parent_ids.cast(pl.String),
+        "start_time": "2026-01-01T00:00:00",
+    }).write_csv(pkg_dir / "experiments.csv")
+    pl.DataFrame({
+        "id": parent_ids, "project_id": 1, "thing_id": parent_ids, "name": "Unit " + parent_ids.cast(pl.String),
+    }).write_csv(pkg_dir / "experimental_units.csv")
+    pl.DataFrame({
+        "id": parent_ids, "project_id": 1, "sensor_model_id": 1, "name": "Sensor " + parent_ids.cast(pl.String),
+    }).write_csv(pkg_dir / "sensors.csv")
+
+    ids = pl.int_range(1, rows + 1, eager=True)
+    pl.DataFrame({
+        "id": ids,
+        "experiment_id": (ids % parents) + 1,
+        "experimental_unit_id": (ids % parents) + 1,
+        "sensor_id": (ids % parents) + 1,
+        "start_time": "2026-01-01T00:00:00",
+        "name": "Deployment " + ids.cast(pl.String),
+    }).write_csv(pkg_dir / "sensor_deployments.csv")
+
+    resources = ["projects", "things", "experiments", "experimental_units", "sensors", "sensor_deployments"]
+    package = {"name": "bench", "resources": [{"name": r, "path": f"{r}.csv"} for r in resources]}
+    package_path = pkg_dir / "datapackage.json"
+    package_path.write_text(json.dumps(package), encoding="utf-8")
+    return package_path
+
+
+def bench(rows: int, parents: int, batch_size: int | None = None) -> dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        package_path = _write_package(Path(tmp) / "metadata", rows, parents)
+        with Lab.open(workspace_root=Path(tmp) / "workspace") as lab:
+            importer = MetadataImporter(lab.database.engine, batch_size=batch_size)
+            start = time.perf_counter()
+            report = importer.validate_package(package_path)
+            results["validate"] = time.perf_counter() - start
+            if not report["valid"]:
+                raise RuntimeError("Generated package failed validation")
+            deployments_csv = package_path.parent / "sensor_deployments.csv"
+            for mode, expected in (("insert", rows), ("reimport", 0), ("resync", rows // 100), ("upsert", rows)):
+                if mode == "resync":
+                    pl.read_csv(deployments_csv).with_columns(
+                        pl.when(pl.col("id") % 100 == 0).then(pl.col("name") + " (moved)").otherwise(pl.col("name"))
+                    ).write_csv(deployments_csv)
+                start = time.perf_counter()
+                stats = importer.import_package(package_path, validate=False, incremental=mode != "upsert")
+                results[mode] = time.perf_counter() - start
+                if stats["sensor_deployments"].get("count", 0) != expected:
+                    raise RuntimeError(f"Import failed: {stats['sensor_deployments']}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    # DuckDB 0.10 indexes (incl. foreign keys) degrade with many duplicates per key,
+    # so the cost of a run depends on rows / parents as much as on rows.
+    parser.add_argument("--parents", type=int, default=10_000,
+                        help="Number of experiments/units/sensors the deployments refer to")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Stream resources in batches of this many rows")
+    args = parser.parse_args()
+
+    timings = bench(args.rows, args.parents, args.batch_size)
+    for mode, seconds in timings.items():
+        print(f"{mode:>8}: {seconds:8.2f} s  ({args.rows / seconds:10.0f} rows/s)")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:8.0f} MiB")
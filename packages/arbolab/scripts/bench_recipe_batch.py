@@ -0,0 +1,48 @@
+"""
+Throughput benchmark: per-step recipe execution vs. Lab.batch().
+
+Usage:
+    python packages/arbolab/scripts/bench_recipe_batch.py --steps 2000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from arbolab.lab import Lab
+
+
+def _define_sensors(lab: Lab, project_id: int, prefix: str, count: int) -> None:
+    for i in range(count):
+        lab.define_sensor(name=f"{prefix}-{i}", sensor_model_id=1, project_id=project_id)
+
+
+def bench(steps: int, batch_size: int) -> dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        with Lab.open(workspace_root=Path(tmp) / "per_step") as lab:
+            project = lab.define_project(name="Bench")
+            start = time.perf_counter()
+            _define_sensors(lab, project.id, "single", steps)
+            results["per_step"] = time.perf_counter() - start
+
+        with Lab.open(workspace_root=Path(tmp) / "batched") as lab:
+            project = lab.define_project(name="Bench")
+            start = time.perf_counter()
+            for offset in range(0, steps, batch_size):
+                with lab.batch():
+                    _define_sensors(lab, project.id, f"batch-{offset}", min(batch_size, steps - offset))
+            results["batched"] = time.perf_counter() - start
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    timings = bench(args.steps, args.batch_size)
+    for mode, seconds in timings.items():
+        print(f"{mode:>9}: {seconds:8.2f} s  ({args.steps / seconds:8.0f} steps/s)")
+    print(f"  speedup: {timings['per_step'] / timings['batched']:.1f}x")
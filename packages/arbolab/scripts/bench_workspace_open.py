@@ -0,0 +1,77 @@
+"""
+Startup benchmark: opening a workspace with and without the schema-version stamp.
+
+Without a stamp (as before it was introduced), every open runs `create_all` for the
+core schema, which inspects every table and sequence; with a matching stamp the
+DDL is skipped.
+
+Usage:
+    python packages/arbolab/scripts/bench_workspace_open.py --opens 20
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import duckdb
+from arbolab.database import SCHEMA_VERSION_KEY_PREFIX, WorkspaceDatabase
+from arbolab.lab import Lab
+
+
+def _drop_stamps(db_path: Path) -> None:
+    con = duckdb.connect(str(db_path))
+    try:
+        con.execute("DELETE FROM core_sys_metadata WHERE key LIKE ?", [f"{SCHEMA_VERSION_KEY_PREFIX}%"])
+    finally:
+        con.close()
+
+
+def _time_opens(open_once: Callable[[], None],
+                opens: int,
+                before: Callable[[], None] | None = None) -> list[float]:
+    timings = []
+    for _ in range(opens):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        open_once()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench(opens: int) -> dict[str, list[float]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "workspace"
+        with Lab.open(workspace_root=root) as lab:
+            db_path = lab.database.db_path
+
+        def connect() -> None:
+            database = WorkspaceDatabase(db_path)
+            database.connect()
+            database.close()
+
+        def open_lab() -> None:
+            Lab.open(workspace_root=root).close()
+
+        results["connect (create_all)"] = _time_opens(connect, opens, before=lambda: _drop_stamps(db_path))
+        results["connect (stamped)"] = _time_opens(connect, opens)
+        results["Lab.open (create_all)"] = _time_opens(open_lab, opens, before=lambda: _drop_stamps(db_path))
+        results["Lab.open (stamped)"] = _time_opens(open_lab, opens)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--opens", type=int, default=20)
+    args = parser.parse_args()
+
+    timings = bench(args.opens)
+    for mode, values in timings.items():
+        print(f"{mode:>22}: median {statistics.median(values) * 1000:8.1f} ms  (min {min(values) * 1000:8.1f} ms)")
+    for name in ("connect", "Lab.open"):
+        before = statistics.median(timings[f"{name} (create_all)"])
+        after = statistics.median(timings[f"{name} (stamped)"])
+        print(f"{name:>9} saving: {(before - after) * 1000:.1f} ms per open ({before / after:.1f}x)")
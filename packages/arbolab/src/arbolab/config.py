@@ -38,6 +38,29 @@ class LabConfig(BaseSettings):
     input_dir_name: str = "input"
     workspace_dir_name: str = "workspace"
 
+    # Workspace database (see WorkspaceDatabase)
+    db_pool_size: int = Field(default=8, ge=1, description="Cursors of the workspace DuckDB instance per pool (ORM and native)")
+    db_stream_pool_size: int = Field(default=2, ge=1, description="Native cursors for streamed responses, separate from db_pool_size")
+    db_pool_timeout: float = Field(default=30.0, gt=0, description="Seconds to wait for a free database cursor")
+    db_memory_limit_mb: int = Field(default=0, ge=0, description="Memory limit of the workspace DuckDB instance in MiB (0 = DuckDB default); larger operations spill to tmp/")
+    db_threads: int = Field(default=0, ge=0, description="Threads of the workspace DuckDB instance (0 = one per CPU)")
+    db_flush_log_every: int = Field(default=1, ge=0, description="Log a per-entity-type summary of every Nth flush (0 disables)")
+
+    # Recipe state snapshots (see RecipeSnapshots)
+    recipe_snapshot_interval: int = Field(default=1000, ge=0, description="Recipe steps between database snapshots (0 disables)")
+    recipe_snapshot_retention: int = Field(default=3, ge=1, description="Number of database snapshots to keep")
+
+    # Metadata import (see MetadataImporter)
+    metadata_read_workers: int = Field(default=0, ge=0, description="Threads parsing metadata CSVs concurrently (0 = one per CPU)")
+    metadata_batch_size: int = Field(default=0, ge=0, description="Rows per batch when streaming metadata CSVs (0 loads each resource at once)")
+
+    # Variant compaction (see VariantCompactor)
+    variant_compaction_target_mb: int = Field(default=128, ge=1, description="Size of the files small variant files are merged into")
+    variant_compaction_interval: int = Field(default=0, ge=0, description="Seconds between background variant compactions (0 disables)")
+
+    # Variant rollups (see VariantRollups)
+    variant_rollup_resolutions: list[str] = Field(default=["1s", "1m", "1h"], description="Resolutions of the min/max/mean/count rollups built for each variant")
+
     enabled_plugins: list[str] = Field(default_factory=list, description="Allow-list of enabled plugin entry points")
     
     # Plugin specific settings (namespaced)
@@ -1,12 +1,15 @@
 """
 Catalog Manager for seeding and updating default metadata entities.
 """
+import functools
 import json
 from pathlib import Path
+from typing import Any
 
 from arbolab.models.core import ObservedProperty, SensorModel, TreeSpecies, UnitOfMeasurement
 from arbolab.models.sys import SysMetadata
 from arbolab_logger import get_logger
+from sqlalchemy import Table, column, exists, insert, select, values
 from sqlalchemy.orm import Session
 
 logger = get_logger(__name__)
@@ -19,7 +22,7 @@ class CatalogManager:
     
     CATALOG_VERSION_KEY = "catalog_version"
 
-    def __init__(self):
+    def __init__(self) -> None:
         # Locate resource directory relative to this file
         # arbolab/core/catalog_manager.py -> arbolab/core/resources/catalog
         self.resource_root = Path(__file__).parent / "resources" / "catalog"
@@ -81,53 +84,51 @@ class CatalogManager:
             session.add(meta)
 
     def _sync_units(self, session: Session):
-        data = self._load_json("units_of_measurement.json")
-        for item in data:
-            # Upsert by 'unit'
-            # Note: DuckDB via SQLAlchemy doesn't support complex ON CONFLICT mostly,
-            # but for simple cases or standard 'merge' logic:
-            # We check existence by natural key 'unit'.
-            existing = session.query(UnitOfMeasurement).filter_by(unit=item["unit"]).first()
-            if existing:
-                # Update logic: we generally don't want to overwrite user modifications 
-                # unless we decide strict ownership. 
-                # Requirement: "Do not overwrite user-customized fields if they exist, but ensure the record exists."
-                # So if it exists, we skip or maybe update only missing fields?
-                # "Upsert rule: ...Ensure the record exists."
-                # Let's simple-check: IF exists, do nothing (to preserve user edits/IDs). IF missing, insert.
-                pass 
-            else:
-                 new_obj = UnitOfMeasurement(**item)
-                 session.add(new_obj)
-                 
+        # Upsert by natural key 'unit'.
+        # Requirement: "Do not overwrite user-customized fields if they exist, but ensure the record exists."
+        # So existing records (and their IDs) are kept, missing ones are inserted.
+        self._insert_missing(session, UnitOfMeasurement, "unit", self._load_json("units_of_measurement.json"))
+
     def _sync_observed_properties(self, session: Session):
-        data = self._load_json("observed_properties.json")
-        for item in data:
-            existing = session.query(ObservedProperty).filter_by(name=item["name"]).first()
-            if not existing:
-                 session.add(ObservedProperty(**item))
+        self._insert_missing(session, ObservedProperty, "name", self._load_json("observed_properties.json"))
 
     def _sync_sensor_models(self, session: Session):
-        data = self._load_json("sensor_models.json")
-        for item in data:
-            existing = session.query(SensorModel).filter_by(name=item["name"]).first()
-            if not existing:
-                 session.add(SensorModel(**item))
-                 
+        self._insert_missing(session, SensorModel, "name", self._load_json("sensor_models.json"))
+
     def _sync_tree_species(self, session: Session):
-        data = self._load_json("tree_species.json")
-        for item in data:
-            existing = session.query(TreeSpecies).filter_by(name=item["name"]).first()
-            if not existing:
-                 session.add(TreeSpecies(**item))
-
-    def _load_json(self, filename: str) -> list[dict]:
-        path = self.resource_root / filename
-        if not path.exists():
-            logger.warning(f"Resource {filename} missing at {path}")
-            return []
-        try:
-            return json.loads(path.read_text(encoding="utf-8"))
-        except Exception as e:
-             logger.error(f"Failed to parse {filename}: {e}")
-             return []
+        self._insert_missing(session, TreeSpecies, "name", self._load_json("tree_species.json"))
+
+    @staticmethod
+    def _insert_missing(session: Session, model_cls: type, key: str, items: list[dict[str, Any]]) -> None:
+        """
+        Inserts the catalog items whose natural `key` is not in the table yet, as a single
+        `INSERT ... SELECT ... WHERE NOT EXISTS` over the items.
+        """
+        if not items:
+            return
+        table: Table = model_cls.__table__  # type: ignore[attr-defined]
+        columns = sorted({c for item in items for c in item if c in table.c})
+        catalog = values(*(column(c, table.c[c].type) for c in columns), name="catalog").data(
+            [tuple(item.get(c) for c in columns) for item in items]
+        )
+        missing = select(*(catalog.c[c] for c in columns)).where(
+            ~exists().where(table.c[key] == catalog.c[key])
+        )
+        session.execute(insert(table).from_select(columns, missing))
+        logger.debug(f"Synced {len(items)} catalog {table.name}")
+
+    def _load_json(self, filename: str) -> list[dict[str, Any]]:
+        return list(_load_catalog_resource(self.resource_root / filename))
+
+
+@functools.cache
+def _load_catalog_resource(path: Path) -> tuple[dict[str, Any], ...]:
+    """Parsed catalog resource; read once per process (catalog files ship with the package)."""
+    if not path.exists():
+        logger.warning(f"Resource {path.name} missing at {path}")
+        return ()
+    try:
+        return tuple(json.loads(path.read_text(encoding="utf-8")))
+    except Exception as e:
+        logger.error(f"Failed to parse {path.name}: {e}")
+        return ()
@@ -1,17 +1,45 @@
-import json
 import uuid
+from collections.abc import Generator
+from contextlib import contextmanager
 from datetime import datetime
+from pathlib import Path
 from typing import Any
 
-from arbolab.core.recipes.registry import get_handler
+from arbolab.core.recipes.journal import JournalMark
+from arbolab.core.recipes.registry import get_handler, is_transactional
 from arbolab.core.recipes.schemas import Recipe, RecipeStep
 from arbolab.lab import Lab
+from arbolab.models.sys import SysMetadata
 from arbolab_logger import get_logger
+from sqlalchemy import text
+from sqlalchemy.orm import Session
 
 logger = get_logger(__name__)
 
+class RecipeBatch:
+    """Steps executed inside `Lab.batch()`; recorded with one journal append on commit."""
+
+    def __init__(self) -> None:
+        self.steps: list[RecipeStep] = []
+        self.results: list[Any] = []
+        self.last_step_id: str | None = None
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def add(self, step: RecipeStep, result: Any, record: bool = True) -> None:
+        """Registers an applied step; `record=False` applies it without journaling."""
+        if record:
+            self.steps.append(step)
+        self.results.append(result)
+        self.last_step_id = step.step_id
+
+
 class RecipeExecutor:
     """Executes RecipeSteps and manages the persistent recipe log."""
+
+    # core_sys_metadata key holding the id of the last step whose effects are committed
+    APPLIED_STEP_KEY = "recipe_applied_step"
     
     @staticmethod
     def apply(lab: Lab, step_type: str, params: dict[str, Any], author_id: str | None = None) -> Any:
@@ -29,58 +57,126 @@ class RecipeExecutor:
         
         # 2. Execute Handler
         handler = get_handler(step_type)
-        result = handler(lab, params, author_id)
-        
-        # 3. Append to Recipe log
-        RecipeExecutor._record_step(lab, step)
-        
+        active = RecipeExecutor.active_batch(lab)
+
+        if not is_transactional(step_type):
+            if active is not None:
+                raise ValueError(f"Step '{step_type}' cannot run inside a batch")
+            result = handler(lab, params, author_id)
+            # 3. Append to Recipe log
+            with RecipeExecutor.batch(lab) as batch:
+                batch.add(step, result)
+            return result
+
+        # 3. Database steps always run as a batch (of one, unless a batch is active),
+        # so the step, its journal entry and the applied-step marker are committed or
+        # discarded together.
+        with RecipeExecutor.batch(lab) as batch:
+            result = handler(lab, params, author_id)
+            batch.add(step, result)
         return result
 
     @staticmethod
-    def _record_step(lab: Lab, step: RecipeStep):
-        """Appends a step to the workspace recipe file."""
-        recipe_path = lab.layout.recipe_path("current.json")
-        recipe_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        recipe_data = {"steps": []}
-        if recipe_path.exists():
-            try:
-                with open(recipe_path, encoding="utf-8") as f:
-                    content = f.read().strip()
-                    if content:
-                        recipe_data = json.loads(content)
-            except Exception as e:
-                logger.error(f"Failed to read existing recipe: {e}")
-
-        # Ensure Lab initialization is at the top if it's a new recipe
-        # Actually, for MVP we just append. lab.open is recorded separately or implicitly?
-        # The user said: "lab.open ist ganz zentral und muss auch im recipe stehen (wenn möglich)"
-        # We can add a 'lab_open' step if the recipe is empty.
-        
-        if not recipe_data["steps"]:
-            # Implicitly record Lab.open
-            init_step = RecipeStep(
-                step_id=str(uuid.uuid4()),
-                step_type="open_lab",
-                params={
-                    "workspace_root": str(lab.layout.root),
-                    "role": str(lab.role)
-                },
-                timestamp=datetime.now()
+    def active_batch(lab: Lab) -> RecipeBatch | None:
+        """The batch open on the current thread, if any."""
+        return getattr(lab._batch_local, "batch", None)
+
+    @staticmethod
+    @contextmanager
+    def batch(lab: Lab) -> Generator[RecipeBatch, None, None]:
+        """
+        Runs all steps applied inside the block in one database transaction and
+        records them with a single journal append. On failure neither the database
+        nor the journal keeps any of the steps. Nested batches join the outer one.
+
+        The last step is stored as the applied-step marker in the same transaction,
+        so replaying the lab's own journal resumes right after it and an interrupted
+        replay resumes after its last committed batch.
+        """
+        active = RecipeExecutor.active_batch(lab)
+        if active is not None:
+            yield active
+            return
+
+        batch = RecipeBatch()
+        lab._batch_local.batch = batch
+        mark = None
+        try:
+            with lab.database.transaction() as session:
+                yield batch
+                if batch.last_step_id is not None:
+                    RecipeExecutor._mark_applied(session, batch.last_step_id)
+                # Journal first: a failed commit can still be undone in the journal,
+                # a failed append simply rolls back the transaction.
+                if batch.steps:
+                    mark = RecipeExecutor._record_steps(lab, batch.steps)
+        except BaseException:
+            if mark is not None:
+                logger.warning(f"Batch commit failed; discarding {len(batch)} journaled steps")
+                lab.recipe_journal.truncate(mark)
+            raise
+        finally:
+            lab._batch_local.batch = None
+
+        if batch.steps:
+            lab.recipe_snapshots.maybe_take(
+                lab.database, lab.recipe_journal.step_count - 1, batch.steps[-1].step_id
             )
-            recipe_data["steps"].append(init_step.model_dump(mode="json"))
 
-        recipe_data["steps"].append(step.model_dump(mode="json"))
-        recipe_data["updated_at"] = datetime.now().isoformat()
-        
-        with open(recipe_path, "w", encoding="utf-8") as f:
-            json.dump(recipe_data, f, indent=2)
-            
     @staticmethod
-    def load_recipe(lab: Lab) -> Recipe:
-        """Loads the current recipe for the lab."""
-        recipe_path = lab.layout.recipe_path("current.json")
-        if not recipe_path.exists():
+    def _mark_applied(session: Session, step_id: str) -> None:
+        """Stores the last applied step in the same transaction as its effects."""
+        session.execute(
+            text(
+                "INSERT INTO core_sys_metadata (key, value) VALUES (:key, :value) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+            ),
+            {"key": RecipeExecutor.APPLIED_STEP_KEY, "value": step_id},
+        )
+
+    @staticmethod
+    def applied_step_id(lab: Lab) -> str | None:
+        """The id of the last recipe step whose effects are committed in the database."""
+        with lab.database.session() as session:
+            meta = session.get(SysMetadata, RecipeExecutor.APPLIED_STEP_KEY)
+            return meta.value if meta else None
+
+    @staticmethod
+    def _record_steps(lab: Lab, steps: list[RecipeStep]) -> JournalMark:
+        """Appends steps to the workspace recipe journal."""
+        journal = lab.recipe_journal
+        steps = list(steps)
+
+        # lab.open is central and must be part of the recipe: record it implicitly
+        # as the first step of a new recipe, by the author of the step that starts it.
+        if journal.step_count == 0 and steps:
+            steps.insert(0, RecipeExecutor._open_lab_step(lab, steps[0].author_id))
+
+        return journal.append_many(steps)
+
+    @staticmethod
+    def _open_lab_step(lab: Lab, author_id: str | None) -> RecipeStep:
+        """Builds the implicit Lab.open step that heads every recipe."""
+        return RecipeStep(
+            step_id=str(uuid.uuid4()),
+            step_type="open_lab",
+            params={
+                "workspace_root": str(lab.layout.root),
+                "role": str(lab.role)
+            },
+            author_id=author_id,
+            timestamp=datetime.now()
+        )
+
+    @staticmethod
+    def load_recipe(lab: Lab, recipe_path: Path | None = None) -> Recipe:
+        """
+        Loads the current recipe for the lab from its journal,
+        or a standalone recipe JSON file if `recipe_path` is given.
+        """
+        if recipe_path is not None:
+            with open(recipe_path, encoding="utf-8") as f:
+                return Recipe.model_validate_json(f.read())
+        if not lab.recipe_journal.exists():
             return Recipe()
-        with open(recipe_path, encoding="utf-8") as f:
-            return Recipe.model_validate_json(f.read())
+        return lab.recipe_journal.load()
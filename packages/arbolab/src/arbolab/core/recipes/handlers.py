@@ -67,8 +67,7 @@ def register_crud_handlers():
                         return existing
                 
                 obj = m.create(session, **params)
-                session.flush()
-                session.refresh(obj)  # Load auto-generated fields like ID
+                session.flush()  # Loads auto-generated fields like ID (eager defaults)
                 session.expunge(obj)  # Detach so it can be used outside session
                 return obj
 
@@ -92,7 +91,7 @@ def register_crud_handlers():
                         setattr(obj, key, value)
                 session.add(obj)
                 session.flush()
-                session.refresh(obj) # Ensure updated fields are reflected
+                session.refresh(obj) # Reload server-updated fields (e.g. updated_at)
                 session.expunge(obj) # Detach so it can be used outside session
                 return obj
 
@@ -118,13 +117,13 @@ def open_lab_handler(lab: Lab, params: dict[str, Any], author_id: str | None = N
     # but it's recorded for transparency.
     return lab
 
-@register_step("import_metadata")
+@register_step("import_metadata", transactional=False)
 def import_metadata_handler(lab: Lab, params: dict[str, Any], author_id: str | None = None):
     from pathlib import Path
     package_path = Path(params["package_path"])
-    return lab.import_metadata(package_path)
+    return lab.import_metadata(package_path, delete_removed=params.get("delete_removed", False))
 
-@register_step("modify_config")
+@register_step("modify_config", transactional=False)
 def modify_config_handler(lab: Lab, params: dict[str, Any], author_id: str | None = None):
     from arbolab.config import update_config
     update_config(lab.layout.root, params)
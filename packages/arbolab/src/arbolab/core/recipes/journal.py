@@ -0,0 +1,421 @@
+"""
+Append-only journal backing the workspace recipe.
+
+The recipe used to live in a single `recipes/current.json` that was parsed and
+rewritten on every recorded step. The journal stores the same steps as JSON Lines
+segments so that recording a step is a single append:
+
+    recipes/journal/
+        manifest.json          compact header: recipe metadata, segment index, checkpoint
+        segment-000000.jsonl   one RecipeStep per line
+        segment-000001.jsonl   ...
+
+`current.json` is still produced on demand via `RecipeJournal.materialize()` and an
+existing single-file recipe is migrated into the journal the first time a step is
+appended. Reading never writes to the workspace: until then, reads are served from
+the legacy file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from threading import RLock
+from typing import Any
+
+from arbolab.core.recipes.schemas import Recipe, RecipeStep
+from arbolab_logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class JournalMark:
+    """Position in the journal right before an append; used to undo that append."""
+
+    segment: str
+    offset: int
+    step_count: int
+
+
+class RecipeJournal:
+    """Segmented JSON Lines store for the steps of the workspace recipe."""
+
+    JOURNAL_DIRNAME = "journal"
+    MANIFEST_NAME = "manifest.json"
+    LEGACY_RECIPE_NAME = "current.json"
+    FORMAT_VERSION = 1
+
+    def __init__(self,
+                 recipes_dir: Path,
+                 segment_size: int = 10_000,
+                 checkpoint_interval: int = 500):
+        """
+        Args:
+            recipes_dir: The workspace `recipes/` directory.
+            segment_size: Number of steps after which a new segment file is started.
+            checkpoint_interval: Number of appended steps after which the manifest is rewritten.
+        """
+        if segment_size < 1:
+            raise ValueError("segment_size must be positive")
+        self._recipes_dir = recipes_dir
+        self._dir = recipes_dir / self.JOURNAL_DIRNAME
+        self._segment_size = segment_size
+        self._checkpoint_interval = max(1, checkpoint_interval)
+        self._lock = RLock()
+
+        self._manifest: dict[str, Any] | None = None
+        self._legacy: Recipe | None = None  # Unmigrated single-file recipe (read-only view)
+        self._active_count = 0      # Steps in the active (last) segment
+        self._active_size = 0       # Byte size of the complete lines in the active segment
+        self._since_checkpoint = 0
+
+    # --- Paths ---
+
+    @property
+    def journal_dir(self) -> Path:
+        return self._dir
+
+    @property
+    def manifest_path(self) -> Path:
+        return self._dir / self.MANIFEST_NAME
+
+    @property
+    def legacy_path(self) -> Path:
+        return self._recipes_dir / self.LEGACY_RECIPE_NAME
+
+    def exists(self) -> bool:
+        """True if the journal (or a legacy single-file recipe to migrate) exists."""
+        return self.manifest_path.exists() or self.legacy_path.exists()
+
+    @property
+    def step_count(self) -> int:
+        """Number of recorded steps (as known to this instance)."""
+        with self._lock:
+            self._ensure_loaded()
+            assert self._manifest is not None
+            return int(self._manifest["step_count"])
+
+    # --- Writing ---
+
+    def append(self, step: RecipeStep) -> JournalMark:
+        """Appends a single step. See `append_many`."""
+        return self.append_many([step])
+
+    def append_many(self, steps: Sequence[RecipeStep]) -> JournalMark:
+        """
+        Appends steps to the active segment with a single write.
+
+        Returns:
+            The position before the write; pass it to `truncate` to undo the append.
+        """
+        with self._lock:
+            self._ensure_writable()
+            if self._active_changed_on_disk():
+                # Another writer appended since we last looked: pick up its steps
+                # instead of truncating them away below.
+                self._refresh()
+            manifest = self._manifest
+            assert manifest is not None
+
+            is_new = not self.manifest_path.exists()
+            if not manifest["segments"] or self._active_count >= self._segment_size:
+                self._start_segment()
+
+            segment = manifest["segments"][-1]
+            segment_path = self._dir / segment["name"]
+            mark = JournalMark(segment["name"], self._active_size, manifest["step_count"])
+            if not steps:
+                return mark
+
+            payload = "".join(f"{step.model_dump_json()}\n" for step in steps).encode("utf-8")
+            self._dir.mkdir(parents=True, exist_ok=True)
+            with open(segment_path, "ab") as f:
+                # Drop a torn trailing line left behind by an interrupted write
+                if f.tell() != self._active_size:
+                    f.truncate(self._active_size)
+                f.write(payload)
+
+            self._active_size += len(payload)
+            self._active_count += len(steps)
+            segment["step_count"] = self._active_count
+            manifest["step_count"] += len(steps)
+            manifest["updated_at"] = datetime.now().isoformat()
+
+            self._since_checkpoint += len(steps)
+            if is_new or self._since_checkpoint >= self._checkpoint_interval:
+                self.checkpoint()
+            return mark
+
+    def truncate(self, mark: JournalMark) -> None:
+        """Discards every step appended after `mark`."""
+        with self._lock:
+            self._ensure_writable()
+            manifest = self._manifest
+            assert manifest is not None
+
+            segment = manifest["segments"][-1] if manifest["segments"] else None
+            if segment is None or segment["name"] != mark.segment:
+                raise ValueError(f"Journal mark {mark} does not point into the active segment")
+
+            segment_path = self._dir / segment["name"]
+            if segment_path.exists():
+                with open(segment_path, "r+b") as f:
+                    f.truncate(mark.offset)
+
+            self._active_size = mark.offset
+            self._active_count = mark.step_count - segment["first_index"]
+            segment["step_count"] = self._active_count
+            manifest["step_count"] = mark.step_count
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Persists the manifest (atomically) with the current counts."""
+        with self._lock:
+            self._ensure_writable()
+            self._dir.mkdir(parents=True, exist_ok=True)
+            _write_atomic(self.manifest_path, json.dumps(self._manifest, indent=2))
+            self._since_checkpoint = 0
+
+    def _start_segment(self) -> None:
+        """Seals the active segment and opens a new, empty one."""
+        manifest = self._manifest
+        assert manifest is not None
+        index = len(manifest["segments"])
+        manifest["segments"].append({
+            "name": f"segment-{index:06d}.jsonl",
+            "first_index": manifest["step_count"],
+            "step_count": 0,
+        })
+        self._active_count = 0
+        self._active_size = 0
+        if index > 0:
+            logger.debug(f"Recipe journal rotated to segment {index}")
+            self.checkpoint()
+
+    # --- Reading ---
+
+    def iter_steps(self, start: int = 0) -> Iterator[RecipeStep]:
+        """
+        Yields recorded steps in order, beginning at index `start`.
+        Only the segments containing the requested range are read.
+        """
+        with self._lock:
+            self._refresh()
+            assert self._manifest is not None
+            legacy = self._legacy
+            segments = [dict(s) for s in self._manifest["segments"]]
+        if legacy is not None:
+            yield from legacy.steps[start:]
+        else:
+            yield from self._read_segments(segments, start)
+
+    def load(self) -> Recipe:
+        """Materializes the full recipe in memory."""
+        with self._lock:
+            self._refresh()
+            return self._build_recipe()
+
+    def _build_recipe(self) -> Recipe:
+        if self._legacy is not None:
+            return self._legacy.model_copy(deep=True)
+        manifest = self._manifest
+        assert manifest is not None
+        return Recipe(
+            version=manifest["recipe_version"],
+            created_at=manifest["created_at"],
+            updated_at=manifest["updated_at"],
+            metadata=manifest.get("metadata", {}),
+            steps=list(self._read_segments(manifest["segments"], 0)),
+        )
+
+    def _read_segments(self, segments: list[dict[str, Any]], start: int) -> Iterator[RecipeStep]:
+        for segment in segments:
+            first, count = segment["first_index"], segment["step_count"]
+            if first + count <= start or count == 0:
+                continue
+            skip = max(0, start - first)
+            with open(self._dir / segment["name"], encoding="utf-8") as f:
+                for line_no, line in enumerate(f):
+                    if line_no >= count:
+                        break
+                    if line_no < skip:
+                        continue
+                    yield RecipeStep.model_validate_json(line)
+
+    def materialize(self, path: Path | None = None) -> Path:
+        """
+        Writes the recipe as a single JSON document (the legacy `current.json` format).
+        The default target is reused as long as the journal still ends at the step it
+        was written from (same step count and last step id).
+        """
+        with self._lock:
+            self._refresh()
+            manifest = self._manifest
+            assert manifest is not None
+
+            target = path or self.legacy_path
+            if path is None and (self._legacy is not None or self._is_materialized()):
+                return target
+
+            recipe = self._build_recipe()
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(target, recipe.model_dump_json(indent=2))
+            if path is None:
+                manifest["materialized_step_count"] = manifest["step_count"]
+                manifest["materialized_step_id"] = self._last_step_id()
+                if self.manifest_path.exists():
+                    self.checkpoint()
+            logger.debug(f"Materialized recipe ({manifest['step_count']} steps) to {target}")
+            return target
+
+    def _is_materialized(self) -> bool:
+        """True if `current.json` was written from the current end of the journal."""
+        manifest = self._manifest
+        assert manifest is not None
+        return (
+            manifest.get("materialized_step_count") == manifest["step_count"]
+            and manifest.get("materialized_step_id") == self._last_step_id()
+            and self.legacy_path.exists()
+        )
+
+    def _last_step_id(self) -> str | None:
+        """Id of the last recorded step, read from the tail of its segment."""
+        manifest = self._manifest
+        assert manifest is not None
+        for segment in reversed(manifest["segments"]):
+            if not segment["step_count"]:
+                continue
+            path = self._dir / segment["name"]
+            end = self._active_size if segment is manifest["segments"][-1] else path.stat().st_size
+            line = _read_last_line(path, end)
+            return str(json.loads(line)["step_id"]) if line else None
+        return None
+
+    # --- Loading & Migration ---
+
+    def _ensure_loaded(self) -> None:
+        """Loads the journal for reading; never writes to the workspace."""
+        if self._manifest is None:
+            self._refresh()
+
+    def _ensure_writable(self) -> None:
+        """Loads the journal for writing, migrating a legacy recipe first."""
+        if self._manifest is None or self._legacy is not None:
+            self._legacy = None
+            self._manifest = None
+            if not self.migrate_legacy():
+                self._refresh()
+
+    def _active_changed_on_disk(self) -> bool:
+        """True if the active segment's size differs from what this instance wrote."""
+        assert self._manifest is not None
+        if not self._manifest["segments"]:
+            return False
+        active_path = self._dir / self._manifest["segments"][-1]["name"]
+        size = active_path.stat().st_size if active_path.exists() else 0
+        return size != self._active_size
+
+    def _refresh(self) -> None:
+        """(Re-)reads the manifest and recounts the active segment from disk."""
+        if not self.manifest_path.exists():
+            if self._manifest is not None and self._legacy is None:
+                # Nothing persisted yet: keep the in-memory state
+                return
+            if self.legacy_path.exists():
+                # Serve reads from the legacy file; it is migrated on the first append
+                self._legacy = self._read_legacy()
+                self._manifest = _new_manifest(self._legacy)
+                self._manifest["step_count"] = len(self._legacy.steps)
+                return
+            self._manifest = _new_manifest()
+            return
+
+        self._legacy = None
+        self._manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        segments = self._manifest["segments"]
+        if not segments:
+            self._active_count = self._active_size = 0
+            return
+
+        # The manifest is only rewritten at checkpoints; the active segment is the truth.
+        active = segments[-1]
+        active_path = self._dir / active["name"]
+        data = active_path.read_bytes() if active_path.exists() else b""
+        self._active_size = data.rfind(b"\n") + 1
+        self._active_count = data.count(b"\n")
+        active["step_count"] = self._active_count
+        self._manifest["step_count"] = active["first_index"] + self._active_count
+
+    def migrate_legacy(self) -> bool:
+        """
+        Imports the single-file `current.json` recipe into the journal.
+        The legacy file is left in place; it matches the journal at this point.
+
+        Returns:
+            True if a legacy recipe was migrated.
+        """
+        with self._lock:
+            if self.manifest_path.exists() or not self.legacy_path.exists():
+                return False
+
+            recipe = self._read_legacy()
+            self._legacy = None
+            self._manifest = _new_manifest(recipe)
+            self._active_count = self._active_size = 0
+            for i in range(0, len(recipe.steps), self._segment_size):
+                self.append_many(recipe.steps[i:i + self._segment_size])
+
+            self._manifest["updated_at"] = recipe.updated_at.isoformat()
+            self._manifest["materialized_step_count"] = len(recipe.steps)
+            self._manifest["materialized_step_id"] = recipe.steps[-1].step_id if recipe.steps else None
+            self.checkpoint()
+            logger.info(f"Migrated legacy recipe {self.legacy_path} ({len(recipe.steps)} steps) to journal")
+            return True
+
+    def _read_legacy(self) -> Recipe:
+        try:
+            return Recipe.model_validate_json(self.legacy_path.read_text(encoding="utf-8") or "{}")
+        except Exception as e:
+            logger.error(f"Failed to read legacy recipe {self.legacy_path}: {e}")
+            return Recipe()
+
+
+def _new_manifest(recipe: Recipe | None = None) -> dict[str, Any]:
+    recipe = recipe or Recipe()
+    return {
+        "format_version": RecipeJournal.FORMAT_VERSION,
+        "recipe_version": recipe.version,
+        "created_at": recipe.created_at.isoformat(),
+        "updated_at": recipe.updated_at.isoformat(),
+        "metadata": recipe.metadata,
+        "step_count": 0,
+        "materialized_step_count": None,
+        "materialized_step_id": None,
+        "segments": [],
+    }
+
+
+def _read_last_line(path: Path, end: int, chunk_size: int = 4096) -> bytes:
+    """The last complete line of `path` before byte offset `end`, read backwards in chunks."""
+    with open(path, "rb") as f:
+        start = end
+        data = b""
+        while start > 0:
+            start = max(0, start - chunk_size)
+            f.seek(start)
+            data = f.read(end - start)
+            if data.rfind(b"\n", 0, len(data) - 1) >= 0:
+                break
+    return data[data.rfind(b"\n", 0, len(data) - 1) + 1:].strip()
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    """Writes via a temp file and rename so readers never see a partial file."""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
@@ -1,19 +1,30 @@
 from collections.abc import Callable
+from typing import Any, TypeVar
 
 from arbolab_logger import get_logger
 
 logger = get_logger(__name__)
 
+Handler = TypeVar("Handler", bound=Callable[..., Any])
+
 # Registry mapping step_type to a handler function
 # Handler signature: (lab, params, author_id) -> result
 _STEP_HANDLERS: dict[str, Callable] = {}
 
-def register_step(step_type: str):
+# Step types whose effects live outside the workspace database transaction
+# (e.g. config.yaml, separate import connections); they cannot be batched or rolled back.
+_NON_TRANSACTIONAL_STEPS: set[str] = set()
+
+def register_step(step_type: str, transactional: bool = True) -> Callable[[Handler], Handler]:
     """Decorator to register a recipe step handler."""
-    def decorator(func: Callable):
+    def decorator(func: Handler) -> Handler:
         if step_type in _STEP_HANDLERS:
             logger.warning(f"Steptype '{step_type}' is already registered. Overwriting.")
         _STEP_HANDLERS[step_type] = func
+        if transactional:
+            _NON_TRANSACTIONAL_STEPS.discard(step_type)
+        else:
+            _NON_TRANSACTIONAL_STEPS.add(step_type)
         return func
     return decorator
 
@@ -26,3 +37,7 @@ def get_handler(step_type: str) -> Callable:
 def list_registered_steps() -> list[str]:
     """Returns a list of all registered step types."""
     return list(_STEP_HANDLERS.keys())
+
+def is_transactional(step_type: str) -> bool:
+    """True if the step only touches the workspace database and can run inside a batch."""
+    return step_type not in _NON_TRANSACTIONAL_STEPS
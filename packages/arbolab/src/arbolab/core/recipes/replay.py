@@ -0,0 +1,275 @@
+"""
+Replay engine for recipes.
+
+`Lab.run_recipe` used to re-execute every step one by one through `execute_step`,
+which opened a transaction per step and appended each step again to the recipe
+being read. The replayer instead:
+
+- groups consecutive database steps into batched transactions (one commit and at
+  most one journal append per batch),
+- marks the last committed step in `core_sys_metadata` inside the same transaction,
+  so an interrupted replay resumes right after it,
+- analyses which entities each step of a batch touches and skips steps whose
+  effect is already present in the database (set-based, one query per entity type).
+
+Steps keep their recorded order: ids are drawn from per-table sequences, so
+reordering would change the ids later steps refer to. DuckDB allows a single
+writer, which is why independent steps are batched rather than run concurrently.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from arbolab.core.recipes.executor import RecipeExecutor
+from arbolab.core.recipes.handlers import MODEL_MAP
+from arbolab.core.recipes.registry import get_handler, is_transactional
+from arbolab.core.recipes.schemas import Recipe, RecipeStep
+from arbolab.lab import Lab
+from arbolab_logger import get_logger
+from sqlalchemy import select
+
+logger = get_logger(__name__)
+
+_ACTIONS = ("define", "modify", "remove")
+
+
+@dataclass
+class ReplayStats:
+    """Outcome of a recipe replay."""
+
+    total: int = 0
+    applied: int = 0
+    skipped: int = 0
+    resumed_from: int = 0
+    batches: int = 0
+    snapshot: str | None = None
+
+
+def _split_step_type(step_type: str) -> tuple[str, str] | None:
+    """Splits e.g. `define_sensor` into ("define", "sensor") for CRUD steps."""
+    action, _, entity_type = step_type.partition("_")
+    if action in _ACTIONS and entity_type in MODEL_MAP:
+        return action, entity_type
+    return None
+
+
+class RecipeReplayer:
+    """Replays recipe steps into a lab in batched, resumable transactions."""
+
+    def __init__(self,
+                 lab: Lab,
+                 batch_size: int = 500,
+                 record: bool = True,
+                 use_snapshots: bool = True,
+                 discard_unrecorded: bool = False):
+        """
+        Args:
+            lab: The (ADMIN) lab to replay into.
+            batch_size: Maximum number of steps committed per transaction.
+            record: Whether replayed steps are appended to the lab's recipe journal.
+                Disable when replaying the lab's own journal.
+            use_snapshots: Whether to start from the newest matching snapshot of the lab
+                and to take snapshots while replaying.
+            discard_unrecorded: Restore a snapshot over a database that holds data
+                variants the replayed steps do not define (they are lost).
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        self.lab = lab
+        self.batch_size = batch_size
+        self.record = record
+        self.use_snapshots = use_snapshots
+        self.discard_unrecorded = discard_unrecorded
+
+    def run(self, recipe: Recipe, fresh_database: bool = False) -> ReplayStats:
+        """
+        Replays `recipe`, continuing after the last step committed by a previous run.
+
+        A snapshot replaces the whole database file, so one is only restored when the
+        database is known to hold a prefix of `recipe`: it was just recreated
+        (`fresh_database`), or its applied-step marker is a step of `recipe` at or
+        before the snapshot. Otherwise (e.g. an external recipe replayed into a lab
+        with its own data) the replay starts at the resume index without a snapshot.
+
+        Raises:
+            ValueError: If a snapshot would replace a database that holds data variants
+                the steps up to the resume index do not define (see `discard_unrecorded`).
+        """
+        steps = recipe.steps
+        start = self.resume_index(steps)
+        stats = ReplayStats(total=len(steps), resumed_from=start)
+        if self.use_snapshots and (fresh_database or start > 0):
+            # `find` only returns snapshots at or after `start`, i.e. after the marker
+            found = self.lab.recipe_snapshots.find(steps, after=start)
+            if found is not None:
+                snapshot, index = found
+                if not (fresh_database or self.discard_unrecorded):
+                    self.lab._check_unrecorded_variants(steps[:start], "restoring a snapshot")
+                self.lab.recipe_snapshots.restore(self.lab.database, snapshot)
+                start = stats.resumed_from = index + 1
+                stats.snapshot = snapshot.path.name
+        if start:
+            logger.info(f"Resuming recipe replay at step {start}/{len(steps)}")
+
+        position = start
+        for chunk in self.plan(steps[start:]):
+            skip = self._present_effects(chunk) if is_transactional(chunk[0].step_type) else set()
+            self._apply_chunk(chunk, skip)
+            stats.batches += 1
+            stats.applied += len(chunk) - len(skip)
+            stats.skipped += len(skip)
+            position = steps.index(chunk[-1], position) + 1
+            if not self.record and self.use_snapshots:
+                # Replaying the own journal: positions in `steps` are journal indexes
+                self.lab.recipe_snapshots.maybe_take(self.lab.database, position - 1, chunk[-1].step_id)
+
+        logger.info(
+            f"Replayed recipe: {stats.applied} applied, {stats.skipped} skipped "
+            f"in {stats.batches} batches (resumed at {stats.resumed_from})"
+        )
+        return stats
+
+    def resume_index(self, steps: Sequence[RecipeStep]) -> int:
+        """Index of the first step after the last one committed to the lab database."""
+        applied = RecipeExecutor.applied_step_id(self.lab)
+        if applied is None:
+            return 0
+        for index, step in enumerate(steps):
+            if step.step_id == applied:
+                return index + 1
+        logger.warning(f"Last applied step {applied} is not part of the recipe; replaying from the start")
+        return 0
+
+    def plan(self, steps: Sequence[RecipeStep]) -> Iterator[list[RecipeStep]]:
+        """
+        Yields the steps in commit units: runs of up to `batch_size` database steps,
+        and steps acting outside the database (config, imports) on their own.
+        `open_lab` steps are dropped, the lab is already open.
+        """
+        chunk: list[RecipeStep] = []
+        for step in steps:
+            if step.step_type == "open_lab":
+                continue
+            if not is_transactional(step.step_type):
+                if chunk:
+                    yield chunk
+                    chunk = []
+                yield [step]
+                continue
+            chunk.append(step)
+            if len(chunk) >= self.batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _apply_chunk(self, chunk: list[RecipeStep], skip: set[int]) -> None:
+        if not is_transactional(chunk[0].step_type):
+            # Runs outside the database transaction; only recorded once it succeeded
+            step = chunk[0]
+            result = get_handler(step.step_type)(self.lab, dict(step.params), step.author_id)
+            with RecipeExecutor.batch(self.lab) as batch:
+                batch.add(step, result, record=self.record)
+            return
+
+        with RecipeExecutor.batch(self.lab) as batch:
+            for index, step in enumerate(chunk):
+                if index in skip:
+                    # Already applied (and journaled) here; only moves the applied-step marker
+                    batch.add(step, None, record=False)
+                    continue
+                # Handlers may consume params (e.g. `id`); keep the recorded step intact
+                result = get_handler(step.step_type)(self.lab, dict(step.params), step.author_id)
+                batch.add(step, result, record=self.record)
+
+    def _present_effects(self, chunk: list[RecipeStep]) -> set[int]:
+        """
+        Positions of steps in `chunk` whose effect is already in the database.
+
+        - `define_*` is present if an entity with its `id` (or `name`) exists, unless
+          an earlier step of the chunk modifies that entity type or removes anything
+          (removals may cascade).
+        - `remove_*` is present if its `id` does not exist, unless an earlier step
+          of the chunk defines that entity type.
+        """
+        index = _ChunkIndex.build(chunk)
+        existing_ids, existing_names = self._lookup(index.ids, index.names)
+
+        present: set[int] = set()
+        for position, (step, crud) in enumerate(zip(chunk, index.parsed, strict=True)):
+            if crud is None:
+                continue
+            action, entity_type = crud
+            if action == "define" and not index.define_conflicts(entity_type, position):
+                if "id" in step.params:
+                    found = step.params["id"] in existing_ids.get(entity_type, ())
+                else:
+                    found = step.params.get("name") in existing_names.get(entity_type, ())
+                if found:
+                    present.add(position)
+            elif action == "remove" and index.first_define.get(entity_type, position) >= position:
+                entity_id = step.params.get("id")
+                if entity_id is not None and entity_id not in existing_ids.get(entity_type, ()):
+                    present.add(position)
+        return present
+
+    def _lookup(self,
+                ids: dict[str, set[Any]],
+                names: dict[str, set[Any]]) -> tuple[dict[str, set[Any]], dict[str, set[Any]]]:
+        """Fetches which of the referenced ids/names exist, one query per entity type."""
+        existing_ids: dict[str, set[Any]] = {}
+        existing_names: dict[str, set[Any]] = {}
+        with self.lab.database.session() as session:
+            for entity_type, values in ids.items():
+                column = MODEL_MAP[entity_type].__table__.c["id"]
+                existing_ids[entity_type] = set(session.execute(select(column).where(column.in_(values))).scalars())
+            for entity_type, values in names.items():
+                column = MODEL_MAP[entity_type].__table__.c["name"]
+                existing_names[entity_type] = set(session.execute(select(column).where(column.in_(values))).scalars())
+        return existing_ids, existing_names
+
+
+@dataclass
+class _ChunkIndex:
+    """Per entity type: the lookups a chunk needs and where conflicting steps start."""
+
+    parsed: list[tuple[str, str] | None] = field(default_factory=list)
+    ids: dict[str, set[Any]] = field(default_factory=dict)
+    names: dict[str, set[Any]] = field(default_factory=dict)
+    first_define: dict[str, int] = field(default_factory=dict)
+    first_modify: dict[str, int] = field(default_factory=dict)
+    first_remove: int | None = None
+
+    @classmethod
+    def build(cls, chunk: list[RecipeStep]) -> _ChunkIndex:
+        index = cls()
+        for position, step in enumerate(chunk):
+            crud = _split_step_type(step.step_type)
+            index.parsed.append(crud)
+            if crud is None:
+                continue
+            action, entity_type = crud
+            entity_id = step.params.get("id")
+            if action == "define":
+                index.first_define.setdefault(entity_type, position)
+                if entity_id is not None:
+                    index.ids.setdefault(entity_type, set()).add(entity_id)
+                elif step.params.get("name") is not None and "name" in MODEL_MAP[entity_type].__table__.c:
+                    index.names.setdefault(entity_type, set()).add(step.params["name"])
+            elif action == "modify":
+                index.first_modify.setdefault(entity_type, position)
+            else:
+                if index.first_remove is None:
+                    index.first_remove = position
+                if entity_id is not None:
+                    index.ids.setdefault(entity_type, set()).add(entity_id)
+        return index
+
+    def define_conflicts(self, entity_type: str, position: int) -> bool:
+        """True if an earlier step of the chunk may have changed what a define at `position` finds."""
+        if self.first_modify.get(entity_type, position) < position:
+            return True
+        return self.first_remove is not None and self.first_remove < position
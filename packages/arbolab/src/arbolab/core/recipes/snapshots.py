@@ -0,0 +1,270 @@
+"""
+Periodic snapshots of the workspace database, tied to a recipe step.
+
+Reproducing a workspace from its recipe would otherwise always start at step zero.
+Every `interval` recorded steps the database is exported (DuckDB `EXPORT DATABASE`
+to Parquet) together with the id and index of the last step it contains:
+
+    recipes/snapshots/
+        step-000001000/
+            snapshot.json      step_id, step_index, export_dir, created_at
+            schema.sql         written by EXPORT DATABASE
+            load.sql
+            <table>.parquet
+
+A replay restores the newest snapshot whose step is part of the recipe being
+replayed and only runs the steps after it. Only the newest `retention`
+snapshots are kept.
+
+Snapshots taken along recorded steps (`maybe_take`) stay off the commit path: the
+committed state is pinned synchronously by opening a read transaction on a
+separate cursor, and the export (proportional to the database size) runs on a
+background thread while further steps commit.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+from arbolab.core.recipes.schemas import RecipeStep
+from arbolab.database import NativeCursor, WorkspaceDatabase
+from arbolab.models.sys import SysMetadata
+from arbolab_logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A database export taken right after `step_id` (at `step_index`) was committed."""
+
+    path: Path
+    step_id: str
+    step_index: int
+    export_dir: str
+    created_at: datetime
+
+
+class RecipeSnapshots:
+    """Takes, lists, prunes and restores database snapshots of a workspace."""
+
+    META_NAME = "snapshot.json"
+    PREFIX = "step-"
+
+    def __init__(self, snapshots_dir: Path, interval: int = 1000, retention: int = 3):
+        """
+        Args:
+            snapshots_dir: The workspace `recipes/snapshots/` directory.
+            interval: Recorded steps between two snapshots; 0 disables automatic snapshots.
+            retention: Number of snapshots to keep.
+        """
+        self._dir = snapshots_dir
+        self.interval = max(0, interval)
+        self.retention = max(1, retention)
+        self._latest_index: int | None = None
+        self._export_thread: threading.Thread | None = None
+
+    @property
+    def snapshots_dir(self) -> Path:
+        return self._dir
+
+    def list_snapshots(self) -> list[Snapshot]:
+        """Complete snapshots, oldest first."""
+        snapshots: list[Snapshot] = []
+        if not self._dir.exists():
+            return snapshots
+        for path in sorted(self._dir.glob(f"{self.PREFIX}*")):
+            meta_path = path / self.META_NAME
+            if not meta_path.exists():
+                continue
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                snapshots.append(Snapshot(
+                    path=path,
+                    step_id=meta["step_id"],
+                    step_index=meta["step_index"],
+                    export_dir=meta["export_dir"],
+                    created_at=datetime.fromisoformat(meta["created_at"]),
+                ))
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return snapshots
+
+    def latest_index(self) -> int:
+        """Step index of the newest snapshot, 0 (the recipe start) if there is none."""
+        if self._latest_index is None:
+            snapshots = self.list_snapshots()
+            self._latest_index = snapshots[-1].step_index if snapshots else 0
+        return self._latest_index
+
+    def is_due(self, step_index: int) -> bool:
+        """True if `interval` steps were recorded since the newest snapshot."""
+        return self.interval > 0 and step_index - self.latest_index() >= self.interval
+
+    def maybe_take(self, database: WorkspaceDatabase, step_index: int, step_id: str) -> bool:
+        """
+        Starts a snapshot in the background if one is due and none is running.
+        Only pinning the committed state happens on the caller's thread; see `wait`.
+        Failures are logged, never raised.
+
+        Returns:
+            True if a snapshot was started.
+        """
+        if not self.is_due(step_index) or self.is_exporting():
+            return False
+        con = None
+        try:
+            con = database.get_native_con()
+            con.execute("BEGIN TRANSACTION")
+            # The first read fixes the transaction's view: later commits are not exported
+            con.execute(f"SELECT 1 FROM {SysMetadata.__tablename__} LIMIT 1").fetchall()
+        except Exception as e:
+            logger.warning(f"Snapshot at recipe step {step_index} failed: {e}")
+            if con is not None:
+                con.close()
+            return False
+
+        self._latest_index = max(self.latest_index(), step_index)
+        self._export_thread = threading.Thread(
+            target=self._export_pinned,
+            args=(con, step_index, step_id),
+            name=f"recipe-snapshot-{step_index}",
+            daemon=True,
+        )
+        self._export_thread.start()
+        return True
+
+    def is_exporting(self) -> bool:
+        """True while a snapshot started by `maybe_take` is being written."""
+        return self._export_thread is not None and self._export_thread.is_alive()
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Blocks until a snapshot started by `maybe_take` is written."""
+        if self._export_thread is not None:
+            self._export_thread.join(timeout)
+
+    def _export_pinned(self, con: NativeCursor, step_index: int, step_id: str) -> None:
+        try:
+            self._export(con, step_index, step_id)
+        except Exception as e:
+            logger.warning(f"Snapshot at recipe step {step_index} failed: {e}")
+            self._latest_index = None
+        finally:
+            try:
+                con.execute("ROLLBACK")
+            finally:
+                con.close()
+
+    def take(self, database: WorkspaceDatabase, step_index: int, step_id: str) -> Snapshot:
+        """
+        Exports the committed database state; `step_id` must be the last step it contains.
+        Runs on the caller's thread.
+        """
+        self.wait()
+        con = database.get_native_con()
+        try:
+            return self._export(con, step_index, step_id)
+        finally:
+            con.close()
+
+    def _export(self, con: NativeCursor, step_index: int, step_id: str) -> Snapshot:
+        """Exports the state visible to `con` to a hidden directory, renamed once complete."""
+        name = f"{self.PREFIX}{step_index:09d}"
+        target = self._dir / name
+        tmp_dir = self._dir / f".{name}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._dir.mkdir(parents=True, exist_ok=True)
+
+        con.execute(f"EXPORT DATABASE '{_sql_path(tmp_dir)}' (FORMAT PARQUET)")
+
+        created_at = datetime.now()
+        meta = {
+            "step_id": step_id,
+            "step_index": step_index,
+            "export_dir": str(tmp_dir),
+            "created_at": created_at.isoformat(),
+            "duckdb_version": duckdb.__version__,
+        }
+        (tmp_dir / self.META_NAME).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp_dir, target)
+
+        self._latest_index = max(self.latest_index(), step_index)
+        self.prune()
+        logger.info(f"Snapshot of recipe step {step_index} written to {target}")
+        return Snapshot(target, step_id, step_index, str(tmp_dir), created_at)
+
+    def prune(self) -> list[Path]:
+        """Deletes all but the newest `retention` snapshots."""
+        snapshots = self.list_snapshots()
+        removed = [s.path for s in snapshots[:-self.retention]]
+        for path in removed:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.debug(f"Removed snapshot {path}")
+        return removed
+
+    def find(self, steps: Sequence[RecipeStep], after: int = 0) -> tuple[Snapshot, int] | None:
+        """
+        The newest snapshot whose step is part of `steps` at an index >= `after`.
+
+        Returns:
+            The snapshot and the index of its step in `steps`, or None.
+        """
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return None
+        positions = {step.step_id: index for index, step in enumerate(steps)}
+        for snapshot in reversed(snapshots):
+            index = positions.get(snapshot.step_id)
+            if index is not None and index >= after:
+                return snapshot, index
+        return None
+
+    def restore(self, database: WorkspaceDatabase, snapshot: Snapshot) -> None:
+        """
+        Replaces the database file with the state stored in `snapshot`.
+        The database is closed while the file is swapped and reconnected afterwards.
+        """
+        self.wait()
+        db_path = database.db_path
+        tmp_path = db_path.with_name(f".{db_path.name}.restore")
+        for path in (tmp_path, _wal_path(tmp_path)):
+            path.unlink(missing_ok=True)
+
+        schema_sql = (snapshot.path / "schema.sql").read_text(encoding="utf-8")
+        load_sql = (snapshot.path / "load.sql").read_text(encoding="utf-8")
+        # Schemas of the catalog (information_schema, pg_catalog) exist in every database
+        schema_sql = schema_sql.replace("CREATE SCHEMA ", "CREATE SCHEMA IF NOT EXISTS ")
+        # load.sql references the Parquet files by the path they were exported to
+        load_sql = load_sql.replace(_sql_path(Path(snapshot.export_dir)), _sql_path(snapshot.path))
+
+        con = duckdb.connect(str(tmp_path))
+        try:
+            con.execute(schema_sql)
+            con.execute(load_sql)
+            con.execute("CHECKPOINT")
+        finally:
+            con.close()
+
+        database.close()
+        _wal_path(db_path).unlink(missing_ok=True)
+        os.replace(tmp_path, db_path)
+        database.connect()
+        logger.info(f"Restored database from snapshot {snapshot.path.name} (recipe step {snapshot.step_index})")
+
+
+def _sql_path(path: Path) -> str:
+    """Path as a single-quoted SQL string literal body."""
+    return str(path).replace("'", "''")
+
+
+def _wal_path(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.name}.wal")
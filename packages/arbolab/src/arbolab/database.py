@@ -1,12 +1,21 @@
-from collections.abc import Generator
+import hashlib
+import itertools
+import logging
+import threading
+import weakref
+from collections import Counter
+from collections.abc import Callable, Generator
 from contextlib import contextmanager
 from pathlib import Path
+from typing import Any
 
 import duckdb
 from arbolab_logger import get_logger
-from sqlalchemy import create_engine, event, text
-from sqlalchemy.engine import Engine
+from duckdb_engine import ConnectionWrapper
+from sqlalchemy import MetaData, create_engine, event, text
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.schema import CreateIndex, CreateTable
 
 # Import core models to ensure they are registered in Base.metadata
 import arbolab.models.core
@@ -15,14 +24,164 @@ from arbolab.models.base import Base
 
 logger = get_logger(__name__)
 
+SCHEMA_VERSION_KEY_PREFIX = "schema_version:"
+
+# Stamps per MetaData, valid while its tables, columns and indexes are unchanged
+_schema_stamps: "weakref.WeakKeyDictionary[object, tuple[frozenset[tuple[Any, ...]], str]]" = weakref.WeakKeyDictionary()
+
+def check_read_only(con: duckdb.DuckDBPyConnection, statement: str) -> None:
+    """
+    Raises:
+        PermissionError: If `statement` contains anything but queries.
+    """
+    types = {s.type for s in con.extract_statements(statement)}
+    if types - {duckdb.StatementType.SELECT}:
+        raise PermissionError(f"Read-only database access does not allow {', '.join(sorted(t.name for t in types))} statements.")
+
+
+class NativeCursor:
+    """
+    Cursor on the workspace DuckDB instance, taken from the bounded native pool.
+    Behaves like a `duckdb.DuckDBPyConnection`; `close()` returns its pool slot.
+    A `read_only` cursor only executes queries.
+    """
+    def __init__(self, cursor: duckdb.DuckDBPyConnection, release: Callable[[], None], read_only: bool = False):
+        self._cursor = cursor
+        self._release = release
+        self._read_only = read_only
+        self._closed = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def execute(self, query: str, parameters: object = None) -> "NativeCursor":
+        if self._read_only:
+            check_read_only(self._cursor, query)
+        self._cursor.execute(query, parameters)
+        return self
+
+    def executemany(self, query: str, parameters: object = None) -> "NativeCursor":
+        if self._read_only:
+            check_read_only(self._cursor, query)
+        self._cursor.executemany(query, parameters)
+        return self
+
+    def sql(self, query: str, **kwargs: Any) -> duckdb.DuckDBPyRelation:
+        if self._read_only:
+            check_read_only(self._cursor, query)
+        return self._cursor.sql(query, **kwargs)
+
+    query = sql
+
+    def __enter__(self) -> "NativeCursor":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._cursor.close()
+        finally:
+            self._release()
+
+
 class WorkspaceDatabase:
     """
-    Manages the DuckDB connection for domain entities and metadata.
+    Manages the DuckDB database of a workspace for domain entities and metadata.
+
+    The database file is opened once: one DuckDB instance per workspace, from which
+    both the SQLAlchemy engine and analytical callers (`get_native_con`) get cursors.
+    ORM and analytics thereby share the buffer cache and never contend for the
+    file lock. Both pools are bounded by `pool_size`; a checkout waits up to
+    `pool_timeout` seconds for a free cursor. Streaming native cursors, held while a
+    client consumes a response, come from a separate pool of `stream_pool_size`, so
+    slow clients cannot starve analytical callers.
+
+    The instance is limited to `memory_limit_mb` and `threads` (0 keeps the DuckDB
+    defaults) and spills to `temp_directory`. `set_budget` caps these limits further,
+    e.g. by the share of a process-wide budget.
+
+    Every `flush_log_every`-th flush logs one summary line with the number of
+    created/deleted (and, at DEBUG, updated) entities per type; 0 disables it.
+
+    `reader()` returns a read-only view for VIEWER labs that opens no instance of
+    its own: its ORM and native cursors come from this instance and only run
+    queries. Viewers thereby read consistent snapshots (DuckDB MVCC) while this
+    database writes, instead of opening the file a second time, which DuckDB
+    forbids within one process. A reader never reopens a closed database: it
+    raises until its owner connects the database again.
     """
-    def __init__(self, db_path: Path):
+    def __init__(self,  # noqa: PLR0913
+                 db_path: Path,
+                 pool_size: int = 8,
+                 pool_timeout: float = 30.0,
+                 *,
+                 stream_pool_size: int = 2,
+                 memory_limit_mb: int = 0,
+                 threads: int = 0,
+                 temp_directory: Path | None = None,
+                 flush_log_every: int = 1,
+                 writer: "WorkspaceDatabase | None" = None):
         self._db_path = db_path
+        self._pool_size = pool_size
+        self._pool_timeout = pool_timeout
+        self._stream_pool_size = stream_pool_size
+        self._memory_limit_mb = memory_limit_mb
+        self._threads = threads
+        self._temp_directory = temp_directory
+        self._budget = (0, 0)
+        self._flush_log_every = flush_log_every
+        self._flushes = itertools.count()
+        self._instance: duckdb.DuckDBPyConnection | None = None
+        # Set by close(); a closed writer is only reopened by its owner (see reader)
+        self._closed = False
+        # Database whose instance a reader() takes its cursors from
+        self._writer = writer
+        self._readers: weakref.WeakSet[WorkspaceDatabase] = weakref.WeakSet()
+        self._native_slots = threading.BoundedSemaphore(pool_size)
+        self._stream_slots = threading.BoundedSemaphore(stream_pool_size)
         self._engine: Engine | None = None
         self._session_factory = None
+        # Per-thread session opened by transaction(); nested session() calls join it
+        self._local = threading.local()
+
+    @property
+    def db_path(self) -> Path:
+        return self._db_path
+
+    @property
+    def is_reader(self) -> bool:
+        """True for a read-only view on another database's instance (see `reader`)."""
+        return self._writer is not None
+
+    def reader(self) -> "WorkspaceDatabase":
+        """Read-only view sharing the DuckDB instance of this database (see class docstring)."""
+        if self._writer is not None:
+            return self._writer.reader()
+        reader = WorkspaceDatabase(
+            self._db_path, self._pool_size, self._pool_timeout,
+            stream_pool_size=self._stream_pool_size, flush_log_every=self._flush_log_every, writer=self,
+        )
+        self._readers.add(reader)
+        return reader
+
+    def _shared_instance(self) -> duckdb.DuckDBPyConnection:
+        """
+        Raises:
+            RuntimeError: If this is a reader and its database was closed.
+        """
+        owner = self._writer or self
+        if owner is not self:
+            if owner._closed:
+                raise RuntimeError(f"Database {self._db_path} was closed; open its lab again to read it.")
+            if owner._engine is None:
+                owner.connect()
+        assert owner._instance is not None
+        return owner._instance
 
     @property
     def engine(self) -> Engine:
@@ -36,59 +195,175 @@ class WorkspaceDatabase:
         """Initializes the engine and session factory."""
         if self._engine is not None:
             return
+        self._closed = False
 
         # DuckDB via SQLAlchemy
         # Ensure the directory exists
         self._db_path.parent.mkdir(parents=True, exist_ok=True)
         
         conn_str = f"duckdb:///{self._db_path}"
-        logger.debug(f"Connecting to database at {self._db_path} (Read-Only: {read_only})")
-        
-        connect_args = {}
-        if read_only:
-             connect_args["read_only"] = True
+        logger.debug(f"Connecting to database at {self._db_path} (Read-Only: {read_only or self.is_reader})")
 
-        self._engine = create_engine(conn_str, connect_args=connect_args)
-        
-        # Initialize Schema (MVP: Create all tables if missing)
-        # Core tables go to default schema (or 'main' if configured, but default is easier for now)
-        self.create_tables(Base.metadata)
+        if self._writer is None:
+            self._instance = duckdb.connect(str(self._db_path), read_only=read_only, config=self._settings())
+        # Pooled ORM connections are cursors of the shared instance
+        self._engine = create_engine(
+            conn_str,
+            creator=lambda: ConnectionWrapper(self._shared_instance().cursor()),
+            pool_size=self._pool_size,
+            max_overflow=0,
+            pool_timeout=self._pool_timeout,
+        )
+        if self._writer is not None:
+            event.listen(self._engine, "before_cursor_execute", _reject_writes)
+        else:
+            # Initialize Schema (MVP: Create all tables if missing)
+            # Core tables go to default schema (or 'main' if configured, but default is easier for now)
+            self.create_tables(Base.metadata)
         
         self._session_factory = sessionmaker(bind=self._engine)
         
         # Register event listeners for logging
-        event.listen(self._session_factory, "after_flush", self._log_after_flush)
+        if self._flush_log_every > 0:
+            event.listen(self._session_factory, "after_flush", self._log_after_flush)
+
+    def _settings(self) -> dict[str, str | int]:
+        """DuckDB settings of the instance: the configured limits capped by the budget."""
+        memory_limit_mb = _cap(self._memory_limit_mb, self._budget[0])
+        threads = _cap(self._threads, self._budget[1])
+        settings: dict[str, str | int] = {}
+        if memory_limit_mb:
+            settings["memory_limit"] = f"{memory_limit_mb}MiB"
+        if threads:
+            settings["threads"] = threads
+        if self._temp_directory is not None:
+            settings["temp_directory"] = str(self._temp_directory)
+        return settings
+
+    def set_budget(self, memory_limit_mb: int = 0, threads: int = 0) -> None:
+        """
+        Caps the memory limit and threads of the instance by a budget (0 = no cap).
+        Applied immediately if the database is open; a setting left without limit or
+        budget is reset to the DuckDB default.
+        """
+        self._budget = (memory_limit_mb, threads)
+        if self._instance is None:
+            # Readers run within the limits of their writer's instance
+            return
+        settings = self._settings()
+        cursor = self._instance.cursor()
+        try:
+            if "memory_limit" in settings:
+                cursor.execute(f"SET memory_limit = '{settings['memory_limit']}'")
+            else:
+                cursor.execute("RESET memory_limit")
+            if "threads" in settings:
+                cursor.execute(f"SET threads = {int(settings['threads'])}")
+            else:
+                cursor.execute("RESET threads")
+        finally:
+            cursor.close()
+        logger.debug(f"Database resources of {self._db_path}: {settings}")
 
     def ensure_schema(self, schema_name: str):
         """Ensures a DuckDB schema (namespace) exists."""
         if self._engine is None:
             self.connect()
-            
+        if self.is_reader:
+            return
+
         with self._engine.begin() as conn:
             conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema_name}"))
             
-    def create_tables(self, metadata, schema: str | None = None):
+    def create_tables(self, metadata: MetaData, schema: str | None = None) -> bool:
         """
         Creates tables from the given metadata.
         If schema is provided, ensures the schema exists first.
+
+        The hash of the DDL of `metadata` is stamped in `core_sys_metadata` (key
+        `schema_version:<schema>:<tables>`, where `<tables>` identifies the set of
+        table names, so several metadata in one schema keep separate stamps); while
+        the stamp matches, no DDL runs and the per-table existence checks of
+        `create_all` are skipped.
+
+        Returns:
+            True if DDL was run, False if the stamp was unchanged.
         """
         if self._engine is None:
             self.connect()
+        if self.is_reader:
+            # The schema is owned by the writer
+            return False
+
+        tables = hashlib.sha256("\n".join(sorted(metadata.tables)).encode()).hexdigest()
+        key = f"{SCHEMA_VERSION_KEY_PREFIX}{schema or 'main'}:{tables[:12]}"
+        stamp = self.schema_stamp(metadata)
+        if self._read_stamp(key) == stamp:
+            logger.debug(f"Schema {schema or 'main'} is up to date ({stamp[:12]})")
+            return False
 
         if schema:
             self.ensure_schema(schema)
-            
+
         # SQLAlchemy create_all handles checking existence
-        metadata.create_all(self._engine)
+        metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO core_sys_metadata (key, value) VALUES (:key, :value) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+                ),
+                {"key": key, "value": stamp},
+            )
+        logger.debug(f"Created schema {schema or 'main'} ({stamp[:12]})")
+        return True
+
+    def schema_stamp(self, metadata: MetaData) -> str:
+        """SHA-256 of the CREATE TABLE/INDEX statements of `metadata`."""
+        tables = frozenset(
+            (name, tuple(table.columns.keys()), len(table.indexes), len(table.constraints))
+            for name, table in metadata.tables.items()
+        )
+        cached = _schema_stamps.get(metadata)
+        if cached is not None and cached[0] == tables:
+            return cached[1]
+        dialect = self.engine.dialect
+        digest = hashlib.sha256()
+        for table in sorted(metadata.tables.values(), key=lambda t: t.fullname):
+            digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+            for index in sorted(table.indexes, key=lambda i: i.name or ""):
+                digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+        _schema_stamps[metadata] = (tables, digest.hexdigest())
+        return digest.hexdigest()
+
+    def _read_stamp(self, key: str) -> str | None:
+        with self.engine.connect() as conn:
+            # duckdb_tables() is much cheaper than information_schema
+            exists = conn.execute(text(
+                "SELECT count(*) FROM duckdb_tables() "
+                "WHERE schema_name = 'main' AND table_name = 'core_sys_metadata'"
+            )).scalar()
+            if not exists:
+                return None
+            return conn.execute(
+                text("SELECT value FROM core_sys_metadata WHERE key = :key"), {"key": key}
+            ).scalar()
 
-    def _log_after_flush(self, session, flush_context):
-        """Log created, updated, or deleted entities."""
-        for obj in session.new:
-            logger.info(f"Created {type(obj).__name__}: {obj}")
-        for obj in session.dirty:
-            logger.debug(f"Updated {type(obj).__name__}: {obj}")
-        for obj in session.deleted:
-            logger.info(f"Deleted {type(obj).__name__}: {obj}")
+    def _log_after_flush(self, session: Session, flush_context: object) -> None:
+        """Log the number of created, updated, or deleted entities per type."""
+        if next(self._flushes) % self._flush_log_every or not logger.isEnabledFor(logging.INFO):
+            return
+        groups = {"Created": session.new, "Deleted": session.deleted}
+        if logger.isEnabledFor(logging.DEBUG):
+            # session.dirty checks every object of the identity map for changes
+            groups["Updated"] = session.dirty
+        parts = []
+        for action, objects in groups.items():
+            counts = Counter(type(obj).__name__ for obj in objects)
+            if counts:
+                parts.append(f"{action} " + ", ".join(f"{count} {name}" for name, count in sorted(counts.items())))
+        if parts:
+            logger.info(f"Flush: {'; '.join(parts)}")
 
     @contextmanager
     def session(self) -> Generator[Session, None, None]:
@@ -98,41 +373,104 @@ class WorkspaceDatabase:
         """
         if self._session_factory is None:
             self.connect()
+
+        active = getattr(self._local, "session", None)
+        if active is not None:
+            # Join the enclosing transaction(); it owns commit and rollback
+            yield active
+            return
             
         session = self._session_factory()
         # Session ID for tracing (simple hash of object)
         sid = id(session)
-        logger.debug(f"[Session {sid}] Started transaction")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(f"[Session {sid}] Started transaction")
         try:
             yield session
-            logger.debug(f"[Session {sid}] Committing transaction...")
             session.commit()
-            logger.debug(f"[Session {sid}] Committed transaction successfully")
+            if debug:
+                logger.debug(f"[Session {sid}] Committed transaction")
         except Exception as e:
             logger.error(f"[Session {sid}] Transaction failed: {e}")
             session.rollback()
-            logger.debug(f"[Session {sid}] Rolled back transaction")
+            if debug:
+                logger.debug(f"[Session {sid}] Rolled back transaction")
             raise
         finally:
             session.close()
-            logger.debug(f"[Session {sid}] Session closed")
 
-    def get_native_con(self):
+    @contextmanager
+    def transaction(self) -> Generator[Session, None, None]:
         """
-        Returns a native duckdb connection for analytical heavy lifting 
-        if SA is too slow or limiting.
+        Yields a session whose transaction spans every nested `session()` call
+        made on this thread, committing once on exit or rolling back everything.
+        Nested calls to `transaction()` join the outer one.
+        """
+        active = getattr(self._local, "session", None)
+        if active is not None:
+            yield active
+            return
+
+        with self.session() as session:
+            self._local.session = session
+            try:
+                yield session
+            finally:
+                self._local.session = None
+
+    def get_native_con(self, *, streaming: bool = False) -> NativeCursor:
+        """
+        Returns a native duckdb cursor on the workspace instance for analytical heavy
+        lifting if SA is too slow or limiting. Callers must `close()` it (or use it as
+        a context manager) to return it to the pool.
+
+        Args:
+            streaming: Take the cursor from the pool of streaming cursors, for results
+                consumed at the pace of a client (see class docstring).
+
+        Raises:
+            TimeoutError: If no cursor is free within `pool_timeout` seconds.
         """
         if self._engine is None:
             self.connect()
-        # This is a bit of a hack in some SA versions, but usually getting a raw connection is possible
-        # For simplicity in MVP, we might just open a read-only cursor or use the engine connection.
-        return duckdb.connect(str(self._db_path))
+        slots, size = (self._stream_slots, self._stream_pool_size) if streaming else (self._native_slots, self._pool_size)
+        if not slots.acquire(timeout=self._pool_timeout):
+            kind = "streaming" if streaming else "native"
+            raise TimeoutError(f"No {kind} DuckDB cursor free within {self._pool_timeout}s (pool size {size}).")
+        try:
+            cursor = self._shared_instance().cursor()
+        except Exception:
+            slots.release()
+            raise
+        return NativeCursor(cursor, slots.release, read_only=self.is_reader)
 
-    def close(self):
+    def close(self) -> None:
         """
         Closes the database connection and disposes of the engine.
+        Readers of this database are closed too; their next use raises until this
+        database is connected again.
         """
+        for reader in list(self._readers):
+            reader.close()
         if self._engine:
             self._engine.dispose()
             self._engine = None
+            self._session_factory = None
             logger.debug("Database engine disposed.")
+        if self._instance is not None:
+            self._instance.close()
+            self._instance = None
+        self._closed = True
+
+
+def _cap(limit: int, budget: int) -> int:
+    """The smaller of two limits where 0 means unlimited."""
+    if not limit or not budget:
+        return limit or budget
+    return min(limit, budget)
+
+
+def _reject_writes(conn: Connection, cursor: Any, statement: str, *_args: object) -> None:
+    """`before_cursor_execute` listener of reader engines."""
+    check_read_only(cursor, statement)
@@ -1,17 +1,34 @@
+import threading
+from collections.abc import Generator, Iterable, Sequence
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from arbolab_logger import get_logger, get_logger_config, configure_logger
+from arbolab_logger import configure_logger, get_logger, get_logger_config
+from sqlalchemy import func, select
 
 from arbolab.core.security import LabRole
 
 from .config import LabConfig, create_default_config, load_config
 from .database import WorkspaceDatabase
 from .layout import ResultsLayout, WorkspaceLayout
+from .models.core import DataVariant
 from .plugins import PluginRegistry, PluginRuntime
+from .services.compaction import VariantCompactor
+from .services.derivation import Transform, VariantDeriver
+from .services.downsampling import Downsampler
+from .services.rollups import VariantRollups
 from .store import VariantStore
 
+if TYPE_CHECKING:
+    # arbolab.core.recipes registers its handlers on import, which import Lab
+    from arbolab.core.recipes.journal import RecipeJournal
+    from arbolab.core.recipes.replay import ReplayStats
+    from arbolab.core.recipes.schemas import Recipe, RecipeStep
+    from arbolab.core.recipes.snapshots import RecipeSnapshots
+    from arbolab.services.importer import MetadataImporter
+
 logger = get_logger(__name__)
 
 class PermissionError(Exception):
@@ -40,6 +57,12 @@ class Lab:
         self.store = variant_store
         self.input_root = input_root
         self.role = role
+        self._recipe_journal: RecipeJournal | None = None
+        self._recipe_snapshots: RecipeSnapshots | None = None
+        self._compactor: VariantCompactor | None = None
+        self._downsampler: Downsampler | None = None
+        self._rollups: VariantRollups | None = None
+        self._batch_local = threading.local()
         
         # Plugins
         self.plugin_registry = PluginRegistry()
@@ -55,10 +78,16 @@ class Lab:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
-    def close(self):
+    def close(self) -> None:
         """
         Closes the Lab instance, releasing resources.
         """
+        # 0. Stop background services
+        if self._compactor is not None:
+            self._compactor.stop()
+        if self._recipe_snapshots is not None:
+            self._recipe_snapshots.wait()
+
         # 1. Close Database
         if self.database:
              self.database.close()
@@ -114,6 +143,8 @@ class Lab:
         # Smart-Eager Catalog Seeding (Only for Admins)
         if self.role == LabRole.ADMIN:
             self._seed_catalog()
+            if self.config.variant_compaction_interval:
+                self.compactor.start(self.config.variant_compaction_interval)
         
         logger.info(f"Lab initialized at {self.layout.root} (Role: {self.role})")
 
@@ -148,7 +179,7 @@ class Lab:
         logger.info("Structure verification and directory creation completed prior to log start.")
         logger.info("---------------------------")
 
-    def _seed_catalog(self):
+    def _seed_catalog(self) -> None:
         """Synchronizes the internal catalog with the package version."""
         from arbolab.core.catalog_manager import CatalogManager
         cm = CatalogManager()
@@ -241,7 +272,16 @@ class Lab:
              res_layout = ResultsLayout(res_path)
 
         # 6. Wiring
-        db = WorkspaceDatabase(layout.db_path)
+        db = WorkspaceDatabase(
+            layout.db_path,
+            pool_size=config.db_pool_size,
+            pool_timeout=config.db_pool_timeout,
+            stream_pool_size=config.db_stream_pool_size,
+            memory_limit_mb=config.db_memory_limit_mb,
+            threads=config.db_threads,
+            temp_directory=layout.tmp_dir,
+            flush_log_every=config.db_flush_log_every,
+        )
         store = VariantStore(layout.variants_dir)
         
         input_path = Path(input_root).resolve() if input_root else None
@@ -256,42 +296,240 @@ class Lab:
             role=role
         )
         
+    def viewer(self) -> 'Lab':
+        """
+        A VIEWER Lab of this workspace served from this Lab's database instance.
+        It takes read-only cursors from it (see WorkspaceDatabase.reader) instead of
+        opening the database file a second time, and stays usable while this Lab writes.
+        The viewer is closed when this Lab's database closes.
+        """
+        return Lab(
+            config=self.config,
+            workspace_layout=self.layout,
+            results_layout=self.results,
+            database=self.database.reader(),
+            variant_store=self.store,
+            input_root=self.input_root,
+            role=LabRole.VIEWER,
+        )
+
     @property
-    def importer(self):
+    def importer(self) -> "MetadataImporter":
         """Lazy access to MetadataImporter service."""
         from arbolab.services.importer import MetadataImporter
-        return MetadataImporter(self.database.engine)
+        return MetadataImporter(
+            self.database.engine,
+            read_workers=self.config.metadata_read_workers or None,
+            batch_size=self.config.metadata_batch_size or None,
+        )
         
-    def import_metadata(self, package_path: Path) -> dict[str, Any]:
+    @property
+    def compactor(self) -> VariantCompactor:
+        """Lazy access to the VariantCompactor of this workspace."""
+        if self._compactor is None:
+            self._compactor = VariantCompactor(
+                self.store,
+                self.database.engine,
+                target_file_bytes=self.config.variant_compaction_target_mb * 1024 * 1024,
+            )
+        return self._compactor
+
+    @property
+    def downsampler(self) -> Downsampler:
+        """Lazy access to the Downsampler of this workspace (keeps its result cache)."""
+        if self._downsampler is None:
+            self._downsampler = Downsampler(self.store, self.database.get_native_con, rollups=self.rollups)
+        return self._downsampler
+
+    @property
+    def rollups(self) -> VariantRollups:
+        """Lazy access to the VariantRollups of this workspace."""
+        if self._rollups is None:
+            self._rollups = VariantRollups(
+                self.store,
+                self.database.engine,
+                resolutions=self.config.variant_rollup_resolutions,
+                connect=self.database.get_native_con,
+            )
+        return self._rollups
+
+    @property
+    def recipe_journal(self) -> "RecipeJournal":
+        """Lazy access to the append-only RecipeJournal of this workspace."""
+        if self._recipe_journal is None:
+            from arbolab.core.recipes.journal import RecipeJournal  # noqa: PLC0415 (import cycle)
+            self._recipe_journal = RecipeJournal(self.layout.recipes_dir)
+        return self._recipe_journal
+
+    @property
+    def recipe_snapshots(self) -> "RecipeSnapshots":
+        """Lazy access to the database snapshots taken along the recipe."""
+        if self._recipe_snapshots is None:
+            from arbolab.core.recipes.snapshots import RecipeSnapshots  # noqa: PLC0415 (import cycle)
+            self._recipe_snapshots = RecipeSnapshots(
+                self.layout.snapshots_dir,
+                interval=self.config.recipe_snapshot_interval,
+                retention=self.config.recipe_snapshot_retention,
+            )
+        return self._recipe_snapshots
+
+    def import_metadata(self, package_path: Path, delete_removed: bool = False) -> dict[str, Any]:
         """
         Import an experiment metadata package.
-        Wrapper around MetadataImporter.
+        Wrapper around MetadataImporter; rows removed from the package are only
+        deleted with `delete_removed`.
         Enforces ADMIN role.
         """
         if self.role != LabRole.ADMIN:
              raise PermissionError("Only ADMINs can import metadata.")
-        return self.importer.import_package(package_path)
+        return self.importer.import_package(package_path, delete_removed=delete_removed)
 
-    def run_recipe(self, recipe_path: Path | None = None):
+    def validate_metadata(self, package_path: Path) -> dict[str, Any]:
+        """
+        Validate an experiment metadata package against its schema and the Lab database
+        without importing it. Returns the per-resource validation report.
+        """
+        return self.importer.validate_package(package_path)
+
+    def compact_variants(self, dry_run: bool = False) -> dict[str, Any]:
+        """
+        Merge small Parquet files of the workspace variants.
+        With `dry_run`, only report the expected file count and size reduction.
+        Enforces ADMIN role.
+        """
+        if self.role != LabRole.ADMIN:
+            raise PermissionError("Only ADMINs can compact variants.")
+        return self.compactor.compact(dry_run=dry_run)
+
+    def build_rollups(self, variant: DataVariant | int | None = None) -> dict[str, Any]:
+        """
+        Build or refresh the multi-resolution rollups (min/max/mean/count per channel)
+        of the `variant` DataVariant (or its id), or of every variant if None.
+        Rollups whose source is unchanged are skipped.
+        Enforces ADMIN role.
+        """
+        if self.role != LabRole.ADMIN:
+            raise PermissionError("Only ADMINs can build rollups.")
+        if variant is None:
+            return self.rollups.refresh()
+        results = self.rollups.build(variant)
+        built = sum(not r["skipped"] for r in results)
+        return {"variants": 1, "built": built, "skipped": len(results) - built}
+
+    def derive_variant(self,
+                       parent: DataVariant | int,
+                       transform: Transform,
+                       name: str,
+                       params: dict[str, Any] | None = None) -> dict[str, Any]:
+        """
+        Materialize a derived variant: `transform` (DuckDB SQL over `parent`, or a
+        LazyFrame callable) applied to the `parent` DataVariant (or its id).
+        Skipped if the parent content and transform spec are unchanged since the last run.
+        Enforces ADMIN role.
+        """
+        if self.role != LabRole.ADMIN:
+            raise PermissionError("Only ADMINs can derive variants.")
+        deriver = VariantDeriver(self.store, self.database.engine, self.database.get_native_con)
+        return deriver.derive(parent, transform, name, params)
+
+    def run_recipe(self,
+                   recipe_path: Path | None = None,
+                   batch_size: int = 500,
+                   discard_unrecorded: bool = False) -> "ReplayStats":
         """
         Execute a recipe.
+        Defaults to the workspace recipe journal; `recipe_path` may point to a recipe JSON file.
+
+        Steps are committed in batches of `batch_size`. A replay that was interrupted
+        resumes after the last committed step; if a snapshot of a later step of the
+        recipe exists, it is restored and only the steps after it are replayed. Steps
+        whose effect is already present are skipped. Replaying the workspace's own
+        recipe does not record it again.
+
+        Restoring a snapshot replaces the database file. As in `rebuild`, it is refused
+        if the database holds data variants the replayed steps do not define, unless
+        `discard_unrecorded` is set.
         """
         if self.role != LabRole.ADMIN:
             raise PermissionError("Only ADMINs can run recipes.")
             
         if recipe_path is None:
-            recipe_path = self.layout.recipe_path("current.json")
-            
-        if not recipe_path.exists():
-            raise FileNotFoundError(f"No recipe found at {recipe_path}")
-            
-        logger.info(f"Executing recipe from {recipe_path}")
+            if not self.recipe_journal.exists():
+                raise FileNotFoundError(f"No recipe found at {self.layout.recipes_dir}")
+            logger.info(f"Executing recipe from {self.recipe_journal.journal_dir}")
+            own_recipe = True
+        else:
+            if not recipe_path.exists():
+                raise FileNotFoundError(f"No recipe found at {recipe_path}")
+            logger.info(f"Executing recipe from {recipe_path}")
+            own_recipe = recipe_path.resolve() == self.recipe_journal.legacy_path.resolve()
+
         from arbolab.core.recipes.executor import RecipeExecutor
-        recipe = RecipeExecutor.load_recipe(self)
-        for step in recipe.steps:
-            if step.step_type == "open_lab":
-                continue
-            self.execute_step(step.step_type, step.params, step.author_id)
+        recipe = RecipeExecutor.load_recipe(self, recipe_path)
+        return self._replay(recipe, batch_size, record=not own_recipe, discard_unrecorded=discard_unrecorded)
+
+    def rebuild(self, batch_size: int = 500, discard_unrecorded: bool = False) -> "ReplayStats":
+        """
+        Discards the workspace database and reproduces it from the recipe journal,
+        starting at the newest snapshot (if any) and replaying only the remaining steps.
+
+        Data variants registered through the VariantStore are not recipe steps and
+        cannot be reproduced. If the database holds more data variants than the recipe
+        defines, the rebuild is refused unless `discard_unrecorded` is set.
+        """
+        if self.role != LabRole.ADMIN:
+            raise PermissionError("Only ADMINs can rebuild the workspace.")
+        if not self.recipe_journal.exists():
+            raise FileNotFoundError(f"No recipe found at {self.layout.recipes_dir}")
+
+        recipe = self.recipe_journal.load()
+        if not discard_unrecorded:
+            self._check_unrecorded_variants(recipe.steps, "a rebuild")
+
+        logger.info(f"Rebuilding database {self.layout.db_path} from recipe")
+        self.recipe_snapshots.wait()
+        self.database.close()
+        for path in (self.layout.db_path, self.layout.db_path.with_name(f"{self.layout.db_path.name}.wal")):
+            path.unlink(missing_ok=True)
+        self.database.connect()
+        self.plugin_runtime.initialize_plugins(self)
+        self._seed_catalog()
+        return self._replay(recipe, batch_size, record=False, fresh_database=True)
+
+    def _replay(self,
+                recipe: "Recipe",
+                batch_size: int,
+                record: bool,
+                fresh_database: bool = False,
+                discard_unrecorded: bool = False) -> "ReplayStats":
+        from arbolab.core.recipes.replay import RecipeReplayer  # noqa: PLC0415 (import cycle)
+        replayer = RecipeReplayer(self, batch_size=batch_size, record=record, discard_unrecorded=discard_unrecorded)
+        return replayer.run(recipe, fresh_database=fresh_database)
+
+    def _check_unrecorded_variants(self, steps: "Sequence[RecipeStep]", action: str) -> None:
+        """
+        Raises:
+            ValueError: If the database holds data variants that `steps` do not define,
+                which replacing the database by `action` would lose.
+        """
+        unrecorded = self._unrecorded_variants(steps)
+        if unrecorded:
+            raise ValueError(
+                f"{unrecorded} data variants were registered outside the recipe and would be "
+                f"lost by {action}; pass discard_unrecorded=True to proceed anyway."
+            )
+
+    def _unrecorded_variants(self, steps: "Sequence[RecipeStep]") -> int:
+        """Number of data variants in the database beyond those `steps` define."""
+        recorded = 0
+        for step in steps:
+            if step.step_type == "define_data_variant":
+                recorded += 1
+            elif step.step_type == "remove_data_variant":
+                recorded -= 1
+        with self.database.session() as session:
+            total = session.execute(select(func.count()).select_from(DataVariant)).scalar_one()
+        return max(0, int(total) - recorded)
 
     def execute_step(self, step_type: str, params: dict[str, Any], author_id: str | None = None) -> Any:
         """Executes a recipe step and records it."""
@@ -300,6 +538,32 @@ class Lab:
         from arbolab.core.recipes.executor import RecipeExecutor
         return RecipeExecutor.apply(self, step_type, params, author_id)
 
+    @contextmanager
+    def batch(self) -> Generator[Any, None, None]:
+        """
+        Groups recipe steps into one database transaction and one recipe append.
+
+            with lab.batch():
+                for row in rows:
+                    lab.define_sensor(**row)
+
+        If any step fails, the database and the recipe are rolled back together.
+        Steps that act outside the database (`import_metadata`, `modify_config`)
+        are rejected inside a batch.
+        """
+        if self.role != LabRole.ADMIN:
+             raise PermissionError("Operations that modify the Lab require ADMIN role.")
+        from arbolab.core.recipes.executor import RecipeExecutor  # noqa: PLC0415 (import cycle)
+        with RecipeExecutor.batch(self) as batch:
+            yield batch
+
+    def execute_steps(self,
+                      steps: Iterable[tuple[str, dict[str, Any]]],
+                      author_id: str | None = None) -> list[Any]:
+        """Executes `(step_type, params)` pairs as one batch. See `Lab.batch`."""
+        with self.batch():
+            return [self.execute_step(step_type, params, author_id) for step_type, params in steps]
+
     # --- Recipe-Aware CRUD Wrappers ---
     # These provide a clean API for the transpiler and frontend
 
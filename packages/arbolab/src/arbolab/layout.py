@@ -29,6 +29,10 @@ class WorkspaceLayout:
     def recipes_dir(self) -> Path:
         return self._root / "recipes"
 
+    @property
+    def snapshots_dir(self) -> Path:
+        return self.recipes_dir / "snapshots"
+
     @property
     def variants_dir(self) -> Path:
         return self._root / "storage" / "variants"
@@ -36,6 +40,10 @@ class WorkspaceLayout:
     @property
     def logs_dir(self) -> Path:
         return self._root / "logs"
+
+    @property
+    def tmp_dir(self) -> Path:
+        return self._root / "tmp"
         
     def recipe_path(self, name: str = "current.json") -> Path:
         return self.recipes_dir / name
@@ -60,7 +68,7 @@ class WorkspaceLayout:
             self.variants_dir.mkdir(parents=True, exist_ok=True)
             
         (self._root / "logs").mkdir(exist_ok=True)
-        (self._root / "tmp").mkdir(exist_ok=True)
+        self.tmp_dir.mkdir(exist_ok=True)
 
 class ResultsLayout:
     """
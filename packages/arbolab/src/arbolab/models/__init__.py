@@ -21,7 +21,7 @@ from arbolab.models.core import (
     TreeSpecies,
     UnitOfMeasurement,
 )
-from arbolab.models.sys import SysMetadata
+from arbolab.models.sys import ImportedRow, SysMetadata
 
 __all__ = [
     "Base",
@@ -31,6 +31,7 @@ __all__ = [
     "DatastreamChannel",
     "Experiment",
     "ExperimentalUnit",
+    "ImportedRow",
     "Location",
     "ObservedProperty",
     "Project",
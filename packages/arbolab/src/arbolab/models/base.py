@@ -12,6 +12,15 @@ from sqlalchemy.orm import DeclarativeBase, Mapped, declared_attr, mapped_column
 class Base(DeclarativeBase):
     """Declarative base for ArboLab SQLAlchemy models."""
 
+    @declared_attr.directive
+    def __mapper_args__(cls) -> dict[str, Any]:
+        """
+        Fetch server-generated values (id, timestamps) via INSERT ... RETURNING during
+        the flush instead of a follow-up SELECT per object. Not for UPDATE: DuckDB
+        rejects UPDATE ... RETURNING on tables with a primary key.
+        """
+        return {"eager_defaults": "auto"}
+
     def __repr__(self) -> str:
         """Machine-friendly string representation."""
         if hasattr(self, "id") and self.id is not None:
@@ -71,7 +80,7 @@ class _HasTableName(Protocol):
 class IdMixin:
     """Primary key mixin using an auto-incrementing integer identifier."""
 
-    @declared_attr.directive
+    @declared_attr
     def id(cls: type[_HasTableName]) -> Mapped[int]:
         """Primary key with a per-table sequence server default."""
 
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from sqlalchemy import String
+from sqlalchemy import BigInteger, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from arbolab.models.base import Base
@@ -15,3 +15,14 @@ class SysMetadata(Base):
 
     key: Mapped[str] = mapped_column(String, primary_key=True)
     value: Mapped[str] = mapped_column(String, nullable=False)
+
+
+class ImportedRow(Base):
+    """Content hash of a metadata package row as last imported (see ImportFingerprints)."""
+
+    __tablename__ = "core_sys_import_rows"
+
+    package: Mapped[str] = mapped_column(String, primary_key=True)
+    resource: Mapped[str] = mapped_column(String, primary_key=True)
+    row_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    row_hash: Mapped[int] = mapped_column(BigInteger, nullable=False)
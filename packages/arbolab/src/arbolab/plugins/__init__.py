@@ -45,7 +45,7 @@ class PluginRuntime:
     def __init__(self, registry: PluginRegistry):
         self.registry = registry
         
-    def initialize_plugins(self, lab):
+    def initialize_plugins(self, lab: Any) -> None:
         """
         Initializes all loaded plugins with the Lab instance.
         This allows plugins to register models, routes, etc.
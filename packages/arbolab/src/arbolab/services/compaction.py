@@ -0,0 +1,236 @@
+"""
+Compaction of partitioned data variants.
+
+Appending ingestion leaves one small Parquet file per partition interval (and per
+append run) under `variant=Z/`; scanning thousands of small files is dominated by
+opening files and reading footers. The compactor merges runs of consecutive small
+files of a variant into timestamp-sorted files of about `target_file_bytes`:
+
+1. The files of each run are read (sorted by the time column) and written to a new
+   file named after the first file of the run (see `VariantStore.merge_files`).
+2. `DataVariant.data_files` and the statistics of the variant are rewritten with the
+   merged files in one transaction.
+3. Only then are the files of the runs deleted.
+
+Each variant is compacted under its `VariantStore.variant_lock`, which partitioned
+writes take as well, from the file list re-read under that lock; a variant whose files
+on disk differ from the committed list (a write not committed yet) is left for the next
+compaction. Writes into a merged interval split the merged file into partition files
+again (see `VariantStore.write_partitioned`), which a later compaction merges again.
+
+`compact(dry_run=True)` only plans: it reports the expected file count and size
+reduction per variant (the size reduction is the footers of the merged files) without
+touching any file. `start(interval)` runs compactions periodically in a background
+thread of the workspace.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import pyarrow.parquet as pq
+from arbolab_logger import get_logger
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from arbolab.models.core import DataVariant
+from arbolab.store import ParquetLayout, VariantStore, stored_content_hash
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class CompactionPlan:
+    """Runs of small files of one variant to merge."""
+
+    variant_id: int
+    datastream_id: int
+    variant_name: str
+    time_column: str
+    files: list[Path]
+    runs: list[list[Path]] = field(default_factory=list)
+    bytes_before: int = 0
+    footer_bytes: int = 0
+
+    @property
+    def files_after(self) -> int:
+        return len(self.files) - sum(len(run) - 1 for run in self.runs)
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "datastream_id": self.datastream_id,
+            "variant_name": self.variant_name,
+            "files_before": len(self.files),
+            "files_after": self.files_after,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_before - self.footer_bytes,
+        }
+
+
+class VariantCompactor:
+    """Merges small files of partitioned variants (see module docstring)."""
+
+    def __init__(self,
+                 store: VariantStore,
+                 engine: Engine,
+                 target_file_bytes: int = 128 * 1024 * 1024,
+                 small_file_ratio: float = 0.5,
+                 layout: ParquetLayout | None = None):
+        """
+        Args:
+            store: Variant store of the workspace.
+            engine: Engine of the workspace database.
+            target_file_bytes: Size the merged files should reach.
+            small_file_ratio: Files smaller than `target_file_bytes * small_file_ratio`
+                are merged; larger files are left alone.
+            layout: Parquet layout of merged files (partitioning is not applied).
+        """
+        self.store = store
+        self.engine = engine
+        self.target_file_bytes = target_file_bytes
+        self.small_file_bytes = int(target_file_bytes * small_file_ratio)
+        self.layout = layout or ParquetLayout()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def plan(self, variant_id: int | None = None) -> list[CompactionPlan]:
+        """Plans the compaction of every variant (or of `variant_id`) with more than one file."""
+        query = select(
+            DataVariant.id, DataVariant.datastream_id, DataVariant.variant_name,
+            DataVariant.time_column, DataVariant.data_files,
+        )
+        if variant_id is not None:
+            query = query.where(DataVariant.id == variant_id)
+        with Session(self.engine) as session:
+            variants = session.execute(query).all()
+        plans = []
+        for row_id, datastream_id, variant_name, time_column, data_files in variants:
+            if not data_files or len(data_files) <= 1:
+                continue
+            files = [self.store.root / f for f in data_files]
+            plans.append(self._plan_variant(
+                CompactionPlan(row_id, datastream_id, variant_name, time_column, [f for f in files if f.exists()])
+            ))
+        return plans
+
+    def _plan_variant(self, plan: CompactionPlan) -> CompactionPlan:
+        # Greedy: consecutive small files are merged until a run reaches the target size
+        run: list[Path] = []
+        run_bytes = 0
+        for path in plan.files:
+            size = path.stat().st_size
+            plan.bytes_before += size
+            if size >= self.small_file_bytes or run_bytes + size > self.target_file_bytes:
+                self._close_run(plan, run)
+                run, run_bytes = [], 0
+            if size < self.small_file_bytes:
+                run.append(path)
+                run_bytes += size
+        self._close_run(plan, run)
+        return plan
+
+    @staticmethod
+    def _close_run(plan: CompactionPlan, run: list[Path]) -> None:
+        if len(run) <= 1:
+            return
+        plan.runs.append(run)
+        # Each merged file drops its footer (and the 8 byte trailer of the file)
+        plan.footer_bytes += sum(pq.read_metadata(path).serialized_size + 8 for path in run[1:])
+
+    def compact(self, dry_run: bool = False) -> dict[str, Any]:
+        """
+        Compacts all variants of the workspace.
+
+        Returns:
+            Report with per-variant `files_before/after` and `bytes_before/after`
+            (expected values for a dry run) and their totals.
+        """
+        with self._lock:
+            reports = []
+            for plan in self.plan():
+                if not plan.runs:
+                    continue
+                if dry_run:
+                    reports.append(plan.report())
+                    continue
+                compacted = self._compact_variant(plan.variant_id, plan.datastream_id, plan.variant_name)
+                if compacted is not None:
+                    reports.append(compacted.report())
+        totals = {
+            key: sum(r[key] for r in reports)
+            for key in ("files_before", "files_after", "bytes_before", "bytes_after")
+        }
+        if not dry_run:
+            logger.info(
+                f"Compacted {len(reports)} variants: {totals['files_before']} -> {totals['files_after']} files"
+            )
+        return {"dry_run": dry_run, "variants": reports, **totals}
+
+    def _compact_variant(self, variant_id: int, datastream_id: int, variant_name: str) -> CompactionPlan | None:
+        """
+        Merges the runs of a variant, planned again under its lock.
+
+        Returns:
+            The executed plan, or None if there was nothing to merge or the variant has
+            uncommitted writes.
+        """
+        with self.store.variant_lock(datastream_id, variant_name):
+            plans = self.plan(variant_id)
+            if not plans or not plans[0].runs or not self._is_committed(plans[0]):
+                return None
+            plan = plans[0]
+            merged = {run[0]: self.store.merge_files(run, plan.time_column, self.layout) for run in plan.runs}
+            replaced = {path for run in plan.runs for path in run}
+            files = [merged.get(path, path) for path in plan.files if path in merged or path not in replaced]
+            with Session(self.engine) as session:
+                self.store.register_variant(session, datastream_id, variant_name, files, plan.time_column)
+                session.commit()
+            for path in replaced:
+                path.unlink()
+        actual = sum(path.stat().st_size for path in files)
+        logger.debug(
+            f"Compacted variant {variant_name} of datastream {datastream_id}: "
+            f"{len(plan.files)} -> {len(files)} files, {plan.bytes_before} -> {actual} bytes"
+        )
+        return plan
+
+    def _is_committed(self, plan: CompactionPlan) -> bool:
+        """Whether the files of the variant on disk are the committed ones, with the committed content."""
+        with Session(self.engine) as session:
+            properties = session.scalars(select(DataVariant.properties).filter_by(id=plan.variant_id)).one()
+        hashes = (properties or {}).get("content_hashes") or {}
+        on_disk = set(plan.files[0].parent.glob("*.parquet"))
+        committed = on_disk == set(plan.files) and all(
+            stored_content_hash(path) == hashes.get(path.relative_to(self.store.root).as_posix())
+            for path in plan.files
+        )
+        if not committed:
+            logger.debug(f"Variant {plan.variant_name} of datastream {plan.datastream_id} has uncommitted writes; not compacted")
+        return committed
+
+    def start(self, interval_seconds: float) -> None:
+        """Runs `compact()` every `interval_seconds` in a background thread until `stop()`."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval_seconds,), name="arbolab-compaction", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the background thread, waiting for a running compaction to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval_seconds: float) -> None:
+        while not self._stop.wait(interval_seconds):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Background compaction failed: {e}")
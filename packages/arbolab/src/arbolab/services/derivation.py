@@ -0,0 +1,200 @@
+"""
+Materialization of derived data variants (`DerivedVariantMaterialized`).
+
+A derived variant is the result of a transform over a parent variant of the same
+datastream, e.g. a chain `raw -> filtered -> resampled -> detrended`. A transform is
+either
+
+- a DuckDB SQL query over the view `parent`, or
+- a callable `transform(lf: pl.LazyFrame, **params) -> pl.LazyFrame`.
+
+The transform runs lazily over the parent Parquet files (`DataVariant.data_files`,
+via `pl.scan_parquet` or DuckDB `read_parquet`), and its result is streamed batch by
+batch into `VariantStore.open_writer`, so memory stays bounded to one batch. SQL runs
+on the connection given to the deriver, e.g. a cursor of the workspace DuckDB instance
+(`WorkspaceDatabase.get_native_con`), whose memory, thread and temp directory limits
+then apply.
+
+Lineage is recorded in `DataVariant.properties["lineage"]`: the parent variant, the
+hash of the parent content (from the content hashes of its files), the transform
+spec and its hash. Deriving again with an unchanged parent and transform spec is a
+no-op, so re-running a processing chain only recomputes the stages downstream of a
+change. The spec of a callable is its qualified name, the hash of its source and
+`params`; state captured in closures is not part of it, so pass such values as `params`.
+"""
+
+import hashlib
+import inspect
+import json
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from typing import Any
+
+import duckdb
+import polars as pl
+import pyarrow as pa
+from arbolab_logger import get_logger
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from arbolab.database import NativeCursor
+from arbolab.models.core import Datastream, DataVariant
+from arbolab.store import VariantStore, stored_content_hash
+
+logger = get_logger(__name__)
+
+Transform = str | Callable[..., pl.LazyFrame]
+
+# Rows per batch streamed from a transform into the variant file
+BATCH_ROWS = 256_000
+
+
+class VariantDeriver:
+    """Derives variants from parent variants with lineage-based memoization."""
+
+    def __init__(self,
+                 store: VariantStore,
+                 engine: Engine,
+                 connect: Callable[[], duckdb.DuckDBPyConnection | NativeCursor] = duckdb.connect):
+        """
+        Args:
+            store: Variant store of the workspace.
+            engine: Engine of the workspace database.
+            connect: Opens the DuckDB connection SQL transforms run on (closed afterwards).
+        """
+        self.store = store
+        self.engine = engine
+        self._connect = connect
+
+    def derive(self,
+               parent: DataVariant | int,
+               transform: Transform,
+               name: str,
+               params: dict[str, Any] | None = None) -> dict[str, Any]:
+        """
+        Materializes `transform(parent)` as variant `name` of the parent's datastream.
+
+        Args:
+            parent: Parent variant (or its id).
+            transform: DuckDB SQL over the view `parent`, or a LazyFrame callable.
+            name: Name of the derived variant.
+            params: Keyword arguments of a callable transform (part of the spec).
+
+        Returns:
+            Stats with `variant_id`, `variant_name`, `row_count` and `skipped`
+            (True if the variant was up to date).
+        """
+        params = params or {}
+        spec = self._transform_spec(transform, params)
+        transform_hash = _sha256(spec)
+
+        with Session(self.engine) as session:
+            parent_id = parent if isinstance(parent, int) else parent.id
+            source = session.get(DataVariant, parent_id)
+            if source is None:
+                raise ValueError(f"Parent variant {parent_id} not found.")
+            if source.variant_name == name:
+                raise ValueError(f"Derived variant must not replace its parent '{name}'.")
+            parent_hash = variant_content_hash(self.store, source)
+
+            existing = session.scalars(
+                select(DataVariant).filter_by(datastream_id=source.datastream_id, variant_name=name)
+            ).first()
+            lineage = (existing.properties or {}).get("lineage", {}) if existing is not None else {}
+            if (
+                existing is not None
+                and parent_hash is not None
+                and lineage.get("parent_hash") == parent_hash
+                and lineage.get("transform_hash") == transform_hash
+                and all((self.store.root / f).exists() for f in existing.data_files or [])
+            ):
+                logger.debug(f"Derived variant {name} of datastream {source.datastream_id} is up to date.")
+                return {"variant_id": existing.id, "variant_name": name, "row_count": existing.row_count, "skipped": True}
+
+            datastream = session.get_one(Datastream, source.datastream_id)
+            with (
+                self._execute(source, transform, params) as (schema, batches),
+                self.store.open_writer(
+                    datastream.sensor_deployment.experiment.project_id,
+                    source.datastream_id,
+                    name,
+                    schema=schema,
+                    clobber=True,
+                    session=session,
+                    time_column=source.time_column,
+                    column_specs=source.column_specs,
+                ) as writer,
+            ):
+                writer.write_all(batches)
+            session.flush()
+            variant = session.scalars(
+                select(DataVariant).filter_by(datastream_id=source.datastream_id, variant_name=name)
+            ).one()
+            variant.properties = {
+                **(variant.properties or {}),
+                "lineage": {
+                    "parent_variant_id": source.id,
+                    "parent_variant_name": source.variant_name,
+                    "parent_hash": parent_hash,
+                    "transform": spec,
+                    "transform_hash": transform_hash,
+                    "materialized_at": datetime.now(UTC).replace(tzinfo=None).isoformat(),
+                },
+            }
+            session.commit()
+            logger.info(f"Materialized variant {name} from {source.variant_name} ({variant.row_count} rows)")
+            return {"variant_id": variant.id, "variant_name": name, "row_count": variant.row_count, "skipped": False}
+
+    @contextmanager
+    def _execute(self,
+                 source: DataVariant,
+                 transform: Transform,
+                 params: dict[str, Any]) -> Iterator[tuple[pa.Schema, Iterable[pa.RecordBatch | pl.DataFrame]]]:
+        """The Arrow schema and the batches of the result, streamed while the context is open."""
+        files = [str(self.store.root / f) for f in source.data_files or []]
+        if not files:
+            raise ValueError(f"Parent variant {source.variant_name} has no data files.")
+        if isinstance(transform, str):
+            con = self._connect()
+            try:
+                con.read_parquet(files).create_view("parent")  # type: ignore[arg-type]  # stubs miss the list form
+                reader = con.sql(transform).record_batch(BATCH_ROWS)
+                yield reader.schema, reader
+            finally:
+                con.close()
+            return
+        lf = transform(pl.scan_parquet(files), **params)
+        yield pl.DataFrame(schema=lf.collect_schema()).to_arrow().schema, lf.collect_batches(chunk_size=BATCH_ROWS)
+
+    @staticmethod
+    def _transform_spec(transform: Transform, params: dict[str, Any]) -> dict[str, Any]:
+        if isinstance(transform, str):
+            return {"kind": "sql", "sql": transform.strip()}
+        try:
+            source = inspect.getsource(transform)
+        except (OSError, TypeError):
+            source = ""
+        return {
+            "kind": "polars",
+            "function": f"{transform.__module__}.{transform.__qualname__}",
+            "source_hash": hashlib.sha256(source.encode()).hexdigest(),
+            "params": params,
+        }
+
+
+def variant_content_hash(store: VariantStore, variant: DataVariant) -> str | None:
+    """Hash of the content of `variant` (None if a file has no content hash)."""
+    hashes = (variant.properties or {}).get("content_hashes") or {}
+    digests = []
+    for f in variant.data_files or []:
+        digest = hashes.get(f) or stored_content_hash(store.root / f)
+        if digest is None:
+            return None
+        digests.append([f, digest])
+    return _sha256(digests)
+
+
+def _sha256(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
@@ -0,0 +1,233 @@
+"""
+Server-side downsampling of data variants for plots.
+
+A plot `width` pixels wide cannot show more than a few points per pixel, so instead
+of the raw series each channel is reduced in DuckDB to a handful of points per pixel
+bucket of the requested time range:
+
+- `minmax`: per bucket the minimum and the maximum of the channel (with their
+  timestamps), i.e. up to two points per pixel. The drawn line covers exactly the
+  same vertical extent as the raw series.
+- `lttb`: Largest-Triangle-Three-Buckets over a min-max preselection of two buckets
+  per pixel (MinMaxLTTB), i.e. `width` points per channel. The preselection runs in
+  DuckDB; the LTTB pass over the few thousand preselected points runs in Python.
+
+With `rollups`, the min-max query reads the coarsest up-to-date rollup variant (see
+`VariantRollups`) whose resolution is not coarser than a bucket, using its `c_min` and
+`c_max` columns, instead of scanning the raw variant.
+
+Results are cached per (variant content, columns, time range, width, method) in a
+bounded LRU cache. The key contains the content hashes of the variant files, so a
+rewritten variant is never served from the cache.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Literal
+
+import duckdb
+import polars as pl
+from arbolab_logger import get_logger
+
+from arbolab.database import NativeCursor
+from arbolab.models.core import DataVariant
+from arbolab.services.variant_reader import TimeRange, VariantReader, quote_identifier
+from arbolab.store import VariantStore
+
+if TYPE_CHECKING:
+    from arbolab.services.rollups import VariantRollups
+
+logger = get_logger(__name__)
+
+Method = Literal["minmax", "lttb"]
+
+
+class Downsampler:
+    """Downsamples variant channels per pixel bucket, with an LRU result cache."""
+
+    def __init__(self,
+                 store: VariantStore,
+                 connect: Callable[[], duckdb.DuckDBPyConnection | NativeCursor],
+                 cache_size: int = 256,
+                 rollups: "VariantRollups | None" = None):
+        """
+        Args:
+            store: Variant store of the workspace.
+            connect: Opens the DuckDB connection a query runs on (closed afterwards).
+            cache_size: Number of downsampled results to keep.
+            rollups: Rollups to read instead of raw variants where their resolution suffices.
+        """
+        self.store = store
+        self.rollups = rollups
+        self._connect = connect
+        self._cache: OrderedDict[tuple[Any, ...], dict[str, pl.DataFrame]] = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def downsample(self,
+                   variant: DataVariant,
+                   columns: list[str] | None = None,
+                   time_range: TimeRange | None = None,
+                   width: int = 1_000,
+                   method: Method = "minmax") -> dict[str, pl.DataFrame]:
+        """
+        Downsampled channels of `variant` for a plot `width` pixels wide.
+
+        Args:
+            variant: The variant to read.
+            columns: Numeric channels to downsample; all numeric columns if None.
+            time_range: Half-open range `[start, end)`; defaults to the variant's time range.
+            width: Viewport width in pixels (number of buckets).
+            method: `minmax` or `lttb` (see module docstring).
+
+        Returns:
+            Channel name -> frame of (time column, channel) points, sorted by time.
+        """
+        if width < 1:
+            raise ValueError("Width must be positive.")
+        start, end = time_range or (None, None)
+        key = (
+            variant.id,
+            tuple(sorted(((variant.properties or {}).get("content_hashes") or {}).items(), key=lambda kv: kv[0])),
+            tuple(variant.data_files or ()),
+            tuple(columns) if columns is not None else None,
+            start, end, width, method,
+        )
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        con = self._connect()
+        try:
+            result = self._downsample(con, variant, columns, (start, end), width, method)
+        finally:
+            con.close()
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        """Drops all cached results."""
+        with self._lock:
+            self._cache.clear()
+
+    def _downsample(self,  # noqa: PLR0913, PLR0917
+                    con: duckdb.DuckDBPyConnection | NativeCursor,
+                    variant: DataVariant,
+                    columns: list[str] | None,
+                    time_range: TimeRange,
+                    width: int,
+                    method: Method) -> dict[str, pl.DataFrame]:
+        time_column = variant.time_column
+        sql, params, selected = VariantReader(self.store, con).source_query(variant, columns, time_range)
+        channels = [
+            name for name, dtype in selected.items()
+            if name != time_column and dtype.is_numeric()
+        ]
+        if columns is not None and len(channels) != len([c for c in columns if c != time_column]):
+            raise ValueError(f"Only numeric columns can be downsampled: {columns}")
+        start, end = self._bounds(con, variant, sql, params, time_range)
+        if start is None or end is None or not channels:
+            return {name: pl.DataFrame(schema={time_column: pl.Datetime("us"), name: pl.Float64}) for name in channels}
+
+        buckets = width if method == "minmax" else 2 * width
+        extremes = {name: (name, name) for name in channels}
+        rollup = self.rollups.select(variant, (end - start) / buckets) if self.rollups is not None else None
+        if rollup is not None and set(channels) <= set((rollup.properties or {})["rollup"]["channels"]):
+            extremes = {name: (f"{name}_min", f"{name}_max") for name in channels}
+            sql, params, _ = VariantReader(self.store, con).source_query(
+                rollup, [c for pair in extremes.values() for c in pair], time_range
+            )
+            logger.debug(f"Downsampling variant {variant.variant_name} from rollup {rollup.variant_name}")
+        frame = self._min_max(con, sql, params, time_column, extremes, start, end, buckets)
+        result = {}
+        for name in channels:
+            points = pl.concat([
+                frame.select(pl.col(f"{name}__tmin").alias(time_column), pl.col(f"{name}__min").alias(name)),
+                frame.select(pl.col(f"{name}__tmax").alias(time_column), pl.col(f"{name}__max").alias(name)),
+            ]).drop_nulls().unique(time_column).sort(time_column)
+            if method == "lttb" and points.height > width:
+                points = points[_lttb(points[time_column].dt.epoch("us").to_list(), points[name].cast(pl.Float64).to_list(), width)]
+            result[name] = points
+        return result
+
+    @staticmethod
+    def _bounds(con: duckdb.DuckDBPyConnection | NativeCursor,
+                variant: DataVariant,
+                sql: str,
+                params: list[Any],
+                time_range: TimeRange) -> tuple[datetime | None, datetime | None]:
+        start, end = time_range
+        if start is None:
+            start = variant.first_timestamp
+        if end is None and variant.last_timestamp is not None:
+            end = variant.last_timestamp + timedelta(microseconds=1)
+        if start is None or end is None:
+            column = quote_identifier(variant.time_column)
+            row = con.execute(f"SELECT min({column}), max({column}) FROM ({sql})", params).fetchone()
+            assert row is not None
+            first, last = row
+            start = start or first
+            end = end or (last + timedelta(microseconds=1) if last is not None else None)
+        return start, end
+
+    @staticmethod
+    def _min_max(con: duckdb.DuckDBPyConnection | NativeCursor,  # noqa: PLR0913, PLR0917
+                 sql: str,
+                 params: list[Any],
+                 time_column: str,
+                 extremes: dict[str, tuple[str, str]],
+                 start: datetime,
+                 end: datetime,
+                 buckets: int) -> pl.DataFrame:
+        # Pixel bucket of each row: its offset in the range, scaled to `buckets`
+        span = max(1, int((end - start) / timedelta(microseconds=1)))
+        t = quote_identifier(time_column)
+        # `extremes` maps each channel to the columns holding its minima and maxima
+        aggregates = ", ".join(
+            f"arg_min({t}, {quote_identifier(low)}) AS {quote_identifier(c + '__tmin')}, "
+            f"min({quote_identifier(low)}) AS {quote_identifier(c + '__min')}, "
+            f"arg_max({t}, {quote_identifier(high)}) AS {quote_identifier(c + '__tmax')}, "
+            f"max({quote_identifier(high)}) AS {quote_identifier(c + '__max')}"
+            for c, (low, high) in extremes.items()
+        )
+        query = (
+            f"SELECT least({buckets - 1}, CAST(floor((epoch_us({t}) - epoch_us(CAST(? AS TIMESTAMP))) "
+            f"* {buckets} / {span}) AS BIGINT)) AS _bucket, {aggregates} "
+            f"FROM ({sql}) WHERE {t} >= ? AND {t} < ? GROUP BY _bucket ORDER BY _bucket"
+        )
+        return con.execute(query, [start, *params, start, end]).pl()
+
+
+def _lttb(times: list[int], values: list[float], threshold: int) -> list[int]:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps (`threshold` >= 3)."""
+    n = len(times)
+    if threshold >= n or threshold < 3:  # noqa: PLR2004
+        return list(range(n))
+    selected = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_t = sum(times[next_start:next_end]) / max(1, next_end - next_start)
+        avg_v = sum(values[next_start:next_end]) / max(1, next_end - next_start)
+
+        best, best_area = -1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs(
+                (times[a] - avg_t) * (values[j] - values[a]) - (times[a] - times[j]) * (avg_v - values[a])
+            )
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
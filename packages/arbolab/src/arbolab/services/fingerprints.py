@@ -0,0 +1,218 @@
+"""
+Fingerprints of imported metadata packages, for incremental re-imports.
+
+A package is identified by its name and its resolved directory (`<name>@<path>`), so
+two packages of the same name in different places never diff against each other;
+moving a package makes its next import write every row once.
+
+Per resource file, in `core_sys_metadata` (key `import_file:<package>:<resource>`):
+size, mtime and SHA-256 of the CSV plus its row count. A file whose size and mtime are
+unchanged is not even hashed; a file whose content hash is unchanged is not read.
+
+Per row, in `core_sys_import_rows`: a 64-bit hash of the model columns of the row,
+keyed by package, resource and row id. The rows of a changed file are diffed against
+these hashes: only new and changed rows are written, and the ids of rows that
+disappeared from the package are reported. Deleting them is up to the caller, and
+only removes rows no other package has imported.
+
+Row hashes are Polars hashes of the values as read from the CSV. They are stable for
+a given Polars version and read mode only, so after a Polars upgrade (or switching to
+the streaming import, which reads every cell as text) each row is rewritten once.
+
+The row-level operations run on the DuckDB connection of the session.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+from sqlalchemy import Table, text
+from sqlalchemy.orm import Session
+
+from arbolab.models.sys import ImportedRow, SysMetadata
+
+# Columns added to the frame while diffing
+_ROW_HASH = "_arbolab_row_hash"
+_STORED_HASH = "_arbolab_stored_hash"
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """Size, mtime and content hash of a resource file, and its row count once imported."""
+
+    size: int
+    mtime_ns: int
+    sha256: str
+    rows: int | None = None
+
+    @classmethod
+    def of(cls, path: Path, previous: FileFingerprint | None = None) -> FileFingerprint:
+        """
+        Fingerprint of `path`. The content is only hashed if size or mtime differ
+        from `previous`.
+        """
+        stat = path.stat()
+        if previous is not None and (previous.size, previous.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return previous
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        return cls(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=digest.hexdigest())
+
+
+@dataclass
+class RowDiff:
+    """New and changed rows of a resource, and the ids of rows no longer in it."""
+
+    changed: pl.LazyFrame
+    hashes: pl.DataFrame
+    deleted: pl.DataFrame
+    created: int
+    updated: int
+    skipped: int
+
+
+class ImportFingerprints:
+    """Reads and writes the fingerprints of one metadata package."""
+
+    FILE_KEY_PREFIX = "import_file"
+
+    def __init__(self, name: str, source: Path):
+        """
+        Args:
+            name: Name of the package (`datapackage.json` `name`).
+            source: Directory of the package.
+        """
+        self.package = f"{name}@{source.resolve()}"
+
+    def _file_key(self, resource: str) -> str:
+        return f"{self.FILE_KEY_PREFIX}:{self.package}:{resource}"
+
+    def load_file(self, session: Session, resource: str) -> FileFingerprint | None:
+        meta = session.get(SysMetadata, self._file_key(resource))
+        if meta is None:
+            return None
+        try:
+            return FileFingerprint(**json.loads(meta.value))
+        except (TypeError, ValueError):
+            return None
+
+    def save_file(self, session: Session, resource: str, fingerprint: FileFingerprint) -> None:
+        session.execute(
+            text(
+                "INSERT INTO core_sys_metadata (key, value) VALUES (:key, :value) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+            ),
+            {"key": self._file_key(resource), "value": json.dumps(asdict(fingerprint))},
+        )
+
+    def forget_file(self, session: Session, resource: str) -> None:
+        """Drops the file fingerprint, so the next import diffs the resource again."""
+        session.execute(
+            text("DELETE FROM core_sys_metadata WHERE key = :key"), {"key": self._file_key(resource)}
+        )
+
+    def diff(self, session: Session, resource: str, lf: pl.LazyFrame, columns: list[str]) -> RowDiff:
+        """
+        Compares the rows of `lf` (keyed by `id`) with the stored row hashes.
+
+        Args:
+            session: Session on the workspace database.
+            resource: Resource name.
+            lf: The resource rows.
+            columns: Columns that make up the row hash (the model columns of the frame).
+        """
+        id_dtype = lf.collect_schema()["id"]
+        stored = self._driver(session).execute(
+            f"SELECT row_id AS id, row_hash AS {_STORED_HASH} FROM {ImportedRow.__tablename__} "
+            "WHERE package = ? AND resource = ?",
+            [self.package, resource],
+        ).pl().with_columns(pl.col("id").cast(id_dtype, strict=False))
+
+        row_hash = pl.struct(sorted(columns)).hash(seed=0).reinterpret(signed=True)
+        joined = lf.with_columns(row_hash.alias(_ROW_HASH)).join(stored.lazy(), on="id", how="left")
+        is_new = pl.col(_STORED_HASH).is_null()
+        is_changed = is_new | (pl.col(_STORED_HASH) != pl.col(_ROW_HASH))
+
+        counts = joined.select(
+            is_new.sum().alias("created"),
+            (is_changed & ~is_new).sum().alias("updated"),
+            (~is_changed).sum().alias("skipped"),
+        ).collect(engine="streaming").row(0, named=True)
+        changed = joined.filter(is_changed)
+        return RowDiff(
+            changed=changed.drop(_ROW_HASH, _STORED_HASH),
+            hashes=changed.select("id", _ROW_HASH).drop_nulls("id").collect(engine="streaming"),
+            deleted=stored.lazy().join(lf.select("id"), on="id", how="anti").select("id")
+            .collect(engine="streaming"),
+            **counts,
+        )
+
+    def save_rows(self, session: Session, resource: str, hashes: pl.DataFrame) -> None:
+        """Stores the hashes of written rows (`id` and the row hash column of a `RowDiff`)."""
+        if hashes.is_empty():
+            return
+        view = "_arbolab_import_hashes"
+        driver = self._driver(session)
+        driver.register(view, hashes.select(pl.col("id").cast(pl.Int64, strict=False), _ROW_HASH).drop_nulls())
+        try:
+            session.execute(
+                text(
+                    f"INSERT INTO {ImportedRow.__tablename__} (package, resource, row_id, row_hash) "
+                    f"SELECT :package, :resource, id, {_ROW_HASH} FROM {view} "
+                    "ON CONFLICT (package, resource, row_id) DO UPDATE SET row_hash = excluded.row_hash"
+                ),
+                {"package": self.package, "resource": resource},
+            )
+        finally:
+            driver.unregister(view)
+
+    def delete_rows(self, session: Session, resource: str, table: Table, ids: pl.DataFrame) -> int:
+        """
+        Deletes the rows with `ids` from `table` together with their hashes. Rows that
+        another package has imported too are kept; only this package's hashes are dropped.
+
+        Returns:
+            The number of rows deleted from `table`.
+        """
+        if ids.is_empty():
+            return 0
+        view = "_arbolab_import_deleted"
+        driver = self._driver(session)
+        driver.register(view, ids.select(pl.col("id").cast(pl.Int64, strict=False)).drop_nulls())
+        try:
+            owned = driver.execute(
+                f"SELECT count(*) FROM {view} WHERE id NOT IN ("
+                f"SELECT row_id FROM {ImportedRow.__tablename__} WHERE resource = ? AND package <> ?)",
+                [resource, self.package],
+            ).fetchone()[0]
+            session.execute(
+                text(
+                    f"DELETE FROM {table.name} WHERE id IN (SELECT id FROM {view}) AND id NOT IN ("
+                    f"SELECT row_id FROM {ImportedRow.__tablename__} WHERE resource = :resource "
+                    "AND package <> :package)"
+                ),
+                {"package": self.package, "resource": resource},
+            )
+            session.execute(
+                text(
+                    f"DELETE FROM {ImportedRow.__tablename__} WHERE package = :package "
+                    f"AND resource = :resource AND row_id IN (SELECT id FROM {view})"
+                ),
+                {"package": self.package, "resource": resource},
+            )
+        finally:
+            driver.unregister(view)
+        return int(owned)
+
+    @staticmethod
+    def _driver(session: Session) -> Any:
+        driver = session.connection().connection.driver_connection
+        assert driver is not None
+        return driver
@@ -3,16 +3,31 @@ Service for importing experiment metadata packages.
 """
 
 import json
+import os
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from pathlib import Path
-from typing import Any
+from typing import Any, ClassVar
 
 import polars as pl
 from arbolab_logger import get_logger
-from sqlalchemy import insert
+from sqlalchemy import (
+    ColumnDefault,
+    DefaultClause,
+    String,
+    Table,
+    UniqueConstraint,
+    bindparam,
+    insert,
+    text,
+)
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.engine import Engine
 from sqlalchemy.inspection import inspect
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import BindParameter
 
 from arbolab.models.core import (
     Experiment,
@@ -23,6 +38,8 @@ from arbolab.models.core import (
     Thing,
     Treatment,
 )
+from arbolab.services.fingerprints import FileFingerprint, ImportFingerprints
+from arbolab.services.validation import PackageValidationError, PackageValidator
 
 logger = get_logger(__name__)
 
@@ -33,113 +50,382 @@ class MetadataImporter:
     into the workspace database.
     """
 
-    def __init__(self, engine: Engine):
+    # Resource name -> model, in the order the resources are written.
+    # Order matters for foreign keys!
+    # 1. Projects
+    # 2. Things, Treatments -> Project
+    # 3. Experiments -> Project
+    # 4. Experimental Units -> Project, Thing
+    # 5. Sensors -> Project
+    # 6. Sensor Deployments -> Experiment, Sensor, ExpUnit
+    RESOURCE_MODELS: ClassVar[dict[str, type]] = {
+        "projects": Project,
+        "things": Thing,
+        "treatments": Treatment,
+        "experiments": Experiment,
+        "experimental_units": ExperimentalUnit,
+        "sensors": Sensor,
+        "sensor_deployments": SensorDeployment,
+    }
+
+    def __init__(self, engine: Engine, read_workers: int | None = None, batch_size: int | None = None):
+        """
+        Args:
+            engine: Engine of the workspace database.
+            read_workers: Threads parsing resource CSVs concurrently; defaults to one per CPU.
+            batch_size: Stream each resource in batches of this many rows instead of
+                loading it at once, bounding memory regardless of the file size.
+        """
         self.engine = engine
+        self.read_workers = read_workers
+        self.batch_size = batch_size
 
-    def import_package(self, package_path: Path) -> dict[str, Any]:
+    def import_package(self,
+                       package_path: Path,
+                       validate: bool = True,
+                       incremental: bool = True,
+                       delete_removed: bool = False) -> dict[str, Any]:
         """
         Orchestrates the import of a data package found at `package_path`.
-        
+
+        Every resource is read once; the CSVs are parsed concurrently while the writes
+        happen one resource after another in foreign key order. Unless `validate` is
+        False, the loaded resources are validated first (see `services/validation.py`)
+        and nothing is written if any check fails.
+
+        With a `batch_size`, resources are scanned instead of loaded: validation runs as
+        streaming queries over the CSVs and each resource is read and written batch by
+        batch within one transaction (its parse time then counts as `write_seconds`).
+
+        Re-imports are incremental on DuckDB (see `services/fingerprints.py`): files
+        whose content did not change since the last import of the package (same name
+        and directory) are skipped without being read, and of a changed file only new
+        and changed rows are written. Rows removed from the package are kept and
+        reported as `removed` unless `delete_removed` is set. Pass `incremental=False`
+        to rewrite every row, e.g. after editing imported rows.
+
         Args:
             package_path: Path to the `datapackage.json` file.
-            
+            validate: Validate the package before importing it.
+            incremental: Skip unchanged files and rows.
+            delete_removed: Delete rows this package imported earlier but no longer
+                contains (children before parents), unless another package imported them
+                too. Unchanged files are then diffed as well.
+
         Returns:
-            A summary dictionary of imported records.
+            A summary dictionary of imported records per resource, including the
+            seconds spent reading (`read_seconds`) and writing (`write_seconds`) it.
+            Incremental imports also report `created`, `updated`, `skipped`, `deleted`
+            and `removed` (kept) rows.
+
+        Raises:
+            PackageValidationError: The package failed validation; `.report` holds the details.
         """
+        base_dir, package_spec = self._read_package_spec(package_path)
+        package = package_spec.get("name") or base_dir.name
+        logger.info(f"Importing package '{package}' from {base_dir}")
+
+        resources = {r["name"]: r for r in package_spec.get("resources", [])}
+        names = [name for name in self.RESOURCE_MODELS if name in resources]
+        fingerprints = ImportFingerprints(package, base_dir)
+        files: dict[str, tuple[FileFingerprint | None, FileFingerprint]] = {}
+        if incremental and self.engine.dialect.name == "duckdb":
+            files = self._file_fingerprints(base_dir, resources, fingerprints)
+        # The stored fingerprint of each resource whose file content did not change;
+        # deleting removed rows diffs every resource
+        unchanged = {
+            name: previous for name, (previous, current) in files.items()
+            if previous is not None and previous.sha256 == current.sha256 and not delete_removed
+        }
+
+        loaded = self._load_resources(base_dir, {n: resources[n] for n in names if n not in unchanged})
+        frames = {name: df for name, (df, _) in loaded.items() if not isinstance(df, dict)}
+
+        if validate:
+            start = time.perf_counter()
+            report = self._validator().validate(resources, frames)
+            logger.debug(f"Validated package in {time.perf_counter() - start:.2f}s")
+            if not report["valid"]:
+                raise PackageValidationError(report)
+
+        stats: dict[str, dict[str, Any]] = {}
+        deletions: dict[str, pl.DataFrame] = {}
+        for name in names:
+            start = time.perf_counter()
+            df, read_seconds = loaded.get(name, (None, 0.0))
+            if name in unchanged:
+                result = self._skip_unchanged(fingerprints, name, unchanged[name], files[name][1])
+            elif isinstance(df, dict):
+                result = df
+            elif name in files and df is not None:
+                result, deleted = self._import_incremental(fingerprints, name, df, files[name][1])
+                if deleted is not None and not deleted.is_empty():
+                    deletions[name] = deleted
+            else:
+                result = self._import_resource(base_dir, resources[name], self.RESOURCE_MODELS[name], frame=df)
+            stats[name] = {**result, "read_seconds": read_seconds, "write_seconds": time.perf_counter() - start}
+
+        if not delete_removed:
+            for name, ids in deletions.items():
+                logger.info(f"Kept {ids.height} {name} rows removed from the package (see delete_removed)")
+                stats[name]["removed"] = ids.height
+            return stats
+        # Children before parents
+        for name in reversed(list(deletions)):
+            stats[name].update(self._delete_rows(fingerprints, name, deletions[name]))
+        return stats
+
+    def validate_package(self, package_path: Path) -> dict[str, Any]:
+        """
+        Validates a data package without importing it.
+
+        Returns:
+            The per-resource validation report, see `PackageValidator.validate`.
+        """
+        base_dir, package_spec = self._read_package_spec(package_path)
+        resources = {r["name"]: r for r in package_spec.get("resources", [])}
+        loaded = self._load_resources(base_dir, resources)
+        frames = {name: df for name, (df, _) in loaded.items() if not isinstance(df, dict)}
+        return self._validator().validate(resources, frames)
+
+    def _validator(self) -> PackageValidator:
+        return PackageValidator(self.engine, self.RESOURCE_MODELS)
+
+    @staticmethod
+    def _read_package_spec(package_path: Path) -> tuple[Path, dict[str, Any]]:
         package_path = Path(package_path).resolve()
         if not package_path.exists() or package_path.name != "datapackage.json":
             raise FileNotFoundError(f"Invalid package path: {package_path}")
 
-        base_dir = package_path.parent
-        
         with open(package_path) as f:
             package_spec = json.load(f)
+        return package_path.parent, package_spec
 
-        logger.info(f"Importing package '{package_spec.get('name')}' from {base_dir}")
-        
-        stats = {}
-        
-        # Order matters for foreign keys!
-        # 1. Projects
-        # 2. Things, Treatments -> Project
-        # 3. Experiments -> Project
-        # 4. Experimental Units -> Project, Thing
-        # 5. Sensors -> Project
-        # 6. Sensor Deployments -> Experiment, Sensor, ExpUnit
-        
-        # Mapping resource name to Model and import logic
-        resources = {r["name"]: r for r in package_spec.get("resources", [])}
-        
-        # We manually sequence the import steps to satisfy FK constraints
-        
-        # 1. Projects
-        if "projects" in resources:
-            stats["projects"] = self._import_resource(
-                base_dir, resources["projects"], Project,
-                primary_keys=["name"] # Logical key, though ID is PK. We might need a better strategy for ID assignment if not in CSV.
-                # Ideally CSV has IDs or valid natural keys. 
-                # For MVP, we assume CSVs might have IDs or we generate them? 
-                # Let's assume CSV exports include IDs for stability or we rely on some unique constraint.
-                # US-002 implies we generate template. 
-                # Let's assume for now we upsert based on ID if present, or some unique field.
-                # Arbolab models use integer IDs.
-                # If the external package is the source of truth, it should probably provide the IDs or stable UUIDs.
-                # Our models use `id` (int). 
+    def _load_resources(self,
+                        base_dir: Path,
+                        resources: dict[str, dict[str, Any]]) -> dict[str, tuple[pl.DataFrame | pl.LazyFrame | dict[str, Any], float]]:
+        """
+        Reads the CSV of every importable resource on a thread pool (Polars releases the
+        GIL while parsing).
+
+        Returns:
+            The frame (or status dictionary of a failed read) and the seconds spent
+            reading it, per resource name in write order.
+        """
+        names = [name for name in self.RESOURCE_MODELS if name in resources]
+        if not names:
+            return {}
+
+        def read(name: str) -> tuple[pl.DataFrame | pl.LazyFrame | dict[str, Any], float]:
+            start = time.perf_counter()
+            df = self._read_resource(base_dir, resources[name])
+            return df, time.perf_counter() - start
+
+        workers = min(len(names), self.read_workers or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arbolab-csv") as pool:
+            return dict(zip(names, pool.map(read, names), strict=True))
+
+    def _file_fingerprints(self,
+                           base_dir: Path,
+                           resources: dict[str, dict[str, Any]],
+                           fingerprints: ImportFingerprints) -> dict[str, tuple[FileFingerprint | None, FileFingerprint]]:
+        """
+        The stored and the current fingerprint of every existing resource file; files
+        are hashed concurrently, and only if their size or mtime changed.
+        """
+        paths = {
+            name: base_dir / resources[name]["path"]
+            for name in self.RESOURCE_MODELS
+            if name in resources and resources[name].get("path") and (base_dir / resources[name]["path"]).exists()
+        }
+        if not paths:
+            return {}
+        with Session(self.engine) as session:
+            previous = {name: fingerprints.load_file(session, name) for name in paths}
+
+        workers = min(len(paths), self.read_workers or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arbolab-hash") as pool:
+            current = pool.map(lambda name: FileFingerprint.of(paths[name], previous[name]), paths)
+            return {name: (previous[name], fp) for name, fp in zip(paths, current, strict=True)}
+
+    def _skip_unchanged(self,
+                        fingerprints: ImportFingerprints,
+                        name: str,
+                        previous: FileFingerprint,
+                        current: FileFingerprint) -> dict[str, Any]:
+        """Summary of a resource whose file content is unchanged since the last import."""
+        if current is not previous:
+            # Touched but identical: remember the new mtime to skip hashing next time
+            with Session(self.engine) as session:
+                fingerprints.save_file(session, name, replace(current, rows=previous.rows))
+                session.commit()
+        logger.debug(f"Resource {name} is unchanged since the last import")
+        rows = previous.rows or 0
+        return {"status": "unchanged", "created": 0, "updated": 0, "skipped": rows, "deleted": 0, "removed": 0}
+
+    def _import_incremental(self,
+                            fingerprints: ImportFingerprints,
+                            name: str,
+                            frame: pl.DataFrame | pl.LazyFrame,
+                            file_fp: FileFingerprint) -> tuple[dict[str, Any], pl.DataFrame | None]:
+        """
+        Writes the new and changed rows of a resource and stores their fingerprints in
+        the same transaction. A failing write (e.g. a changed foreign key, see
+        `_write_frame`) stores no fingerprints, so its rows are diffed again next time.
+
+        Returns:
+            The resource summary and the ids of rows that are no longer in the package.
+        """
+        model_cls = self.RESOURCE_MODELS[name]
+        lf = frame.lazy()
+        columns = [c for c in lf.collect_schema() if c in _table(model_cls).c]
+        if "id" not in columns:
+            # Rows without an id cannot be matched with earlier imports; all are written
+            rows = lf.select(pl.len()).collect(engine="streaming").item()
+            result = self._write_resource(
+                frame, model_cls,
+                finalize=lambda session: fingerprints.save_file(session, name, replace(file_fp, rows=rows)),
             )
+            return result, None
 
-        # 2. Things (Trees, Cables, etc.)
-        if "things" in resources:
-             stats["things"] = self._import_resource(base_dir, resources["things"], Thing)
-             
-        # 3. Treatments
-        if "treatments" in resources:
-             stats["treatments"] = self._import_resource(base_dir, resources["treatments"], Treatment)
-
-        # 4. Experiments
-        if "experiments" in resources:
-             stats["experiments"] = self._import_resource(base_dir, resources["experiments"], Experiment)
-             
-        # 5. Experimental Units
-        if "experimental_units" in resources:
-             stats["experimental_units"] = self._import_resource(base_dir, resources["experimental_units"], ExperimentalUnit)
-             
-        # 6. Sensors
-        if "sensors" in resources:
-             stats["sensors"] = self._import_resource(base_dir, resources["sensors"], Sensor)
-             
-        # 7. Sensor Deployments
-        if "sensor_deployments" in resources:
-             stats["sensor_deployments"] = self._import_resource(base_dir, resources["sensor_deployments"], SensorDeployment)
+        with Session(self.engine) as session:
+            diff = fingerprints.diff(session, name, lf, columns)
+        file_fp = replace(file_fp, rows=diff.created + diff.updated + diff.skipped)
 
-        return stats
+        def finalize(session: Session) -> None:
+            fingerprints.save_rows(session, name, diff.hashes)
+            fingerprints.save_file(session, name, file_fp)
 
-    def _import_resource(self, 
-                         base_dir: Path, 
-                         resource_spec: dict, 
-                         model_cls: type, 
-                         primary_keys: list[str] | None = None) -> dict:
+        if diff.created or diff.updated:
+            result = self._write_resource(diff.changed, model_cls, finalize)
+            if result.get("status") == "error":
+                return result, None
+        else:
+            with Session(self.engine) as session:
+                finalize(session)
+                session.commit()
+            result = {"count": 0, "model": model_cls.__name__}
+
+        result.update(created=diff.created, updated=diff.updated, skipped=diff.skipped, deleted=0, removed=0)
+        return result, diff.deleted
+
+    def _delete_rows(self, fingerprints: ImportFingerprints, name: str, ids: pl.DataFrame) -> dict[str, Any]:
+        """Deletes rows that were removed from the package since the last import."""
+        table = _table(self.RESOURCE_MODELS[name])
+        with Session(self.engine) as session:
+            try:
+                deleted = fingerprints.delete_rows(session, name, table, ids)
+                session.commit()
+                logger.info(f"Deleted {deleted} {table.name} rows removed from the package")
+                return {"deleted": deleted}
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Failed to delete {ids.height} {table.name} rows removed from the package: {e}")
+                error = str(e)
+            # Diff the resource again on the next import, which retries the deletion
+            fingerprints.forget_file(session, name)
+            session.commit()
+        return {"delete_error": error}
+
+    def _read_resource(self,
+                       base_dir: Path,
+                       resource_spec: dict[str, Any]) -> pl.DataFrame | pl.LazyFrame | dict[str, Any]:
         """
-        Reads CSV for a resource and upserts into the database.
+        The resource CSV as a frame (a lazy scan reading every cell as text when
+        streaming), or a status dictionary if it cannot be read.
         """
         path = resource_spec.get("path")
         if not path:
             return {"status": "skipped", "reason": "no path"}
-            
+
         csv_path = base_dir / path
         if not csv_path.exists():
             logger.warning(f"Resource {resource_spec['name']} path {csv_path} not found")
             return {"status": "missing_file", "path": str(csv_path)}
-            
+
         # Read with Polars
         try:
-            df = pl.read_csv(csv_path)
+            if self.batch_size:
+                return pl.scan_csv(csv_path, infer_schema=False)
+            return pl.read_csv(csv_path)
         except Exception as e:
             logger.error(f"Failed to read {csv_path}: {e}")
             return {"status": "error", "error": str(e)}
-            
-        if df.is_empty():
+
+    def _import_resource(self,
+                         base_dir: Path,
+                         resource_spec: dict[str, Any],
+                         model_cls: type,
+                         primary_keys: list[str] | None = None,
+                         frame: pl.DataFrame | pl.LazyFrame | None = None) -> dict[str, Any]:
+        """
+        Reads CSV for a resource (unless `frame` was loaded already) and upserts into the database.
+        """
+        df = frame if frame is not None else self._read_resource(base_dir, resource_spec)
+        if isinstance(df, dict):
+            return df
+        return self._write_resource(df, model_cls)
+
+    def _write_resource(self,
+                        df: pl.DataFrame | pl.LazyFrame,
+                        model_cls: type,
+                        finalize: Callable[[Session], None] | None = None) -> dict[str, Any]:
+        """
+        Writes a loaded resource, or a scanned one batch by batch. `finalize` runs in
+        the same transaction after the last write.
+        """
+        if isinstance(df, pl.LazyFrame):
+            if self.batch_size:
+                return self._write_batches(df.collect_batches(chunk_size=self.batch_size), model_cls, finalize)
+            df = df.collect()
+        return self._write_batches([df], model_cls, finalize)
+
+    def _write_batches(self,
+                       batches: Iterable[pl.DataFrame],
+                       model_cls: type,
+                       finalize: Callable[[Session], None] | None = None) -> dict[str, Any]:
+        """
+        Upserts the batches of a resource in a single transaction; a failing batch
+        rolls back the whole resource.
+        """
+        write = self._write_frame if self.engine.dialect.name == "duckdb" else self._write_records
+        count = batch_count = 0
+        empty = True
+        with Session(self.engine) as session:
+            try:
+                for df in batches:
+                    if df.is_empty():
+                        continue
+                    empty = False
+                    if write(session, df, model_cls):
+                        count += df.height
+                        batch_count += 1
+                if finalize is not None and batch_count:
+                    finalize(session)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Failed to upsert {model_cls.__name__}: {e}")
+                return {"status": "error", "error": str(e)}
+
+        if empty:
             return {"status": "empty"}
+        if not batch_count:
+            return {"status": "no_valid_fields"}
 
+        logger.debug(f"Upserted {count} rows into {_table(model_cls).name} in {batch_count} batches")
+        result = {"count": count, "model": model_cls.__name__}
+        if batch_count > 1:
+            result["batches"] = batch_count
+        return result
+
+    def _write_records(self, session: Session, df: pl.DataFrame, model_cls: type) -> bool:
+        """
+        Upserts a frame record by record (dialects other than DuckDB).
+
+        Returns:
+            False if no column matches the model.
+        """
         # Convert to records
         records = df.to_dicts()
         
@@ -158,61 +444,168 @@ class MetadataImporter:
             valid_r = {k: v for k, v in r.items() if k in model_columns and v is not None}
             valid_records.append(valid_r)
 
-        if not valid_records:
-            return {"status": "no_valid_fields"}
+        if not any(valid_records):
+            return False
 
         # Perform Upsert (SQLite specific)
         # We assume 'id' is the conflict target if present, otherwise we assume standard insert
         # For this MVP, if 'id' is in the CSV, we treat it as the anchor.
-        
-        count = 0
-        with Session(self.engine) as session:
-            dialect_name = self.engine.dialect.name
-            if dialect_name == "sqlite":
-                stmt = sqlite_insert(model_cls).values(valid_records)
+        if self.engine.dialect.name != "sqlite":
+            session.execute(insert(model_cls).values(valid_records))
+            return True
+        stmt = sqlite_insert(model_cls).values(valid_records)
+
+        # Naive upsert on primary key "id"
+        if 'id' in valid_records[0]:
+            record_keys = [
+                key
+                for key in valid_records[0].keys()
+                if key not in {"id", "created_at"}
+            ]
+            set_dict = {key: getattr(stmt.excluded, key) for key in record_keys}
+            # If set_dict is empty (only ID in row), do nothing
+            if set_dict:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["id"],
+                    set_=set_dict
+                )
             else:
-                stmt = insert(model_cls).values(valid_records)
-            
-            # Simple ON CONFLICT DO UPDATE on 'id' if permitted
-            # But wait, typically we want to update all fields.
-            # And we need a unique constraint to trigger on_conflict. 'id' is PK.
-            
-            # Construct dictionary of all columns for update set
-            # set_ = {col: stmt.excluded[col] for col in valid_records[0].keys() if col != 'id'}
-            
-            # if set_:
-            #    stmt = stmt.on_conflict_do_update(index_elements=['id'], set_=set_)
-            # else:
-            #    stmt = stmt.on_conflict_do_nothing(index_elements=['id'])
-            
-            # For MVP simplicity, we might just try bulk insert and fail on dupes, 
-            # OR better: use ID-based replacement.
-            # Ideally:
-            
-            try:
-                # Naive upsert on primary key "id"
-                if dialect_name == "sqlite" and 'id' in valid_records[0]:
-                     record_keys = [
-                         key
-                         for key in valid_records[0].keys()
-                         if key not in {"id", "created_at"}
-                     ]
-                     set_dict = {key: getattr(stmt.excluded, key) for key in record_keys}
-                     # If set_dict is empty (only ID in row), do nothing
-                     if set_dict:
-                         stmt = stmt.on_conflict_do_update(
-                             index_elements=["id"],
-                             set_=set_dict
-                         )
-                     else:
-                         stmt = stmt.on_conflict_do_nothing(index_elements=["id"])
-                         
-                session.execute(stmt)
-                session.commit()
-                count = len(valid_records)
-            except Exception as e:
-                session.rollback()
-                logger.error(f"Failed to upsert {model_cls.__name__}: {e}")
-                return {"status": "error", "error": str(e)}
+                stmt = stmt.on_conflict_do_nothing(index_elements=["id"])
+
+        session.execute(stmt)
+        return True
+
+    def _write_frame(self, session: Session, df: pl.DataFrame, model_cls: type) -> bool:
+        """
+        Set-based upsert of a whole frame on DuckDB.
+
+        The frame is registered with the connection (zero-copy via Arrow) and written
+        with a single `INSERT ... SELECT ... ON CONFLICT (id) DO UPDATE`, so no Python
+        object is created per row. Null cells fall back to the column default, as the
+        per-record path does by dropping them.
+
+        DuckDB (0.10) cannot change indexed columns (foreign keys, unique) of an existing
+        row, neither by an update nor by deleting and re-inserting it in one transaction.
+        A frame changing them fails the resource instead of silently keeping the stored
+        values.
+
+        Returns:
+            False if no column matches the model.
+
+        Raises:
+            ValueError: Existing rows differ from the frame in indexed columns.
+        """
+        table = _table(model_cls)
+        # Columns that are entirely null are left to their defaults
+        columns = [c for c in df.columns if c in table.c and df[c].null_count() < df.height]
+        if not columns:
+            return False
+
+        view = f"_arbolab_import_{table.name}"
+        select_exprs, target_cols, params = self._select_expressions(table, columns, view, df.schema)
+
+        sql = (
+            f"INSERT INTO {table.name} ({', '.join(target_cols)}) "
+            f"SELECT {', '.join(select_exprs)} FROM {view}"
+        )
+        changed_query = None
+        if "id" in columns:
+            sql += f" ON CONFLICT (id) {self._conflict_action(table, columns)}"
+            changed_query = self._changed_indexed_query(table, columns, view)
+
+        driver_con = session.connection().connection.driver_connection
+        assert driver_con is not None
+        driver_con.register(view, df.select(columns))
+        try:
+            if changed_query:
+                changed = session.execute(text(changed_query)).scalars().all()
+                if changed:
+                    raise ValueError(
+                        f"{len(changed)} existing {table.name} rows differ in indexed columns, which "
+                        f"DuckDB cannot update (e.g. ids {', '.join(map(str, changed[:10]))}); "
+                        "delete and re-import these rows"
+                    )
+            session.execute(text(sql).bindparams(*params))
+        finally:
+            driver_con.unregister(view)
+        return True
+
+    def _select_expressions(self,
+                            table: Table,
+                            columns: list[str],
+                            view: str,
+                            frame_schema: pl.Schema) -> tuple[list[str], list[str], list[BindParameter[Any]]]:
+        """
+        SELECT expressions (with defaults for null cells), target columns and bound defaults.
+        Text columns of the frame (the streaming import reads every cell as text) are cast
+        to the column type.
+        """
+        dialect = self.engine.dialect
+        select_exprs: list[str] = []
+        target_cols: list[str] = []
+        params: list[BindParameter[Any]] = []
+        for col in table.columns:
+            default_sql = None
+            if isinstance(col.server_default, DefaultClause):
+                arg = col.server_default.arg
+                default_sql = arg if isinstance(arg, str) else str(arg.compile(dialect=dialect))
+            elif isinstance(col.default, ColumnDefault) and (col.default.is_scalar or col.default.is_callable):
+                # Python-side defaults (e.g. domain_ids=dict) are evaluated once per import
+                value = col.default.arg(None) if col.default.is_callable else col.default.arg
+                params.append(bindparam(f"default_{col.name}", value, type_=col.type))
+                default_sql = f":default_{col.name}"
+
+            if col.name in columns:
+                expr = f'{view}."{col.name}"'
+                if frame_schema[col.name] == pl.String and not isinstance(col.type, String):
+                    expr = f"CAST({expr} AS {col.type.compile(dialect=dialect)})"
+                select_exprs.append(f"COALESCE({expr}, {default_sql})" if default_sql else expr)
+            elif col.default is not None and default_sql:
+                select_exprs.append(default_sql)
+            else:
+                continue
+            target_cols.append(f'"{col.name}"')
+        return select_exprs, target_cols, params
+
+    @staticmethod
+    def _indexed_columns(table: Table) -> set[str]:
+        indexed = {c.name for c in table.primary_key.columns}
+        for index in table.indexes:
+            indexed.update(c.name for c in index.columns)
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                indexed.update(c.name for c in constraint.columns)
+        return indexed
+
+    def _conflict_action(self, table: Table, columns: list[str]) -> str:
+        """
+        DO UPDATE clause for existing ids. DuckDB (0.10) cannot update indexed columns
+        (primary key, foreign keys, unique), so only the other columns are assigned.
+        """
+        indexed = self._indexed_columns(table)
+        assignments = [
+            f'"{c}" = excluded."{c}"' for c in columns
+            if c not in indexed and c != "created_at"
+        ]
+        if assignments and "updated_at" in table.c and "updated_at" not in columns:
+            assignments.append('"updated_at" = now()')
+        if not assignments:
+            return "DO NOTHING"
+        return f"DO UPDATE SET {', '.join(assignments)}"
+
+    def _changed_indexed_query(self, table: Table, columns: list[str], view: str) -> str | None:
+        """Ids of existing rows whose indexed columns (e.g. foreign keys) differ from the frame."""
+        changed = sorted(self._indexed_columns(table) & set(columns) - {"id"})
+        if not changed:
+            return None
+        differs = " OR ".join(
+            f'({view}."{c}" IS NOT NULL AND {table.name}."{c}" IS DISTINCT FROM {view}."{c}")'
+            for c in changed
+        )
+        return f"SELECT {view}.id FROM {view} JOIN {table.name} ON {table.name}.id = {view}.id WHERE {differs}"
+
 
-        return {"count": count, "model": model_cls.__name__}
+def _table(model_cls: type) -> Table:
+    """The table of a model class."""
+    table: Table = model_cls.__table__  # type: ignore[attr-defined]
+    return table
@@ -0,0 +1,210 @@
+"""
+Pre-aggregated multi-resolution rollups of data variants.
+
+A rollup of a variant holds, per time bucket of its resolution (e.g. `1s`, `1m`,
+`1h`), the `min`, `max`, `mean` and `count` of every numeric channel `c` as the
+columns `c_min`, `c_max`, `c_mean` and `c_count`; the time column holds the bucket
+start. Rollups are derived variants (see `VariantDeriver`) of the same datastream,
+named `{variant}__{resolution}`, and stored next to their source variant.
+
+The finest rollup is aggregated from the source variant; each coarser one from the
+next finer rollup when its resolution is a multiple of it (min of mins, max of maxes,
+count-weighted mean, sum of counts). Building is memoized through the lineage of the
+derived variants, so rebuilding after an unchanged source is a no-op.
+
+`DataVariant.properties["rollup"]` records the source variant, the resolution and
+the content hash of the source. `select` only returns rollups whose source hash
+matches the current source content, so a rewritten variant is read raw until its
+rollups are rebuilt.
+"""
+
+import re
+from collections.abc import Callable, Iterable
+from datetime import timedelta
+from typing import Any
+
+import duckdb
+import polars as pl
+from arbolab_logger import get_logger
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from arbolab.database import NativeCursor
+from arbolab.models.core import DataVariant
+from arbolab.services.derivation import VariantDeriver, variant_content_hash
+from arbolab.services.variant_reader import quote_identifier
+from arbolab.store import VariantStore
+
+logger = get_logger(__name__)
+
+DEFAULT_RESOLUTIONS = ("1s", "1m", "1h")
+AGGREGATES = ("min", "max", "mean", "count")
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_resolution(resolution: str) -> timedelta:
+    """Duration of a resolution like `1s`, `15m`, `1h` or `1d`."""
+    match = re.fullmatch(r"(\d+)([smhd])", resolution)
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid rollup resolution '{resolution}' (expected e.g. 1s, 1m, 1h, 1d).")
+    return timedelta(seconds=int(match.group(1)) * _UNITS[match.group(2)])
+
+
+def rollup_name(variant_name: str, resolution: str) -> str:
+    return f"{variant_name}__{resolution}"
+
+
+class VariantRollups:
+    """Builds rollups of variants and selects the rollup to read for a resolution."""
+
+    def __init__(self,
+                 store: VariantStore,
+                 engine: Engine,
+                 resolutions: Iterable[str] = DEFAULT_RESOLUTIONS,
+                 connect: Callable[[], duckdb.DuckDBPyConnection | NativeCursor] = duckdb.connect):
+        """
+        Args:
+            store: Variant store of the workspace.
+            engine: Engine of the workspace database.
+            resolutions: Rollup resolutions to build.
+            connect: Opens the DuckDB connection the aggregations run on (see `VariantDeriver`).
+        """
+        self.store = store
+        self.engine = engine
+        self.resolutions = sorted(set(resolutions), key=parse_resolution)
+        self._connect = connect
+
+    def build(self, variant: DataVariant | int) -> list[dict[str, Any]]:
+        """
+        Builds (or refreshes) the rollups of `variant`.
+
+        Returns:
+            The derivation stats of each rollup (empty if the variant has no numeric channels).
+        """
+        with Session(self.engine) as session:
+            variant_id = variant if isinstance(variant, int) else variant.id
+            source = session.get(DataVariant, variant_id)
+            if source is None:
+                raise ValueError(f"Variant {variant_id} not found.")
+            if "rollup" in (source.properties or {}):
+                raise ValueError(f"Variant {source.variant_name} is a rollup itself.")
+            channels = self._channels(source)
+            source_hash = variant_content_hash(self.store, source)
+            session.expunge(source)
+
+        if not channels:
+            return []
+        deriver = VariantDeriver(self.store, self.engine, self._connect)
+        results = []
+        parent, parent_seconds = source, None
+        for resolution in self.resolutions:
+            seconds = int(parse_resolution(resolution).total_seconds())
+            if parent_seconds is not None and seconds % parent_seconds != 0:
+                parent, parent_seconds = source, None
+            sql = _rollup_sql(source.time_column, channels, seconds, from_rollup=parent_seconds is not None)
+            result = deriver.derive(parent.id, sql, rollup_name(source.variant_name, resolution))
+            with Session(self.engine) as session:
+                rollup = session.get_one(DataVariant, result["variant_id"])
+                rollup.properties = {
+                    **(rollup.properties or {}),
+                    "rollup": {
+                        "source_variant_id": source.id,
+                        "source_variant_name": source.variant_name,
+                        "source_hash": source_hash,
+                        "resolution": resolution,
+                        "seconds": seconds,
+                        "channels": channels,
+                    },
+                }
+                session.commit()
+                session.refresh(rollup)
+                session.expunge(rollup)
+            results.append({**result, "resolution": resolution})
+            parent, parent_seconds = rollup, seconds
+        logger.debug(
+            f"Rollups of variant {source.variant_name}: "
+            f"{sum(not r['skipped'] for r in results)} of {len(results)} rebuilt"
+        )
+        return results
+
+    def refresh(self) -> dict[str, Any]:
+        """
+        Builds the rollups of every variant of the workspace that is not a rollup.
+
+        Returns:
+            The number of `variants` considered and of rollups `built` and `skipped`.
+        """
+        with Session(self.engine) as session:
+            variants = session.execute(select(DataVariant.id, DataVariant.properties)).all()
+        results = []
+        for variant_id, properties in variants:
+            if "rollup" not in (properties or {}):
+                results.extend(self.build(variant_id))
+        built = sum(not r["skipped"] for r in results)
+        logger.info(f"Refreshed rollups of {len(variants)} variants ({built} rebuilt)")
+        return {"variants": len(variants), "built": built, "skipped": len(results) - built}
+
+    def select(self, variant: DataVariant, resolution: timedelta) -> DataVariant | None:
+        """
+        The coarsest up-to-date rollup of `variant` not coarser than `resolution`.
+
+        Returns:
+            The rollup (detached), or None if no rollup qualifies.
+        """
+        if variant.id is None or resolution <= timedelta(0):
+            return None
+        source_hash = variant_content_hash(self.store, variant)
+        if source_hash is None:
+            return None
+        with Session(self.engine) as session:
+            candidates = session.scalars(
+                select(DataVariant).filter_by(datastream_id=variant.datastream_id)
+            ).all()
+            best, best_seconds = None, 0
+            for candidate in candidates:
+                rollup = (candidate.properties or {}).get("rollup") or {}
+                if (
+                    rollup.get("source_variant_id") == variant.id
+                    and rollup.get("source_hash") == source_hash
+                    and best_seconds < rollup["seconds"] <= resolution.total_seconds()
+                ):
+                    best, best_seconds = candidate, rollup["seconds"]
+            if best is not None:
+                session.expunge(best)
+            return best
+
+    def _channels(self, variant: DataVariant) -> list[str]:
+        files = [self.store.root / f for f in variant.data_files or []]
+        if not files:
+            return []
+        schema = pl.read_parquet_schema(files[0])
+        return [name for name, dtype in schema.items() if name != variant.time_column and dtype.is_numeric()]
+
+
+def _rollup_sql(time_column: str, channels: list[str], seconds: int, *, from_rollup: bool) -> str:
+    """Aggregation of the view `parent` (raw or a finer rollup) into buckets of `seconds`."""
+    t = quote_identifier(time_column)
+    columns = []
+    for c in channels:
+        min_, max_, mean, count = (quote_identifier(f"{c}_{agg}") for agg in AGGREGATES)
+        if from_rollup:
+            columns += [
+                f"min({min_}) AS {min_}",
+                f"max({max_}) AS {max_}",
+                f"sum({mean} * {count}) / nullif(sum({count}), 0) AS {mean}",
+                f"CAST(sum({count}) AS BIGINT) AS {count}",
+            ]
+        else:
+            value = quote_identifier(c)
+            columns += [
+                f"min({value}) AS {min_}",
+                f"max({value}) AS {max_}",
+                f"avg({value}) AS {mean}",
+                f"count({value}) AS {count}",
+            ]
+    return (
+        f"SELECT time_bucket(INTERVAL '{seconds} seconds', {t}) AS {t}, {', '.join(columns)} "
+        f"FROM parent GROUP BY 1 ORDER BY 1"
+    )
@@ -0,0 +1,361 @@
+"""
+Vectorized validation of metadata packages (see `docs/specs/metadata-package.md`).
+
+All resources are checked before anything is written, so a broken package fails
+with a report instead of a late database constraint error:
+
+- **type**: cells that do not parse as the field type,
+- **required**: nulls in required fields, and declared fields missing from the CSV,
+- **primary_key**: null or duplicate keys,
+- **foreign_key**: keys that neither the referenced resource of the package nor the
+  existing rows of the referenced table contain (anti-joins, the database side runs
+  inside DuckDB).
+
+Fields, `primaryKey` and `foreignKeys` come from the resource `schema`. Resources
+without a schema are checked against their model instead: column types, non-nullable
+columns without a default, the table primary key and its foreign keys. Resource names
+are table names, so `{"reference": {"resource": "projects"}}` also resolves
+against the `projects` table.
+
+The checks are Polars lazy queries run with the streaming engine. They work on loaded
+frames as well as on CSVs scanned by the streaming import, whose memory then grows with
+the number of distinct (and offending) keys rather than with the file size.
+"""
+
+from collections.abc import Callable, Mapping
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+import polars as pl
+from arbolab_logger import get_logger
+from sqlalchemy import Table, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from arbolab.models.base import Base
+
+logger = get_logger(__name__)
+
+# Number of offending values listed per error
+MAX_EXAMPLES = 5
+
+_PYTHON_TYPES = {
+    int: "integer",
+    float: "number",
+    Decimal: "number",
+    bool: "boolean",
+    datetime: "datetime",
+    date: "date",
+    str: "string",
+}
+
+_BOOLEANS = ["true", "false", "1", "0", "yes", "no"]
+
+# ISO 8601, after normalizing the "T" separator and a "Z" suffix
+_DATETIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S%.f",
+    "%Y-%m-%d %H:%M:%S%.f%z",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d %H:%M%z",
+    "%Y-%m-%d",
+)
+
+
+def _parses_as_datetime(values: pl.Expr) -> pl.Expr:
+    values = values.str.replace(r"^(\d{4}-\d{2}-\d{2})T", "$1 ").str.replace(r"Z$", "+00:00")
+    return pl.any_horizontal(
+        values.str.to_datetime(fmt, strict=False).is_not_null() for fmt in _DATETIME_FORMATS
+    )
+
+
+# Frictionless type -> (dtype needs no check, which string values parse as the type)
+_TYPE_CHECKS: dict[str, tuple[Callable[[pl.DataType], bool], Callable[[pl.Expr], pl.Expr]]] = {
+    "integer": (lambda dtype: dtype.is_integer(), lambda s: s.cast(pl.Int64, strict=False).is_not_null()),
+    "number": (lambda dtype: dtype.is_numeric(), lambda s: s.cast(pl.Float64, strict=False).is_not_null()),
+    "boolean": (lambda dtype: dtype == pl.Boolean, lambda s: s.str.to_lowercase().is_in(_BOOLEANS)),
+    "datetime": (lambda dtype: isinstance(dtype, pl.Datetime), _parses_as_datetime),
+    "date": (lambda dtype: dtype == pl.Date, lambda s: s.str.to_date("%Y-%m-%d", strict=False).is_not_null()),
+}
+
+
+class PackageValidationError(ValueError):
+    """A metadata package failed validation; `report` holds the per-resource details."""
+
+    def __init__(self, report: dict[str, Any]):
+        self.report = report
+        super().__init__(format_report(report))
+
+
+class PackageValidator:
+    """
+    Checks the loaded resources of a package against their schema and the database.
+    """
+
+    def __init__(self, engine: Engine, models: Mapping[str, type]):
+        """
+        Args:
+            engine: Engine of the workspace database the package is imported into.
+            models: Model class per resource name.
+        """
+        self.engine = engine
+        self.models = models
+
+    def validate(self,
+                 resources: Mapping[str, dict[str, Any]],
+                 frames: Mapping[str, pl.DataFrame | pl.LazyFrame]) -> dict[str, Any]:
+        """
+        Validates every loaded resource.
+
+        Args:
+            resources: Resource descriptors from `datapackage.json`, by name.
+            frames: The loaded (or lazily scanned) CSV of each resource, by name.
+
+        Returns:
+            `{"valid": bool, "resources": {name: {"rows", "valid", "errors"}}}`, where each
+            error has `check`, `fields`, `count` (offending rows), `examples` and `message`.
+        """
+        lazy_frames = {name: frame.lazy() for name, frame in frames.items()}
+        report: dict[str, Any] = {"valid": True, "resources": {}}
+        with Session(self.engine) as session:
+            for name, lf in lazy_frames.items():
+                rows, errors = self._validate_resource(session, name, resources.get(name, {}), lf, lazy_frames)
+                report["resources"][name] = {"rows": rows, "valid": not errors, "errors": errors}
+                report["valid"] = report["valid"] and not errors
+        if not report["valid"]:
+            logger.warning(format_report(report))
+        return report
+
+    def _validate_resource(self,
+                           session: Session,
+                           name: str,
+                           resource_spec: dict[str, Any],
+                           lf: pl.LazyFrame,
+                           frames: Mapping[str, pl.LazyFrame]) -> tuple[int, list[dict[str, Any]]]:
+        """Row count and errors of one resource."""
+        schema = resource_spec.get("schema") or {}
+        model_cls = self.models.get(name)
+        table: Table | None = model_cls.__table__ if model_cls is not None else None  # type: ignore[attr-defined]
+        if not schema and table is None:
+            return _collect(lf.select(pl.len())).item(), []
+
+        columns = lf.collect_schema()
+        missing_fields, row_checks = self._field_checks(schema, table, columns)
+
+        primary_key = _as_list(schema.get("primaryKey")) if schema or table is None else self._model_primary_key(table)
+        if any(k not in columns for k in primary_key):
+            primary_key = []
+        if primary_key and schema:
+            # Model primary keys may be empty, the database assigns them
+            row_checks.append(("primary_key", primary_key,
+                               pl.any_horizontal(pl.col(primary_key).is_null()), "empty key"))
+
+        # All row checks are counted in a single pass over the resource
+        counts = _collect(lf.select(
+            pl.len(), *(flags.sum().alias(f"check_{i}") for i, (_, _, flags, _) in enumerate(row_checks))
+        )).row(0)
+        rows = counts[0]
+
+        errors = [
+            _error("required", [f], rows, [], f"field '{f}' is missing from the CSV") for f in missing_fields
+        ]
+        for count, (check, fields, flags, message) in zip(counts[1:], row_checks, strict=True):
+            if count:
+                offending = _collect(lf.filter(flags).select(fields).head(MAX_EXAMPLES))
+                errors.append(_error(check, fields, count, _examples(offending), message))
+
+        if primary_key:
+            error = self._check_duplicate_keys(lf, primary_key)
+            if error:
+                errors.append(error)
+
+        foreign_keys = (
+            schema.get("foreignKeys") if schema or table is None else self._model_foreign_keys(table, columns)
+        )
+        for fk in foreign_keys or []:
+            # An empty reference resource refers to the resource itself
+            reference = {**fk.get("reference", {})}
+            reference["resource"] = reference.get("resource") or name
+            error = self._check_foreign_key(session, lf, {**fk, "reference": reference},
+                                            frames.get(reference["resource"]))
+            if error:
+                errors.append(error)
+        return rows, errors
+
+    def _field_checks(self,
+                      schema: dict[str, Any],
+                      table: Table | None,
+                      columns: pl.Schema) -> tuple[list[str], list[tuple[str, list[str], pl.Expr, str]]]:
+        """
+        Declared fields missing from the CSV, and the row checks of the fields:
+        `(check, fields, expression flagging offending rows, message)`.
+        """
+        missing_fields: list[str] = []
+        row_checks: list[tuple[str, list[str], pl.Expr, str]] = []
+        for field in schema.get("fields") or (self._model_fields(table, columns) if table is not None else []):
+            field_name = field["name"]
+            if field_name not in columns:
+                if schema:
+                    missing_fields.append(field_name)
+                continue
+            if field.get("constraints", {}).get("required"):
+                row_checks.append(("required", [field_name], pl.col(field_name).is_null(), "empty required value"))
+            invalid = _invalid_type_expr(field_name, columns[field_name], field.get("type", "string"))
+            if invalid is not None:
+                row_checks.append(("type", [field_name], invalid, f"not a valid {field['type']}"))
+        return missing_fields, row_checks
+
+    @staticmethod
+    def _model_fields(table: Table, columns: pl.Schema) -> list[dict[str, Any]]:
+        """Frictionless field descriptors for the model columns present in the resource."""
+        fields = []
+        for col in table.columns:
+            if col.name not in columns:
+                continue
+            try:
+                field_type = _PYTHON_TYPES.get(col.type.python_type, "any")
+            except NotImplementedError:
+                field_type = "any"
+            required = (
+                not col.nullable and not col.primary_key
+                and col.default is None and col.server_default is None
+            )
+            fields.append({"name": col.name, "type": field_type, "constraints": {"required": required}})
+        return fields
+
+    @staticmethod
+    def _model_primary_key(table: Table) -> list[str]:
+        return [c.name for c in table.primary_key.columns]
+
+    @staticmethod
+    def _model_foreign_keys(table: Table, columns: pl.Schema) -> list[dict[str, Any]]:
+        return [
+            {
+                "fields": [fk.parent.name],
+                "reference": {"resource": fk.column.table.name, "fields": [fk.column.name]},
+            }
+            for fk in table.foreign_keys
+            if fk.parent.name in columns
+        ]
+
+    @staticmethod
+    def _check_duplicate_keys(lf: pl.LazyFrame, keys: list[str]) -> dict[str, Any] | None:
+        duplicates = _collect(
+            lf.select(keys).drop_nulls().group_by(keys).agg(pl.len().alias("_rows")).filter(pl.col("_rows") > 1)
+        )
+        if duplicates.is_empty():
+            return None
+        return _error("primary_key", keys, int(duplicates["_rows"].sum()),
+                      _examples(duplicates.select(keys).head(MAX_EXAMPLES)), "duplicate key")
+
+    def _check_foreign_key(self,
+                           session: Session,
+                           lf: pl.LazyFrame,
+                           fk: dict[str, Any],
+                           ref_lf: pl.LazyFrame | None) -> dict[str, Any] | None:
+        """
+        Keys that are in neither the referenced resource (`ref_lf`, if it is part of
+        the package) nor the referenced table.
+        """
+        columns = lf.collect_schema()
+        fields = _as_list(fk["fields"])
+        reference = fk.get("reference", {})
+        ref_fields = _as_list(reference.get("fields"))
+        if any(f not in columns for f in fields):
+            return None
+
+        keys = lf.select(fields).drop_nulls().unique()
+        if ref_lf is not None and all(r in ref_lf.collect_schema() for r in ref_fields):
+            # Referenced values are compared as the type of the referencing column
+            present = ref_lf.select(
+                pl.col(r).cast(columns[f], strict=False).alias(f) for f, r in zip(fields, ref_fields, strict=True)
+            ).unique()
+            keys = keys.join(present, on=fields, how="anti")
+        missing = _collect(keys)
+
+        ref_name = reference["resource"]
+        table = Base.metadata.tables.get(ref_name)
+        if not missing.is_empty() and table is not None and inspect(session.connection()).has_table(table.name):
+            missing = self._anti_join_table(session, missing, table, fields, ref_fields)
+
+        if missing.is_empty():
+            return None
+        count = _collect(lf.select(fields).join(missing.lazy(), on=fields, how="semi").select(pl.len())).item()
+        target = f"{ref_name}.{', '.join(ref_fields)}"
+        return _error("foreign_key", fields, count, _examples(missing.head(MAX_EXAMPLES)), f"not found in {target}")
+
+    def _anti_join_table(self,
+                         session: Session,
+                         keys: pl.DataFrame,
+                         table: Table,
+                         fields: list[str],
+                         ref_fields: list[str]) -> pl.DataFrame:
+        """The keys that no existing row of `table` contains."""
+        if self.engine.dialect.name != "duckdb":
+            columns = [table.c[r].label(f) for f, r in zip(fields, ref_fields, strict=True)]
+            present = pl.DataFrame(session.execute(select(*columns)).all(), schema=fields, orient="row")
+            present = present.select(pl.col(f).cast(keys.schema[f], strict=False) for f in fields)
+            return keys.join(present, on=fields, how="anti")
+
+        view = f"_arbolab_validate_{table.name}"
+        dialect = self.engine.dialect
+        condition = " AND ".join(
+            f'{table.name}."{r}" = TRY_CAST({view}."{f}" AS {table.c[r].type.compile(dialect=dialect)})'
+            for f, r in zip(fields, ref_fields, strict=True)
+        )
+        select_list = ", ".join(f'{view}."{f}"' for f in fields)
+        sql = (
+            f"SELECT {select_list} FROM {view} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table.name} WHERE {condition})"
+        )
+        driver_con = session.connection().connection.driver_connection
+        assert driver_con is not None
+        driver_con.register(view, keys)
+        try:
+            rows = session.execute(text(sql)).all()
+        finally:
+            driver_con.unregister(view)
+        return pl.DataFrame(rows, schema=keys.schema, orient="row")
+
+
+def format_report(report: dict[str, Any]) -> str:
+    """Human-readable summary of the failed checks of a validation report."""
+    if report["valid"]:
+        return "Metadata package is valid"
+    lines = ["Metadata package validation failed:"]
+    for name, resource in report["resources"].items():
+        for error in resource["errors"]:
+            examples = ", ".join(repr(e) for e in error["examples"])
+            lines.append(
+                f"  {name}.{'+'.join(error['fields'])}: {error['message']} "
+                f"({error['count']} rows{'; e.g. ' + examples if examples else ''})"
+            )
+    return "\n".join(lines)
+
+
+def _as_list(value: str | list[str] | None) -> list[str]:
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _collect(lf: pl.LazyFrame) -> pl.DataFrame:
+    return lf.collect(engine="streaming")
+
+
+def _invalid_type_expr(name: str, dtype: pl.DataType, field_type: str) -> pl.Expr | None:
+    """Flags cells that are set but do not parse as `field_type`; None if nothing to check."""
+    check = _TYPE_CHECKS.get(field_type)
+    if check is None or check[0](dtype):
+        return None
+    text_values = pl.col(name).cast(pl.String).str.strip_chars()
+    return pl.col(name).is_not_null() & ~check[1](text_values).fill_null(False)
+
+
+def _examples(offending: pl.DataFrame) -> list[Any]:
+    """Offending values; tuples for multi-column keys."""
+    return offending.rows() if offending.width > 1 else offending.to_series().to_list()
+
+
+def _error(check: str, fields: list[str], count: int, examples: list[Any], message: str) -> dict[str, Any]:
+    return {"check": check, "fields": fields, "count": count, "examples": examples, "message": message}
@@ -0,0 +1,161 @@
+"""
+DuckDB read path for data variants, for consumers outside Python (e.g. the web API).
+
+`record_batches` streams a variant slice as Arrow record batches straight from a
+DuckDB `fetch_record_batch` reader: the column projection and the time range are
+pushed down into `read_parquet`, and the batches are handed on without converting
+them to Python objects.
+
+`arrow_ipc_chunks` serializes such a reader as an Arrow IPC stream, one chunk of
+bytes per record batch, for streaming HTTP responses.
+
+`sample` returns a small slice for JSON payloads: at most `max_points` rows, taken
+at an even stride over the time-ordered slice when it has more rows.
+"""
+
+import io
+from collections.abc import Buffer, Iterator
+from datetime import datetime
+from typing import Any
+
+import duckdb
+import polars as pl
+import pyarrow as pa
+
+from arbolab.database import NativeCursor
+from arbolab.models.core import DataVariant
+from arbolab.store import VariantStore
+
+TimeRange = tuple[datetime | None, datetime | None]
+
+
+class VariantReader:
+    """Reads slices of data variants through a DuckDB connection."""
+
+    def __init__(self, store: VariantStore, con: duckdb.DuckDBPyConnection | NativeCursor):
+        """
+        Args:
+            store: Variant store of the workspace.
+            con: DuckDB connection the queries run on (owned by the caller).
+        """
+        self.store = store
+        self.con = con
+
+    def record_batches(self,
+                       variant: DataVariant,
+                       columns: list[str] | None = None,
+                       time_range: TimeRange | None = None,
+                       batch_size: int = 100_000) -> pa.RecordBatchReader:
+        """
+        Arrow reader over a slice of `variant`, ordered by time.
+
+        Args:
+            variant: The variant to read.
+            columns: Columns to read; the time column is always included. All if None.
+            time_range: Half-open range `[start, end)`; either bound may be None.
+            batch_size: Rows per record batch.
+        """
+        sql, params = self._query(variant, columns, time_range)
+        return self.con.execute(sql, params).fetch_record_batch(batch_size)
+
+    def sample(self,
+               variant: DataVariant,
+               columns: list[str] | None = None,
+               time_range: TimeRange | None = None,
+               max_points: int = 5_000) -> tuple[pl.DataFrame, bool]:
+        """
+        At most `max_points` rows of a slice of `variant`.
+
+        Returns:
+            The rows and whether the slice was downsampled.
+        """
+        sql, params = self._query(variant, columns, time_range)
+        row = self.con.execute(f"SELECT count(*) FROM ({sql})", params).fetchone()
+        assert row is not None
+        total = row[0]
+        if total <= max_points:
+            return self.con.execute(sql, params).pl(), False
+        step = -(-total // max_points)
+        sampled = (
+            f"SELECT * EXCLUDE (_row) FROM (SELECT *, row_number() OVER (ORDER BY {quote_identifier(variant.time_column)}) - 1 AS _row FROM ({sql})) "
+            f"WHERE _row % {step} = 0 ORDER BY _row"
+        )
+        return self.con.execute(sampled, params).pl(), True
+
+    def _query(self,
+               variant: DataVariant,
+               columns: list[str] | None,
+               time_range: TimeRange | None) -> tuple[str, list[Any]]:
+        sql, params, _ = self.source_query(variant, columns, time_range)
+        return f"{sql} ORDER BY {quote_identifier(variant.time_column)}", params
+
+    def source_query(self,
+                     variant: DataVariant,
+                     columns: list[str] | None,
+                     time_range: TimeRange | None) -> tuple[str, list[Any], dict[str, pl.DataType]]:
+        """
+        Unordered `read_parquet` query over a slice of `variant`.
+
+        Returns:
+            The SQL, its parameters and the selected columns with their types.
+
+        Raises:
+            ValueError: If the variant has no files or a column does not exist.
+        """
+        files = [str(self.store.root / f) for f in variant.data_files or []]
+        if not files:
+            raise ValueError(f"Variant {variant.variant_name} has no data files.")
+        time_column = variant.time_column
+        available = pl.read_parquet_schema(files[0])
+        selected = list(available) if columns is None else [time_column, *(c for c in columns if c != time_column)]
+        unknown = [c for c in selected if c not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns for variant {variant.variant_name}: {unknown}")
+
+        where: list[str] = []
+        params: list[Any] = [files]
+        start, end = time_range or (None, None)
+        if start is not None:
+            where.append(f"{quote_identifier(time_column)} >= ?")
+            params.append(start)
+        if end is not None:
+            where.append(f"{quote_identifier(time_column)} < ?")
+            params.append(end)
+        sql = f"SELECT {', '.join(quote_identifier(c) for c in selected)} FROM read_parquet(?)"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        return sql, params, {c: available[c] for c in selected}
+
+
+def arrow_ipc_chunks(reader: pa.RecordBatchReader) -> Iterator[bytes]:
+    """Arrow IPC stream of `reader`: the schema with the first batch, then one chunk per batch."""
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting the bytes written since the last `take`."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Buffer, /) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        return len(chunk)
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def quote_identifier(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
@@ -1,5 +1,52 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
 from pathlib import Path
-from typing import Any
+from types import TracebackType
+from typing import Any, Literal
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from arbolab_logger import get_logger
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from arbolab.models.core import DataVariant
+
+logger = get_logger(__name__)
+
+# Parquet footer key holding the content hash of the data in the file
+CONTENT_HASH_KEY = b"arbolab.content_hash"
+# Name infix of files merged by `VariantStore.merge_files` (see `write_partitioned`)
+MERGED_FILE_INFIX = ".compacted-"
+
+
+@dataclass(frozen=True)
+class ParquetLayout:
+    """
+    Physical layout of a partitioned variant (see `VariantStore.write_partitioned`).
+
+    Rows are sorted by the time column and split into one file per `partition_every`
+    interval (a Polars duration, e.g. '1d' or '1h'). Within a file, row groups hold
+    `row_group_size` rows, so the min/max timestamp statistics of the row groups (and,
+    with `write_page_index`, of each page) let range scans skip everything outside the range.
+    """
+
+    partition_every: str = "1d"
+    row_group_size: int = 256_000
+    # Codec for all columns, or per column (columns not listed use 'zstd')
+    compression: str | dict[str, str] = "zstd"
+    compression_level: int | None = 3
+    # Columns to dictionary-encode; None encodes all columns that are neither float
+    # nor the time column (sensor values and timestamps rarely repeat)
+    dictionary_columns: list[str] | None = None
+    write_page_index: bool = True
+    data_page_size: int | None = None
 
 
 class VariantStore:
@@ -9,17 +56,36 @@ class VariantStore:
     """
     def __init__(self, variants_root: Path):
         self._root = variants_root
-        
-    def write_variant(self, 
+        self._locks: dict[tuple[int, str], threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def root(self) -> Path:
+        """Variants root; `DataVariant.data_path` and `data_files` are relative to it."""
+        return self._root
+
+    def write_variant(self,  # noqa: PLR0913
                       project_id: int, 
                       datastream_id: int, 
                       variant_name: str, 
                       data: Any, # Expecting PyArrow Table or Polars DataFrame
-                      clobber: bool = False) -> Path:
+                      clobber: bool = False,
+                      *,
+                      session: Session | None = None,
+                      time_column: str = "timestamp",
+                      column_specs: list[dict[str, Any]] | None = None) -> Path:
         """
         Writes a dataframe to the canonical variant path.
         Returns the relative path from workspace root (conceptually), 
         but implementation returns the absolute path for now.
+
+        With `session`, the `DataVariant` of the datastream is upserted with the
+        statistics of the written file (see `register_variant`).
+
+        Polars DataFrames and Arrow tables are written with their content hash in the
+        Parquet footer: rewriting a variant with identical data is a no-op, and differing
+        data is detected from the footer of the existing file alone. Files are written to
+        a temporary file and renamed into place, so a variant is never half-written.
         
         In a full impl, 'data' would be typed strictly.
         """
@@ -32,22 +98,567 @@ class VariantStore:
         dir_path.mkdir(parents=True, exist_ok=True)
         
         file_path = dir_path / f"{variant_name}.parquet"
-        
-        if file_path.exists() and not clobber:
-             # Idempotency check: In a real system, we might hash the content.
-             # MVP: If it exists, we assume it's done. 
-             # But if user insists on re-run, they might fail or skip.
+
+        # Idempotency check: identical content (same hash in the footer) is not rewritten
+        df = pl.DataFrame(data) if isinstance(data, pa.Table) else data
+        digest = content_hash(df) if isinstance(df, pl.DataFrame) else None
+        if file_path.exists() and digest is not None and stored_content_hash(file_path) == digest:
+            logger.debug(f"Variant {variant_name} of datastream {datastream_id} is unchanged, skipping write.")
+        elif file_path.exists() and not clobber:
              # For explicit re-processing, usually a NEW variant name is preferred.
              # Here we raise to be safe, unless clobber is True.
-             raise FileExistsError(f"Variant {variant_name} already exists for datastream {datastream_id}. Use a new variant or force overwrite.")
-
-        # MVP: Support polars/pandas/arrow via protocol or strict types
-        # Assuming duckdb/polars relation or arrow table
-        
-        if hasattr(data, "write_parquet"):
-            data.write_parquet(file_path)
+             raise FileExistsError(f"Variant {variant_name} already exists for datastream {datastream_id} with different content. Use a new variant or force overwrite.")
+        elif digest is not None:
+            self._write_parquet(df, file_path, ParquetLayout(), content_digest=digest)
+        elif hasattr(data, "write_parquet"):
+            _replace_atomically(file_path, data.write_parquet)
         else:
             # Fallback for simple testing if passed a simpler object or try conversion
-            raise NotImplementedError("Only objects with write_parquet() (e.g. Polars/Arrow) supported in MVP Store.")
-            
+            raise NotImplementedError("Only Polars DataFrames, Arrow tables or objects with write_parquet() supported in MVP Store.")
+
+        if session is not None:
+            self.register_variant(session, datastream_id, variant_name, [file_path], time_column, column_specs=column_specs)
         return file_path
+
+    def open_writer(self,  # noqa: PLR0913
+                    project_id: int,
+                    datastream_id: int,
+                    variant_name: str,
+                    *,
+                    schema: pa.Schema | None = None,
+                    clobber: bool = False,
+                    layout: ParquetLayout | None = None,
+                    session: Session | None = None,
+                    time_column: str = "timestamp",
+                    column_specs: list[dict[str, Any]] | None = None) -> "VariantWriter":
+        """
+        Opens a streaming writer for `{variant_name}.parquet` (the `write_variant` path).
+
+        Chunks are written to the Parquet file as they arrive, so memory stays bounded
+        to one chunk. Use it as a context manager; the file is only put in place when
+        the block completes without error::
+
+            with store.open_writer(project_id, datastream_id, "raw") as writer:
+                writer.write_all(plugin.read_chunks(source))
+
+        Idempotency and registration follow `write_variant`: identical content leaves
+        the existing file untouched, differing content raises `FileExistsError` on
+        close unless `clobber`, and with `session` the `DataVariant` is upserted.
+
+        Args:
+            schema: Arrow schema of the chunks; taken from the first chunk if None.
+        """
+        dir_path = self._root / f"project_id={project_id}" / f"datastream_id={datastream_id}"
+        file_path = dir_path / f"{variant_name}.parquet"
+        if file_path.exists() and not clobber and stored_content_hash(file_path) is None:
+            raise FileExistsError(f"Variant {variant_name} already exists for datastream {datastream_id}. Use a new variant or force overwrite.")
+        dir_path.mkdir(parents=True, exist_ok=True)
+
+        def finish(path: Path) -> None:
+            if session is not None:
+                self.register_variant(session, datastream_id, variant_name, [path], time_column, column_specs=column_specs)
+
+        return VariantWriter(
+            file_path, schema=schema, layout=layout or ParquetLayout(),
+            clobber=clobber, time_column=time_column, on_close=finish,
+        )
+
+    def variant_files(self, datastream_id: int, variant_name: str, project_id: int | None = None) -> list[Path]:
+        """
+        Parquet files of a variant, sorted by path.
+        Without `project_id`, the variant is looked up under every project.
+        """
+        project = f"project_id={project_id}" if project_id is not None else "project_id=*"
+        datastream = f"{project}/datastream_id={datastream_id}"
+        return sorted([
+            *self._root.glob(f"{datastream}/{variant_name}.parquet"),
+            *self._root.glob(f"{datastream}/variant={variant_name}/*.parquet"),
+        ])
+
+    def scan(self,  # noqa: PLR0913
+             datastream_id: int,
+             variant_name: str,
+             columns: list[str] | None = None,
+             time_range: tuple[datetime | None, datetime | None] | None = None,
+             *,
+             time_column: str = "timestamp",
+             project_id: int | None = None) -> pl.LazyFrame:
+        """
+        Lazily scans a variant.
+
+        The column projection and the time range filter are pushed down into the Parquet
+        reader, so only the needed columns of the row groups whose timestamp statistics
+        overlap `time_range` are read. Call `.collect()` on the result to load it.
+
+        Args:
+            datastream_id: Datastream of the variant.
+            variant_name: Name of the variant (e.g. 'raw').
+            columns: Columns to read; the time column is always included. All columns if None.
+            time_range: Half-open range `[start, end)`; either bound may be None.
+            time_column: Name of the timestamp column (`DataVariant.time_column`).
+            project_id: Project of the datastream, if known (avoids a lookup over all projects).
+        """
+        files = self.variant_files(datastream_id, variant_name, project_id)
+        if not files:
+            raise FileNotFoundError(f"Variant {variant_name} not found for datastream {datastream_id}.")
+
+        lf = pl.scan_parquet(files)
+        if columns is not None:
+            lf = lf.select(time_column, *(c for c in columns if c != time_column))
+        if time_range is not None:
+            start, end = time_range
+            if start is not None:
+                lf = lf.filter(pl.col(time_column) >= start)
+            if end is not None:
+                lf = lf.filter(pl.col(time_column) < end)
+        return lf
+
+    def write_partitioned(self,  # noqa: PLR0913
+                          project_id: int,
+                          datastream_id: int,
+                          variant_name: str,
+                          data: Any,  # Polars DataFrame or PyArrow Table
+                          *,
+                          time_column: str = "timestamp",
+                          layout: ParquetLayout | None = None,
+                          mode: Literal["create", "append", "overwrite"] = "create",
+                          session: Session | None = None,
+                          column_specs: list[dict[str, Any]] | None = None) -> list[Path]:
+        """
+        Writes a variant as time-partitioned Parquet files.
+
+        Files live under `project_id=X/datastream_id=Y/variant=Z/`, one per partition
+        interval, named after the start of the interval. Only the partitions the data
+        falls into are touched:
+
+        - `create` raises if the variant already exists, unless it holds exactly this data.
+        - `append` merges the rows into existing partition files (re-sorted by time).
+        - `overwrite` replaces the written partitions; other partitions are kept.
+
+        Each file carries the content hash of its rows in the footer; partitions whose
+        content is unchanged are not rewritten, so re-ingesting identical data is a no-op.
+        Files are written to a temporary file and renamed into place.
+
+        Partitions merged by compaction (see `merge_files`) are split up again when they
+        are touched: a merged file holding rows of a written partition is replaced by the
+        partition files of its rows, then deleted. Writes hold the `variant_lock`.
+
+        With `session`, the `DataVariant` of the datastream is created or updated with the
+        complete file list of the variant (`data_files`, relative to the variants root) and
+        its statistics (see `register_variant`).
+
+        Returns:
+            The partition files written (unchanged partitions are not included).
+        """
+        layout = layout or ParquetLayout()
+        df = data if isinstance(data, pl.DataFrame) else pl.DataFrame(data)
+        if time_column not in df.columns:
+            raise ValueError(f"Variant {variant_name} has no time column '{time_column}'.")
+
+        dir_path = self._root / f"project_id={project_id}" / f"datastream_id={datastream_id}" / f"variant={variant_name}"
+        partition_key = pl.col(time_column).dt.truncate(layout.partition_every)
+        with self.variant_lock(datastream_id, variant_name):
+            existing = set(dir_path.glob("*.parquet"))
+            merged = sorted(path for path in existing if MERGED_FILE_INFIX in path.name)
+            if mode == "create" and merged:
+                # The partitions are spread over merged files: compare the variant as a whole
+                stored = pl.scan_parquet(sorted(existing)).sort(time_column, maintain_order=True).collect()
+                if content_hash(stored) != content_hash(df.sort(time_column, maintain_order=True)):
+                    raise FileExistsError(f"Variant {variant_name} already exists for datastream {datastream_id} with different content. Use a new variant or append.")
+                merged, parts = [], []
+            else:
+                rows_by_start = {
+                    start: rows for (start,), rows in df.sort(time_column).group_by(partition_key, maintain_order=True)
+                }
+                merged, restored = self._split_merged(merged, partition_key, set(rows_by_start))
+                parts = self._partition_parts(dir_path, rows_by_start, restored, time_column, append=mode == "append")
+                if mode == "create" and existing and (
+                    existing != {file_path for file_path, *_ in parts} or not all(unchanged for *_, unchanged in parts)
+                ):
+                    raise FileExistsError(f"Variant {variant_name} already exists for datastream {datastream_id} with different content. Use a new variant or append.")
+            dir_path.mkdir(parents=True, exist_ok=True)
+
+            written = []
+            for file_path, part, digest, unchanged in parts:
+                if unchanged:
+                    continue
+                self._write_parquet(part, file_path, layout, content_digest=digest, time_column=time_column)
+                written.append(file_path)
+            for path in merged:
+                path.unlink()
+            logger.debug(f"Variant {variant_name} of datastream {datastream_id}: {len(written)} of {len(parts)} partitions written, {len(merged)} merged files split.")
+
+            if session is not None:
+                files = sorted(dir_path.glob("*.parquet"))
+                self.register_variant(session, datastream_id, variant_name, files, time_column, column_specs=column_specs)
+        return written
+
+    @staticmethod
+    def _partition_parts(dir_path: Path,
+                         rows_by_start: dict[datetime, pl.DataFrame],
+                         restored: dict[datetime, list[pl.DataFrame]],
+                         time_column: str,
+                         *,
+                         append: bool) -> list[tuple[Path, pl.DataFrame, str, bool]]:
+        """
+        The partition files to write: `(path, rows, content hash, unchanged)`. Rows of
+        written partitions restored from merged files are replaced, unless appending;
+        the other restored partitions get their files back.
+        """
+        parts = []
+        for start, rows in rows_by_start.items():
+            file_path = dir_path / f"{start:%Y-%m-%dT%H-%M-%S}.parquet"
+            previous = restored.pop(start, [])
+            part = rows
+            if append and (file_path.exists() or previous):
+                if file_path.exists():
+                    previous.insert(0, pl.read_parquet(file_path))
+                part = pl.concat([*previous, rows]).sort(time_column, maintain_order=True)
+            digest = content_hash(part)
+            parts.append((file_path, part, digest, file_path.exists() and stored_content_hash(file_path) == digest))
+        for start, rows_list in restored.items():
+            file_path = dir_path / f"{start:%Y-%m-%dT%H-%M-%S}.parquet"
+            if file_path.exists():
+                rows_list.insert(0, pl.read_parquet(file_path))
+            part = pl.concat(rows_list).sort(time_column, maintain_order=True)
+            parts.append((file_path, part, content_hash(part), False))
+        return parts
+
+    @staticmethod
+    def _split_merged(merged: list[Path],
+                      partition_key: pl.Expr,
+                      starts: set[datetime]) -> tuple[list[Path], dict[datetime, list[pl.DataFrame]]]:
+        """
+        The merged files holding rows of the partitions `starts`, and all of their rows
+        by partition start.
+        """
+        split: list[Path] = []
+        restored: dict[datetime, list[pl.DataFrame]] = {}
+        for path in merged:
+            keys = pl.scan_parquet(path).select(partition_key.unique()).collect().to_series()
+            if starts.isdisjoint(keys):
+                continue
+            split.append(path)
+            for (start,), rows in pl.read_parquet(path).group_by(partition_key, maintain_order=True):
+                restored.setdefault(start, []).append(rows)
+        return split, restored
+
+    def merge_files(self, files: list[Path], time_column: str, layout: ParquetLayout | None = None) -> Path:
+        """
+        Merges Parquet files of one variant into a new file next to them, sorted by
+        `time_column`, and returns its path.
+
+        The file is named after the first of the files with the `MERGED_FILE_INFIX`, so
+        it sorts into place among the partition files without being mistaken for one
+        (see `write_partitioned`). The merged files are left alone; delete them once the
+        new file list of the variant is committed.
+        """
+        df = pl.scan_parquet(files).sort(time_column, maintain_order=True).collect(engine="streaming")
+        stem = files[0].name.split(".", 1)[0]
+        target = files[0].with_name(f"{stem}{MERGED_FILE_INFIX}{uuid.uuid4().hex[:12]}.parquet")
+        self._write_parquet(df, target, layout or ParquetLayout(), content_digest=content_hash(df), time_column=time_column)
+        return target
+
+    def variant_lock(self, datastream_id: int, variant_name: str) -> threading.RLock:
+        """Lock serializing the partitioned writes of a variant with its compaction."""
+        with self._locks_guard:
+            return self._locks.setdefault((datastream_id, variant_name), threading.RLock())
+
+    def _write_parquet(self,
+                       df: pl.DataFrame,
+                       file_path: Path,
+                       layout: ParquetLayout,
+                       *,
+                       content_digest: str,
+                       time_column: str | None = None) -> None:
+        """
+        Writes `df` with `layout` settings via a temporary file.
+        With `time_column`, the data is declared sorted by it.
+        """
+        table = df.to_arrow()
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), CONTENT_HASH_KEY: content_digest.encode()})
+        sorting = [pq.SortingColumn(table.column_names.index(time_column))] if time_column else None
+        _replace_atomically(file_path, lambda path: pq.write_table(
+            table,
+            path,
+            row_group_size=layout.row_group_size,
+            sorting_columns=sorting,
+            **_parquet_options(table.schema, layout, time_column),
+        ))
+
+    def register_variant(self,  # noqa: PLR0913
+                         session: Session,
+                         datastream_id: int,
+                         variant_name: str,
+                         files: list[Path],
+                         time_column: str,
+                         *,
+                         column_specs: list[dict[str, Any]] | None = None) -> DataVariant:
+        """
+        Upserts the `DataVariant` of the files with statistics read from the Parquet
+        footers only: row and column counts, total file size, the time range (from the
+        min/max statistics of the time column) and the column specs.
+
+        Column specs are keyed by name; `column_specs` and the existing specs of the
+        variant (units, labels) are kept and only their `dtype` is taken from the files.
+        """
+        variant = session.scalars(
+            select(DataVariant).filter_by(datastream_id=datastream_id, variant_name=variant_name)
+        ).first()
+        if variant is None:
+            variant = DataVariant(datastream_id=datastream_id, variant_name=variant_name)
+            session.add(variant)
+
+        stats = parquet_stats(files, time_column)
+        specs = {spec["name"]: spec for spec in (variant.column_specs or [])}
+        specs.update({spec["name"]: spec for spec in (column_specs or [])})
+        variant.column_specs = [
+            {**specs.get(name, {"name": name}), "dtype": dtype} for name, dtype in stats.pop("dtypes").items()
+        ]
+        variant.time_column = time_column
+        variant.data_path = files[0].parent.relative_to(self._root).as_posix() if files else None
+        variant.data_files = [f.relative_to(self._root).as_posix() for f in files]
+        hashes = stats.pop("content_hashes")
+        variant.properties = {
+            **(variant.properties or {}),
+            "content_hashes": {f.relative_to(self._root).as_posix(): hashes.get(f) for f in files},
+        }
+        for key, value in stats.items():
+            setattr(variant, key, value)
+        return variant
+
+
+def parquet_stats(files: list[Path], time_column: str) -> dict[str, Any]:
+    """
+    Statistics of a set of Parquet files, read from their footers (no data pages).
+
+    Returns:
+        `row_count`, `column_count`, `file_size_bytes`, `first_timestamp`, `last_timestamp`
+        (None without min/max statistics), `dtypes` (column name -> logical type) and
+        `content_hashes` (file -> content hash, None for files written without one).
+    """
+    stats: dict[str, Any] = {
+        "row_count": 0, "column_count": 0, "file_size_bytes": 0,
+        "first_timestamp": None, "last_timestamp": None, "dtypes": {}, "content_hashes": {},
+    }
+    for path in files:
+        metadata = pq.read_metadata(path)
+        stats["content_hashes"][path] = _footer_hash(metadata)
+        stats["row_count"] += metadata.num_rows
+        stats["file_size_bytes"] += path.stat().st_size
+        stats["dtypes"].update({
+            name: dtype.base_type().__name__.lower() for name, dtype in pl.read_parquet_schema(path).items()
+        })
+        names = metadata.schema.names
+        if time_column not in names:
+            continue
+        index = names.index(time_column)
+        for group in range(metadata.num_row_groups):
+            column = metadata.row_group(group).column(index).statistics
+            if column is None or not column.has_min_max or column.min is None or column.max is None:
+                continue
+            first, last = _naive_utc(column.min), _naive_utc(column.max)
+            if stats["first_timestamp"] is None or first < stats["first_timestamp"]:
+                stats["first_timestamp"] = first
+            if stats["last_timestamp"] is None or last > stats["last_timestamp"]:
+                stats["last_timestamp"] = last
+    stats["column_count"] = len(stats["dtypes"])
+    return stats
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # DataVariant timestamps are naive UTC
+    if value.tzinfo is not None:
+        return value.astimezone(UTC).replace(tzinfo=None)
+    return value
+
+
+class VariantWriter:
+    """
+    Incremental Parquet writer of one variant file (see `VariantStore.open_writer`).
+
+    Accepts Arrow RecordBatches/Tables and Polars DataFrames. The schema of the first
+    chunk (or the one given) is binding: later chunks must have the same columns and
+    are cast to its types, otherwise `ValueError` is raised. Each chunk is written as
+    it arrives (as one or more row groups) to a temporary file, which is renamed into
+    place on `close`; on error it is discarded.
+    """
+
+    def __init__(self,  # noqa: PLR0913
+                 file_path: Path,
+                 *,
+                 schema: pa.Schema | None,
+                 layout: ParquetLayout,
+                 clobber: bool,
+                 time_column: str,
+                 on_close: Callable[[Path], Any]):
+        self.file_path = file_path
+        self.schema = schema
+        self.rows = 0
+        self._layout = layout
+        self._clobber = clobber
+        self._time_column = time_column
+        self._on_close = on_close
+        self._tmp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.tmp")
+        self._writer: pq.ParquetWriter | None = None
+        self._hasher: _ContentHasher | None = None
+
+    def __enter__(self) -> "VariantWriter":
+        return self
+
+    def __exit__(self,
+                 exc_type: type[BaseException] | None,
+                 exc: BaseException | None,
+                 tb: TracebackType | None) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, chunk: Any) -> None:
+        """Writes one chunk (Arrow RecordBatch/Table or Polars DataFrame)."""
+        table = self._conform(chunk)
+        writer, hasher = self._opened(table.schema)
+        writer.write_table(table, row_group_size=self._layout.row_group_size)
+        hasher.update(pl.DataFrame(table))
+        self.rows += table.num_rows
+
+    def write_all(self, chunks: Any) -> None:
+        """Writes every chunk of an iterable, consuming it lazily."""
+        for chunk in chunks:
+            self.write(chunk)
+
+    def close(self) -> Path:
+        """Finalizes the file and puts it in place (unless the content is unchanged)."""
+        writer, hasher = self._opened(self.schema)
+        digest = hasher.hexdigest()
+        writer.add_key_value_metadata({CONTENT_HASH_KEY.decode(): digest})
+        writer.close()
+        try:
+            if self.file_path.exists():
+                if stored_content_hash(self.file_path) == digest:
+                    logger.debug(f"Variant file {self.file_path.name} is unchanged, skipping write.")
+                    self._on_close(self.file_path)
+                    return self.file_path
+                if not self._clobber:
+                    raise FileExistsError(f"Variant file {self.file_path} already exists with different content. Use a new variant or force overwrite.")
+            os.replace(self._tmp_path, self.file_path)
+        finally:
+            self._tmp_path.unlink(missing_ok=True)
+        self._on_close(self.file_path)
+        return self.file_path
+
+    def abort(self) -> None:
+        """Discards everything written so far."""
+        if self._writer is not None:
+            self._writer.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def _opened(self, schema: pa.Schema | None) -> tuple[pq.ParquetWriter, "_ContentHasher"]:
+        """The file writer and content hasher, opening the file with `schema` on first use."""
+        if self._writer is None or self._hasher is None:
+            if schema is None:
+                raise ValueError(f"No chunks written to {self.file_path.name} and no schema given.")
+            self.schema = schema
+            self._hasher = _ContentHasher(pl.DataFrame(schema.empty_table()).schema)
+            self._writer = pq.ParquetWriter(
+                self._tmp_path, schema, **_parquet_options(schema, self._layout, self._time_column)
+            )
+        return self._writer, self._hasher
+
+    def _conform(self, chunk: Any) -> pa.Table:
+        if isinstance(chunk, pl.DataFrame):
+            table = chunk.to_arrow()
+        elif isinstance(chunk, pa.RecordBatch):
+            table = pa.Table.from_batches([chunk])
+        elif isinstance(chunk, pa.Table):
+            table = chunk
+        else:
+            raise TypeError(f"Unsupported chunk type {type(chunk).__name__}; expected Arrow or Polars data.")
+        if self.schema is None or table.schema.equals(self.schema):
+            return table
+        if sorted(table.column_names) != sorted(self.schema.names):
+            raise ValueError(
+                f"Chunk columns {table.column_names} do not match the variant schema {self.schema.names}."
+            )
+        try:
+            return table.select(self.schema.names).cast(self.schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Chunk does not match the variant schema: {e}") from e
+
+
+def content_hash(df: pl.DataFrame) -> str:
+    """
+    SHA-256 over the schema and the row hashes of `df`.
+
+    The hash depends on the values and their order only (not on the chunk or buffer
+    layout of the frame). Like the import row hashes it relies on Polars hashing, so it
+    is stable for a given Polars version: after an upgrade identical data is rewritten once.
+    """
+    hasher = _ContentHasher(df.schema)
+    hasher.update(df)
+    return hasher.hexdigest()
+
+
+class _ContentHasher:
+    """Incremental `content_hash`: the digest of consecutive chunks equals that of their concatenation."""
+
+    def __init__(self, schema: pl.Schema):
+        self._digest = hashlib.sha256(repr(list(schema.items())).encode())
+
+    def update(self, df: pl.DataFrame) -> None:
+        if df.width:
+            hashes = df.hash_rows(seed=0).to_arrow()
+            values = hashes.buffers()[1]
+            assert values is not None
+            self._digest.update(memoryview(values)[hashes.offset * 8:(hashes.offset + len(hashes)) * 8])
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def _parquet_options(schema: pa.Schema, layout: ParquetLayout, time_column: str | None) -> dict[str, Any]:
+    """Compression, encoding and statistics options of `layout` for `schema`."""
+    compression: str | dict[str, str]
+    if isinstance(layout.compression, dict):
+        compression = {name: layout.compression.get(name, "zstd") for name in schema.names}
+    else:
+        compression = layout.compression
+    if layout.dictionary_columns is not None:
+        dictionary = layout.dictionary_columns
+    else:
+        dictionary = [
+            field.name for field in schema
+            if field.name != time_column and not pa.types.is_floating(field.type)
+        ]
+    return {
+        "compression": compression,
+        "compression_level": layout.compression_level,
+        "use_dictionary": dictionary,
+        "write_statistics": True,
+        "write_page_index": layout.write_page_index,
+        "data_page_size": layout.data_page_size,
+    }
+
+
+def stored_content_hash(path: Path) -> str | None:
+    """Content hash in the footer of a Parquet file (None if missing or unreadable)."""
+    try:
+        return _footer_hash(pq.read_metadata(path))
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def _footer_hash(metadata: pq.FileMetaData) -> str | None:
+    value = (metadata.metadata or {}).get(CONTENT_HASH_KEY)
+    return value.decode() if value is not None else None
+
+
+def _replace_atomically(path: Path, write: Callable[[Path], Any]) -> None:
+    # Hidden temp file in the same directory, so the rename is atomic and globs skip it
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,33 @@
+"""Tests for the CatalogManager seed sync."""
+
+from __future__ import annotations
+
+from arbolab.core.catalog_manager import CatalogManager
+from arbolab.models import Base, TreeSpecies, UnitOfMeasurement
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+
+def test_sync_all_inserts_missing_and_keeps_existing_rows() -> None:
+    """Seeds the catalog once and never overwrites rows that already exist."""
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+    manager = CatalogManager()
+
+    with Session(engine) as session:
+        session.add(TreeSpecies(name="Fagus sylvatica", properties={"common_name": "Rotbuche"}))
+        session.commit()
+        manager.sync_all(session)
+        session.commit()
+
+        species = session.scalars(select(TreeSpecies).order_by(TreeSpecies.id)).all()
+        assert len(species) == len(manager._load_json("tree_species.json"))
+        assert species[0].name == "Fagus sylvatica"
+        assert species[0].properties == {"common_name": "Rotbuche"}
+        assert all(s.properties for s in species)
+
+        units = session.scalar(select(func.count()).select_from(UnitOfMeasurement))
+        manager.sync_all(session)
+        session.commit()
+        assert session.scalar(select(func.count()).select_from(UnitOfMeasurement)) == units
+        assert session.scalar(select(func.count()).select_from(TreeSpecies)) == len(species)
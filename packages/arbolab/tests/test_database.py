@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
+import logging
 from pathlib import Path
+from typing import Any, cast
 
 import pytest
 from arbolab.database import WorkspaceDatabase
 from arbolab.models import Base
-from sqlalchemy import text
+from sqlalchemy import Column, Integer, MetaData, String, Table, text
+from sqlalchemy.orm import Session
 
 
 def test_workspace_database_connect_and_session(tmp_path: Path) -> None:
@@ -119,7 +122,7 @@ def test_workspace_database_create_tables_connects(tmp_path: Path) -> None:
 
 
 def test_workspace_database_logs_after_flush(tmp_path: Path) -> None:
-    """Executes the post-flush logging hook.
+    """Logs one per-type count summary for every Nth flush.
 
     Args:
         tmp_path: Temporary directory fixture.
@@ -128,9 +131,147 @@ def test_workspace_database_logs_after_flush(tmp_path: Path) -> None:
         """Session stub with new/dirty/deleted lists."""
 
         def __init__(self) -> None:
-            self.new = [object()]
+            self.new = [object(), object(), 1]
             self.dirty = [object()]
             self.deleted = [object()]
 
+    records: list[logging.LogRecord] = []
+
+    class ListHandler(logging.Handler):
+        """Collects the emitted records."""
+
+        def emit(self, record: logging.LogRecord) -> None:
+            records.append(record)
+
+    handler = ListHandler()
+    db_logger = logging.getLogger("arbolab.database")
+    level = db_logger.level
+    db_logger.addHandler(handler)
+    db_logger.setLevel(logging.INFO)
+    try:
+        database = WorkspaceDatabase(tmp_path / "db" / "arbolab.duckdb", flush_log_every=2)
+        for _ in range(3):
+            database._log_after_flush(cast(Session, DummySession()), None)
+    finally:
+        db_logger.removeHandler(handler)
+        db_logger.setLevel(level)
+
+    assert [r.getMessage() for r in records] == ["Flush: Created 1 int, 2 object; Deleted 1 object"] * 2
+
+
+def test_workspace_database_transaction_joins_nested_sessions(tmp_path: Path) -> None:
+    """Nested sessions share the transaction and roll back with it.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    database = WorkspaceDatabase(tmp_path / "db" / "arbolab.duckdb")
+
+    with pytest.raises(RuntimeError):
+        with database.transaction() as outer:
+            with database.session() as inner:
+                assert inner is outer
+                inner.execute(text("insert into core_sys_metadata (key, value) values ('k', 'v')"))
+            raise RuntimeError("boom")
+
+    with database.session() as session:
+        count = session.execute(text("select count(*) from core_sys_metadata where key = 'k'")).scalar()
+        assert count == 0
+
+
+def test_workspace_database_native_cursors_share_instance_and_are_bounded(tmp_path: Path) -> None:
+    """Native cursors see ORM writes of the same instance and come from bounded pools, streaming ones from their own.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    database = WorkspaceDatabase(tmp_path / "db" / "arbolab.duckdb", pool_size=1, pool_timeout=0.01)
+    with database.session() as session:
+        session.execute(text("insert into core_sys_metadata (key, value) values ('k', 'v')"))
+
+    with database.get_native_con() as con:
+        assert con.execute("select value from core_sys_metadata where key = 'k'").fetchone()[0] == "v"
+        with pytest.raises(TimeoutError):
+            database.get_native_con()
+        with database.get_native_con(streaming=True), database.get_native_con(streaming=True):
+            with pytest.raises(TimeoutError, match="streaming"):
+                database.get_native_con(streaming=True)
+
+    con = database.get_native_con()
+    con.close()
+    con.close()
+    database.close()
+
+
+def test_workspace_database_skips_ddl_while_schema_stamp_matches(tmp_path: Path) -> None:
+    """Runs create_all only for new or changed metadata.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    db_path = tmp_path / "db" / "arbolab.duckdb"
+    database = WorkspaceDatabase(db_path)
+    database.connect()
+    database.close()
+
+    database = WorkspaceDatabase(db_path)
+    assert database.create_tables(Base.metadata) is False
+
+    plugin = MetaData()
+    table = Table("items", plugin, Column("id", Integer, primary_key=True, autoincrement=False), schema="plugin")
+    assert database.create_tables(plugin, schema="plugin") is True
+    assert database.create_tables(plugin, schema="plugin") is False
+
+    table.append_column(Column("name", String))
+    assert database.create_tables(plugin, schema="plugin") is True
+
+    # A second metadata in the main schema does not reuse the core stamp
+    other = MetaData()
+    Table("other_items", other, Column("id", Integer, primary_key=True, autoincrement=False))
+    assert database.create_tables(other) is True
+    assert database.create_tables(other) is False
+    assert database.create_tables(Base.metadata) is False
+    with database.session() as session:
+        stamps = session.execute(
+            text("select key from core_sys_metadata where key like 'schema_version:%' order by key")
+        ).scalars().all()
+    assert [stamp.rsplit(":", 1)[0] for stamp in stamps] == [
+        "schema_version:main", "schema_version:main", "schema_version:plugin"
+    ]
+
+
+def test_workspace_database_applies_resource_limits_and_budget(tmp_path: Path) -> None:
+    """Configures memory, threads and spill directory, capped by a budget share.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    database = WorkspaceDatabase(
+        tmp_path / "db" / "arbolab.duckdb", memory_limit_mb=256, threads=2, temp_directory=tmp_path / "tmp"
+    )
+
+    def settings() -> tuple[Any, ...]:
+        with database.get_native_con() as con:
+            row: tuple[Any, ...] | None = con.execute(
+                "select current_setting('memory_limit'), current_setting('threads'), current_setting('temp_directory')"
+            ).fetchone()
+        assert row is not None
+        return row
+
+    assert settings() == ("256.0 MiB", 2, str(tmp_path / "tmp"))
+    database.set_budget(memory_limit_mb=128, threads=1)
+    assert settings()[:2] == ("128.0 MiB", 1)
+    database.set_budget(memory_limit_mb=1024, threads=8)
+    assert settings()[:2] == ("256.0 MiB", 2)
+    database.set_budget()
+    assert settings()[:2] == ("256.0 MiB", 2)
+    database.close()
+
+    # Without configured limits, lifting the budget restores the DuckDB defaults
     database = WorkspaceDatabase(tmp_path / "db" / "arbolab.duckdb")
-    database._log_after_flush(DummySession(), None)
+    defaults = settings()[:2]
+    database.set_budget(memory_limit_mb=128, threads=1)
+    assert settings()[:2] == ("128.0 MiB", 1)
+    database.set_budget()
+    assert settings()[:2] == defaults
+    database.close()
@@ -3,14 +3,16 @@
 from __future__ import annotations
 
 import json
+import math
+import threading
 from pathlib import Path
 from typing import Any
 
 import polars as pl
 import pytest
-from arbolab.models import Base, Project, SensorModel
+from arbolab.models import Base, Project, Sensor, SensorModel
 from arbolab.services.importer import MetadataImporter
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select
 from sqlalchemy.orm import Session
 
 
@@ -207,35 +209,18 @@ def test_import_resource_returns_empty_status(tmp_path: Path) -> None:
     assert result["status"] == "empty"
 
 
-def test_import_resource_returns_no_valid_fields(
-    tmp_path: Path,
-    monkeypatch: pytest.MonkeyPatch,
-) -> None:
+def test_import_resource_returns_no_valid_fields(tmp_path: Path) -> None:
     """Returns no_valid_fields when rows have no usable columns.
 
     Args:
         tmp_path: Temporary directory fixture.
-        monkeypatch: Pytest monkeypatch fixture.
     """
     engine = create_engine("duckdb:///:memory:")
     Base.metadata.create_all(engine)
     importer = MetadataImporter(engine)
 
     csv_path = tmp_path / "projects.csv"
-    csv_path.write_text("id,name\n1,Test\n", encoding="utf-8")
-
-    class DummyFrame:
-        """Frame stub with empty dict output."""
-
-        def is_empty(self) -> bool:
-            """Report non-empty to reach the column filter."""
-            return False
-
-        def to_dicts(self) -> list[dict[str, Any]]:
-            """Return no records after conversion."""
-            return []
-
-    monkeypatch.setattr("arbolab.services.importer.pl.read_csv", lambda _: DummyFrame())
+    csv_path.write_text("unknown,other\n1,Test\n", encoding="utf-8")
 
     result = importer._import_resource(
         tmp_path,
@@ -337,3 +322,178 @@ def test_import_resource_reports_upsert_error(
     )
 
     assert result["status"] == "error"
+
+
+def test_import_resource_duckdb_upsert_updates_existing_rows(tmp_path: Path) -> None:
+    """Re-importing a resource on DuckDB updates rows instead of failing on duplicates.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+    importer = MetadataImporter(engine)
+    with Session(engine) as session:
+        session.add_all([Project(id=1, name="One"), Project(id=2, name="Two"), SensorModel(id=1, name="Model")])
+        session.commit()
+
+    csv_path = tmp_path / "sensors.csv"
+    resource = {"name": "sensors", "path": "sensors.csv"}
+
+    _write_csv(csv_path, {"id": [1, 2], "project_id": [1, 1], "sensor_model_id": [1, 1], "name": ["A", None]})
+    first = importer._import_resource(tmp_path, resource, Sensor)
+    assert first["count"] == len([1, 2])
+
+    _write_csv(csv_path, {"id": [2, 3], "project_id": [1, 1], "sensor_model_id": [1, 1], "name": ["B", "C"]})
+    second = importer._import_resource(tmp_path, resource, Sensor)
+    assert second["count"] == len([2, 3])
+
+    with Session(engine) as session:
+        rows = session.execute(select(Sensor.id, Sensor.project_id, Sensor.name).order_by(Sensor.id)).all()
+        assert [tuple(row) for row in rows] == [
+            (1, 1, "A"),
+            (2, 1, "B"),
+            (3, 1, "C"),
+        ]
+        # Python-side defaults are applied by the set-based insert as well
+        created = session.get_one(Sensor, 3)
+        assert created.domain_ids == {}
+        assert created.created_at is not None
+
+
+def test_import_resource_duckdb_rejects_changed_indexed_columns(tmp_path: Path) -> None:
+    """DuckDB cannot update foreign keys of existing rows, so such a resource fails as a whole.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+    importer = MetadataImporter(engine)
+    with Session(engine) as session:
+        session.add_all([Project(id=1, name="One"), Project(id=2, name="Two"), SensorModel(id=1, name="Model")])
+        session.add(Sensor(id=1, project_id=1, sensor_model_id=1, name="A"))
+        session.commit()
+
+    csv_path = tmp_path / "sensors.csv"
+    _write_csv(csv_path, {"id": [1, 2], "project_id": [2, 1], "sensor_model_id": [1, 1], "name": ["B", "C"]})
+    result = importer._import_resource(tmp_path, {"name": "sensors", "path": "sensors.csv"}, Sensor)
+
+    assert result["status"] == "error"
+    assert "indexed columns" in result["error"]
+    with Session(engine) as session:
+        # Nothing of the resource was written
+        rows = session.execute(select(Sensor.id, Sensor.project_id, Sensor.name)).all()
+        assert [tuple(row) for row in rows] == [(1, 1, "A")]
+
+
+def test_import_package_reads_resources_concurrently(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Parses resource CSVs in parallel and writes them in foreign key order.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        monkeypatch: Pytest monkeypatch fixture.
+    """
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+    importer = MetadataImporter(engine, read_workers=2)
+
+    pkg_dir = tmp_path / "metadata"
+    pkg_dir.mkdir()
+    _write_csv(pkg_dir / "projects.csv", {"id": [1], "name": ["Project"]})
+    _write_csv(pkg_dir / "treatments.csv", {"id": [20], "project_id": [1], "name": ["T"]})
+    pkg_file = pkg_dir / "datapackage.json"
+    pkg_file.write_text(json.dumps({
+        "name": "concurrent",
+        # Listed in reverse: the import still writes projects first
+        "resources": [
+            {"name": "treatments", "path": "treatments.csv"},
+            {"name": "projects", "path": "projects.csv"},
+        ],
+    }), encoding="utf-8")
+
+    # Both reads must be in flight at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=10)
+    read_csv = pl.read_csv
+
+    def read_together(path: Path) -> pl.DataFrame:
+        """Wait for the other read before parsing."""
+        barrier.wait()
+        return read_csv(path)
+
+    monkeypatch.setattr("arbolab.services.importer.pl.read_csv", read_together)
+
+    stats = importer.import_package(pkg_file)
+
+    assert list(stats) == ["projects", "treatments"]
+    assert stats["treatments"]["count"] == 1
+    for resource_stats in stats.values():
+        assert resource_stats["read_seconds"] >= 0
+        assert resource_stats["write_seconds"] >= 0
+
+
+def test_import_package_streams_resources_in_batches(tmp_path: Path) -> None:
+    """Streams resources batch by batch and validates the scanned CSVs.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(SensorModel(id=1, name="Model"))
+        session.commit()
+    batch_size = 2
+    importer = MetadataImporter(engine, batch_size=batch_size)
+
+    pkg_dir = tmp_path / "metadata"
+    pkg_dir.mkdir()
+    ids = [1, 2, 3, 4, 5]
+    _write_csv(pkg_dir / "projects.csv", {"id": [1], "name": ["Project"]})
+    _write_csv(pkg_dir / "sensors.csv", {
+        "id": ids,
+        "project_id": [1, 1, 1, 1, 1],
+        "sensor_model_id": [1, 1, 1, 1, 1],
+        "name": ["S1", "S2", "S3", "S4", "S5"],
+    })
+    pkg_file = pkg_dir / "datapackage.json"
+    pkg_file.write_text(json.dumps({
+        "name": "streaming",
+        "resources": [
+            {"name": "projects", "path": "projects.csv"},
+            {"name": "sensors", "path": "sensors.csv"},
+        ],
+    }), encoding="utf-8")
+
+    stats = importer.import_package(pkg_file)
+
+    assert stats["sensors"]["count"] == len(ids)
+    assert stats["sensors"]["batches"] == math.ceil(len(ids) / batch_size)
+    with Session(engine) as session:
+        sensors = session.execute(select(Sensor).order_by(Sensor.id)).scalars().all()
+        assert [s.name for s in sensors] == ["S1", "S2", "S3", "S4", "S5"]
+        assert sensors[0].project_id == 1
+
+
+def test_streaming_import_rolls_back_all_batches_of_a_resource(tmp_path: Path) -> None:
+    """A failing batch leaves no row of the resource behind.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+    importer = MetadataImporter(engine, batch_size=2)
+
+    # The third batch holds an id DuckDB cannot cast
+    _write_csv(tmp_path / "projects.csv", {"id": ["1", "2", "3", "4", "x"], "name": ["A", "B", "C", "D", "E"]})
+    resource = {"name": "projects", "path": "projects.csv"}
+
+    result = importer._import_resource(tmp_path, resource, Project)
+
+    assert result["status"] == "error"
+    with Session(engine) as session:
+        assert session.execute(select(Project)).first() is None
@@ -0,0 +1,223 @@
+"""Tests for incremental metadata re-imports."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+import pytest
+from arbolab.models import Base, ImportedRow, Project, Sensor, SensorModel
+from arbolab.services.importer import MetadataImporter
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture
+def engine() -> Engine:
+    """In-memory DuckDB engine with the core schema and one sensor model."""
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(SensorModel(id=1, name="Model"))
+        session.commit()
+    return engine
+
+
+def _write_csv(path: Path, data: dict[str, list[Any]]) -> None:
+    """Write a CSV, moving its mtime forward so the change is always visible.
+
+    Args:
+        path: Destination file path.
+        data: Column data mapping.
+    """
+    mtime = path.stat().st_mtime_ns if path.exists() else None
+    pl.DataFrame(data).write_csv(path)
+    if mtime is not None:
+        os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+def _write_package(pkg_dir: Path, sensor_names: dict[int, str]) -> Path:
+    """Write a package with one project and the given sensors.
+
+    Args:
+        pkg_dir: Package directory.
+        sensor_names: Sensor name per sensor id.
+    """
+    pkg_dir.mkdir(parents=True, exist_ok=True)
+    _write_csv(pkg_dir / "projects.csv", {"id": [1], "name": ["Project"]})
+    _write_csv(pkg_dir / "sensors.csv", {
+        "id": list(sensor_names),
+        "project_id": [1] * len(sensor_names),
+        "sensor_model_id": [1] * len(sensor_names),
+        "name": list(sensor_names.values()),
+    })
+    pkg_file = pkg_dir / "datapackage.json"
+    pkg_file.write_text(json.dumps({
+        "name": "field-package",
+        "resources": [
+            {"name": "projects", "path": "projects.csv"},
+            {"name": "sensors", "path": "sensors.csv"},
+        ],
+    }), encoding="utf-8")
+    return pkg_file
+
+
+def _sensor_names(engine: Engine) -> dict[int, str | None]:
+    """Sensor names by id.
+
+    Args:
+        engine: Database engine.
+    """
+    with Session(engine) as session:
+        return {row.id: row.name for row in session.execute(select(Sensor.id, Sensor.name).order_by(Sensor.id))}
+
+
+def test_reimport_skips_unchanged_files_without_reading_them(
+    tmp_path: Path, engine: Engine, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Reports unchanged resources and does not parse their CSVs.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        engine: Database engine fixture.
+        monkeypatch: Pytest monkeypatch fixture.
+    """
+    pkg_file = _write_package(tmp_path / "metadata", {1: "S1", 2: "S2"})
+    importer = MetadataImporter(engine)
+
+    first = importer.import_package(pkg_file)
+    assert (first["sensors"]["created"], first["sensors"]["skipped"]) == (2, 0)
+
+    def fail_read(path: Path) -> Any:
+        """Fail the test if a CSV is parsed."""
+        raise AssertionError(f"{path} was read")
+
+    monkeypatch.setattr("arbolab.services.importer.pl.read_csv", fail_read)
+    # Same content, new mtime: hashed once, still unchanged
+    os.utime(pkg_file.parent / "sensors.csv", ns=(1, 1))
+
+    second = importer.import_package(pkg_file)
+
+    assert second["projects"]["status"] == "unchanged"
+    assert second["sensors"] == {
+        **second["sensors"],
+        "status": "unchanged", "created": 0, "updated": 0, "skipped": 2, "deleted": 0, "removed": 0,
+    }
+
+
+def test_reimport_applies_only_changed_rows(tmp_path: Path, engine: Engine) -> None:
+    """Creates new rows, updates changed ones and deletes removed ones only on request.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        engine: Database engine fixture.
+    """
+    pkg_dir = tmp_path / "metadata"
+    pkg_file = _write_package(pkg_dir, {1: "S1", 2: "S2", 3: "S3"})
+    importer = MetadataImporter(engine)
+    importer.import_package(pkg_file)
+
+    _write_package(pkg_dir, {1: "S1", 2: "S2 renamed", 4: "S4"})
+    stats = importer.import_package(pkg_file)
+
+    sensors = stats["sensors"]
+    assert (sensors["created"], sensors["updated"], sensors["skipped"], sensors["deleted"]) == (1, 1, 1, 0)
+    assert sensors["removed"] == 1
+    assert sensors["count"] == sensors["created"] + sensors["updated"]
+    assert stats["projects"]["status"] == "unchanged"
+    assert _sensor_names(engine) == {1: "S1", 2: "S2 renamed", 3: "S3", 4: "S4"}
+
+    stats = importer.import_package(pkg_file, delete_removed=True)
+
+    assert (stats["sensors"]["skipped"], stats["sensors"]["deleted"]) == (len([1, 2, 4]), 1)
+    assert _sensor_names(engine) == {1: "S1", 2: "S2 renamed", 4: "S4"}
+    with Session(engine) as session:
+        stored = session.execute(
+            select(ImportedRow.row_id).where(ImportedRow.resource == "sensors").order_by(ImportedRow.row_id)
+        ).scalars().all()
+        assert stored == [1, 2, 4]
+
+
+def test_packages_with_the_same_name_do_not_share_fingerprints(tmp_path: Path, engine: Engine) -> None:
+    """A same-named package elsewhere neither skips nor deletes the rows of the first one.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        engine: Database engine fixture.
+    """
+    site_a = _write_package(tmp_path / "site_a" / "metadata", {1: "S1", 2: "S2"})
+    site_b = _write_package(tmp_path / "site_b" / "metadata", {2: "S2", 3: "S3"})
+    importer = MetadataImporter(engine)
+    importer.import_package(site_a)
+
+    stats = importer.import_package(site_b, delete_removed=True)
+
+    assert (stats["sensors"]["created"], stats["sensors"]["deleted"]) == (len([2, 3]), 0)
+    assert _sensor_names(engine) == {1: "S1", 2: "S2", 3: "S3"}
+
+    # Sensor 2 is also imported by site B, so removing it from site A keeps it
+    _write_package(tmp_path / "site_a" / "metadata", {1: "S1"})
+    stats = importer.import_package(site_a, delete_removed=True)
+
+    assert stats["sensors"]["deleted"] == 0
+    assert _sensor_names(engine) == {1: "S1", 2: "S2", 3: "S3"}
+
+
+def test_full_import_rewrites_every_row(tmp_path: Path, engine: Engine) -> None:
+    """`incremental=False` writes all rows again.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        engine: Database engine fixture.
+    """
+    pkg_file = _write_package(tmp_path / "metadata", {1: "S1", 2: "S2"})
+    importer = MetadataImporter(engine)
+    importer.import_package(pkg_file)
+    with Session(engine) as session:
+        session.get_one(Sensor, 1).name = "Edited"
+        session.commit()
+
+    assert importer.import_package(pkg_file)["sensors"]["status"] == "unchanged"
+    assert _sensor_names(engine)[1] == "Edited"
+
+    stats = importer.import_package(pkg_file, incremental=False)
+
+    assert stats["sensors"]["count"] == len(_sensor_names(engine))
+    assert "created" not in stats["sensors"]
+    assert _sensor_names(engine)[1] == "S1"
+    with Session(engine) as session:
+        assert session.execute(select(func.count()).select_from(Project)).scalar_one() == 1
+
+
+def test_rejected_foreign_key_change_keeps_rows_pending(tmp_path: Path, engine: Engine) -> None:
+    """A resource failing on a changed foreign key stores no fingerprints and is diffed again.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        engine: Database engine fixture.
+    """
+    pkg_dir = tmp_path / "metadata"
+    pkg_file = _write_package(pkg_dir, {1: "S1", 2: "S2"})
+    importer = MetadataImporter(engine)
+    importer.import_package(pkg_file)
+    with Session(engine) as session:
+        sensor_hashes = session.execute(select(ImportedRow.row_id, ImportedRow.row_hash).where(ImportedRow.resource == "sensors")).all()
+
+    _write_csv(pkg_dir / "projects.csv", {"id": [1, 2], "name": ["Project", "Other"]})
+    _write_csv(pkg_dir / "sensors.csv", {
+        "id": [1, 2], "project_id": [2, 1], "sensor_model_id": [1, 1], "name": ["S1 moved", "S2"],
+    })
+    stats = importer.import_package(pkg_file)
+
+    assert stats["sensors"]["status"] == "error"
+    assert _sensor_names(engine) == {1: "S1", 2: "S2"}
+    with Session(engine) as session:
+        assert session.execute(select(ImportedRow.row_id, ImportedRow.row_hash).where(ImportedRow.resource == "sensors")).all() == sensor_hashes
+
+    # Still a pending change on the next import, not skipped as already applied
+    retry = importer.import_package(pkg_file)
+    assert retry["sensors"]["status"] == "error"
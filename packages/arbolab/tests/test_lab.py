@@ -7,6 +7,7 @@ from typing import Any
 
 import pytest
 import yaml
+from arbolab.core.security import LabRole
 from arbolab.lab import Lab
 from sqlalchemy import text
 
@@ -180,3 +181,43 @@ def test_lab_run_recipe_default_path(tmp_path: Path, monkeypatch: pytest.MonkeyP
     recipe_path.write_text('{"recipe_version": "1.0.0", "steps": []}', encoding="utf-8")
 
     lab.run_recipe()
+
+
+def test_lab_viewer_reads_from_admin_instance(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Serves a VIEWER lab from the ADMIN lab's database through read-only cursors.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        monkeypatch: Pytest monkeypatch fixture.
+    """
+    _patch_empty_entry_points(monkeypatch)
+    admin = Lab.open(workspace_root=tmp_path / "workspace")
+    viewer = admin.viewer()
+
+    assert viewer.role == LabRole.VIEWER
+    assert viewer.database.is_reader
+    with admin.database.session() as session:
+        session.execute(text("insert into core_sys_metadata (key, value) values ('k', 'v')"))
+    with viewer.database.session() as session:
+        assert session.execute(text("select value from core_sys_metadata where key = 'k'")).scalar() == "v"
+    with pytest.raises(PermissionError, match="DELETE"), viewer.database.session() as session:
+        session.execute(text("delete from core_sys_metadata"))
+    with viewer.database.get_native_con() as con:
+        assert con.execute("select count(*) from core_sys_metadata where key = 'k'").fetchone()[0] == 1
+        with pytest.raises(PermissionError):
+            con.execute("select 1; drop table core_sys_metadata")
+
+    viewer.close()
+    with admin.database.session() as session:
+        assert session.execute(text("select count(*) from core_sys_metadata where key = 'k'")).scalar() == 1
+    admin.close()
+
+    # A reader does not reopen the closed ADMIN database
+    with pytest.raises(RuntimeError, match="closed"):
+        viewer.database.get_native_con()
+    with pytest.raises(RuntimeError, match="closed"), viewer.database.session() as session:
+        session.execute(text("select 1"))
+    admin.database.connect()
+    with viewer.database.get_native_con() as con:
+        assert con.execute("select count(*) from core_sys_metadata where key = 'k'").fetchone()[0] == 1
+    admin.database.close()
@@ -0,0 +1,148 @@
+"""Tests for metadata package validation."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+import pytest
+from arbolab.models import Base, Project, SensorModel
+from arbolab.services.importer import MetadataImporter
+from arbolab.services.validation import PackageValidationError
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture
+def engine() -> Engine:
+    """In-memory DuckDB engine with the core schema and one sensor model."""
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(SensorModel(id=1, name="Model"))
+        session.commit()
+    return engine
+
+
+def _write_package(pkg_dir: Path, tables: dict[str, dict[str, list[Any]]],
+                   schemas: dict[str, dict[str, Any]] | None = None) -> Path:
+    """Write CSVs and a datapackage.json describing them.
+
+    Args:
+        pkg_dir: Package directory to create.
+        tables: Column data per resource name.
+        schemas: Optional table schema per resource name.
+    """
+    pkg_dir.mkdir(parents=True)
+    resources = []
+    for name, data in tables.items():
+        pl.DataFrame(data).write_csv(pkg_dir / f"{name}.csv")
+        resource: dict[str, Any] = {"name": name, "path": f"{name}.csv"}
+        if schemas and name in schemas:
+            resource["schema"] = schemas[name]
+        resources.append(resource)
+    pkg_file = pkg_dir / "datapackage.json"
+    pkg_file.write_text(json.dumps({"name": "pkg", "resources": resources}), encoding="utf-8")
+    return pkg_file
+
+
+def test_valid_package_reports_every_resource(tmp_path: Path, engine: Engine) -> None:
+    """Reports row counts and no errors for a consistent package.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        engine: Database engine fixture.
+    """
+    pkg_file = _write_package(tmp_path / "metadata", {
+        "projects": {"id": [1, 2], "name": ["A", "B"]},
+        "sensors": {"id": [5, 6], "project_id": [1, 2], "sensor_model_id": [1, 1]},
+    })
+
+    report = MetadataImporter(engine).validate_package(pkg_file)
+
+    assert report["valid"] is True
+    assert report["resources"]["projects"] == {"rows": 2, "valid": True, "errors": []}
+    assert report["resources"]["sensors"]["rows"] == len([5, 6])
+
+
+def test_model_checks_resolve_foreign_keys_against_package_and_database(
+    tmp_path: Path, engine: Engine
+) -> None:
+    """Derives checks from the models when a resource declares no schema.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        engine: Database engine fixture.
+    """
+    with Session(engine) as session:
+        session.add(Project(id=3, name="Existing"))
+        session.commit()
+
+    pkg_file = _write_package(tmp_path / "metadata", {
+        "projects": {"id": [1, 1], "name": ["A", "A again"]},
+        # project 3 exists in the database, project 9 nowhere; sensor model 7 is unknown
+        "sensors": {"id": [5, 6, 7], "project_id": [1, 3, 9], "sensor_model_id": [1, 1, 7]},
+        "experiments": {"id": [8], "project_id": [1], "name": ["E"], "start_time": ["not a date"]},
+    })
+
+    report = MetadataImporter(engine).validate_package(pkg_file)
+    errors = {name: r["errors"] for name, r in report["resources"].items()}
+
+    assert report["valid"] is False
+    assert [(e["check"], e["fields"], e["count"]) for e in errors["projects"]] == [
+        ("primary_key", ["id"], 2)
+    ]
+    assert sorted((e["fields"][0], e["examples"]) for e in errors["sensors"]) == [
+        ("project_id", [9]),
+        ("sensor_model_id", [7]),
+    ]
+    assert [(e["check"], e["examples"]) for e in errors["experiments"]] == [("type", ["not a date"])]
+
+
+def test_declared_schema_failure_blocks_import(tmp_path: Path, engine: Engine) -> None:
+    """Checks the declared schema and writes nothing when validation fails.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        engine: Database engine fixture.
+    """
+    schemas: dict[str, dict[str, Any]] = {
+        "projects": {
+            "fields": [
+                {"name": "id", "type": "integer"},
+                {"name": "name", "type": "string", "constraints": {"required": True}},
+                {"name": "code", "type": "string"},
+            ],
+            "primaryKey": "id",
+        },
+        "things": {
+            "fields": [{"name": "id", "type": "integer"}, {"name": "project_id", "type": "integer"}],
+            "primaryKey": ["id"],
+            "foreignKeys": [
+                {"fields": "project_id", "reference": {"resource": "projects", "fields": "id"}}
+            ],
+        },
+    }
+    pkg_file = _write_package(tmp_path / "metadata", {
+        "projects": {"id": ["1", "x"], "name": ["A", None]},
+        "things": {"id": [10, 11], "project_id": [1, 2], "kind": ["tree", "tree"]},
+    }, schemas)
+
+    with pytest.raises(PackageValidationError) as exc_info:
+        MetadataImporter(engine).import_package(pkg_file)
+
+    projects = exc_info.value.report["resources"]["projects"]["errors"]
+    assert {(e["check"], e["fields"][0]) for e in projects} == {
+        ("required", "code"),
+        ("required", "name"),
+        ("type", "id"),
+    }
+    things = exc_info.value.report["resources"]["things"]["errors"]
+    assert [(e["check"], e["examples"]) for e in things] == [("foreign_key", [2])]
+    assert "things.project_id: not found in projects.id" in str(exc_info.value)
+
+    with Session(engine) as session:
+        assert session.execute(select(func.count()).select_from(Project)).scalar_one() == 0
@@ -0,0 +1,167 @@
+"""Tests for the append-only RecipeJournal."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from arbolab.core.recipes.journal import RecipeJournal
+from arbolab.core.recipes.schemas import Recipe, RecipeStep
+
+
+def _step(index: int) -> RecipeStep:
+    """Build a numbered define_project step.
+
+    Args:
+        index: Step number used for id and name.
+    """
+    return RecipeStep(
+        step_id=f"step-{index}", step_type="define_project", params={"name": f"P{index}"}, author_id=None
+    )
+
+
+def test_journal_appends_and_reads_back(tmp_path: Path) -> None:
+    """Appends steps and reads them back in order.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    journal = RecipeJournal(tmp_path)
+
+    assert not journal.exists()
+    assert journal.step_count == 0
+
+    journal.append(_step(0))
+    journal.append_many([_step(1), _step(2)])
+    expected = ["step-0", "step-1", "step-2"]
+
+    assert journal.exists()
+    assert journal.step_count == len(expected)
+    assert [s.step_id for s in journal.iter_steps()] == expected
+    assert [s.step_id for s in journal.iter_steps(start=2)] == ["step-2"]
+
+    # A fresh instance sees the same steps even before the next checkpoint
+    reopened = RecipeJournal(tmp_path)
+    assert reopened.step_count == len(expected)
+    assert reopened.load().steps[1].params == {"name": "P1"}
+
+
+def test_journal_rotates_segments(tmp_path: Path) -> None:
+    """Starts a new segment once the active one is full.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    journal = RecipeJournal(tmp_path, segment_size=2, checkpoint_interval=1)
+    steps = [_step(i) for i in range(5)]
+
+    for step in steps:
+        journal.append(step)
+
+    segments = sorted(p.name for p in journal.journal_dir.glob("segment-*.jsonl"))
+    assert segments == ["segment-000000.jsonl", "segment-000001.jsonl", "segment-000002.jsonl"]
+
+    manifest = json.loads(journal.manifest_path.read_text(encoding="utf-8"))
+    assert manifest["step_count"] == len(steps)
+    assert [s["first_index"] for s in manifest["segments"]] == [0, 2, 4]
+
+    assert [s.step_id for s in RecipeJournal(tmp_path).iter_steps(start=3)] == ["step-3", "step-4"]
+
+
+def test_journal_truncate_discards_append(tmp_path: Path) -> None:
+    """Rolls back an append using the returned mark.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    journal = RecipeJournal(tmp_path)
+    journal.append(_step(0))
+
+    mark = journal.append_many([_step(1), _step(2)])
+    journal.truncate(mark)
+
+    assert journal.step_count == 1
+    assert [s.step_id for s in RecipeJournal(tmp_path).iter_steps()] == ["step-0"]
+
+
+def test_journal_ignores_torn_trailing_line(tmp_path: Path) -> None:
+    """Skips and repairs an incomplete line left by an interrupted write.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    journal = RecipeJournal(tmp_path)
+    journal.append(_step(0))
+
+    segment = journal.journal_dir / "segment-000000.jsonl"
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write('{"step_id": "tor')
+
+    reopened = RecipeJournal(tmp_path)
+    assert reopened.step_count == 1
+
+    reopened.append(_step(1))
+    assert [s.step_id for s in RecipeJournal(tmp_path).iter_steps()] == ["step-0", "step-1"]
+
+
+def test_journal_migrates_legacy_recipe(tmp_path: Path) -> None:
+    """Reads a single-file current.json as is and migrates it on the first append.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    legacy = Recipe(steps=[_step(0), _step(1)])
+    (tmp_path / "current.json").write_text(legacy.model_dump_json(indent=2), encoding="utf-8")
+
+    journal = RecipeJournal(tmp_path)
+
+    assert journal.step_count == len(legacy.steps)
+    assert [s.step_id for s in journal.iter_steps()] == ["step-0", "step-1"]
+    assert journal.materialize() == tmp_path / "current.json"
+    assert not journal.journal_dir.exists()
+
+    journal.append(_step(2))
+    assert journal.manifest_path.exists()
+    assert [s.step_id for s in RecipeJournal(tmp_path).iter_steps()] == ["step-0", "step-1", "step-2"]
+
+
+def test_journal_keeps_steps_of_other_writers(tmp_path: Path) -> None:
+    """Appends after steps written by another instance instead of truncating them.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    first = RecipeJournal(tmp_path)
+    first.append(_step(0))
+    second = RecipeJournal(tmp_path)
+    second.append(_step(1))
+
+    first.append(_step(2))
+
+    assert [s.step_id for s in RecipeJournal(tmp_path).iter_steps()] == ["step-0", "step-1", "step-2"]
+
+
+def test_journal_materializes_current_json(tmp_path: Path) -> None:
+    """Writes the legacy single-file format on demand.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    journal = RecipeJournal(tmp_path)
+    journal.append(_step(0))
+    mark = journal.append(_step(1))
+
+    path = journal.materialize()
+
+    assert path == tmp_path / "current.json"
+    recipe = Recipe.model_validate_json(path.read_text(encoding="utf-8"))
+    assert [s.step_id for s in recipe.steps] == ["step-0", "step-1"]
+
+    mtime = path.stat().st_mtime_ns
+    assert journal.materialize().stat().st_mtime_ns == mtime
+
+    # Same step count, different last step: the materialized file is stale
+    journal.truncate(mark)
+    journal.append(_step(2))
+    recipe = Recipe.model_validate_json(journal.materialize().read_text(encoding="utf-8"))
+    assert [s.step_id for s in recipe.steps] == ["step-0", "step-2"]
@@ -0,0 +1,159 @@
+"""Tests for the batched, resumable recipe replay."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from arbolab.core.recipes.executor import RecipeExecutor
+from arbolab.core.recipes.replay import RecipeReplayer
+from arbolab.core.recipes.schemas import RecipeStep
+from arbolab.lab import Lab
+from arbolab.models.core import Project, Sensor
+from sqlalchemy import func, select
+
+SENSORS = 5
+
+
+def _record_recipe(workspace_root: Path) -> Path:
+    """Record a small recipe in a source workspace and export it.
+
+    Args:
+        workspace_root: Root of the source workspace.
+    """
+    with Lab.open(workspace_root=workspace_root) as lab:
+        project = lab.define_project(name="Alpha")
+        with lab.batch():
+            for i in range(SENSORS):
+                lab.define_sensor(name=f"S{i}", sensor_model_id=1, project_id=project.id)
+        lab.modify_sensor(id=1, description="first")
+        return Path(lab.recipe_journal.materialize())
+
+
+def _count(lab: Lab, model: type) -> int:
+    """Count rows of a model.
+
+    Args:
+        lab: Lab to query.
+        model: Model class to count.
+    """
+    with lab.database.session() as session:
+        return int(session.execute(select(func.count()).select_from(model)).scalar_one())
+
+
+def test_replay_into_fresh_workspace(tmp_path: Path) -> None:
+    """Replays an exported recipe in batches and records it in the target.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    recipe_path = _record_recipe(tmp_path / "source")
+
+    with Lab.open(workspace_root=tmp_path / "target") as lab:
+        stats = lab.run_recipe(recipe_path, batch_size=3)
+
+        # Project, sensors and the modification in batches of three
+        assert (stats.applied, stats.skipped) == (SENSORS + 2, 0)
+        assert stats.batches == -(-stats.applied // 3)
+        assert _count(lab, Sensor) == SENSORS
+        with lab.database.session() as session:
+            sensor = session.get(Sensor, 1)
+            assert sensor is not None
+            assert sensor.description == "first"
+        recipe = RecipeExecutor.load_recipe(lab)
+        assert [s.step_type for s in recipe.steps].count("define_sensor") == SENSORS
+
+        # Running it again finds everything applied
+        stats = lab.run_recipe(recipe_path)
+        assert stats.resumed_from == stats.total
+        assert stats.applied == 0
+
+
+def test_replay_resumes_after_interruption(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Continues after the last committed batch when a replay failed midway.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        monkeypatch: Pytest monkeypatch fixture.
+    """
+    recipe_path = _record_recipe(tmp_path / "source")
+
+    with Lab.open(workspace_root=tmp_path / "target") as lab:
+        original = RecipeReplayer._apply_chunk
+        calls = {"n": 0}
+
+        def flaky_apply(self: RecipeReplayer, chunk: list[RecipeStep], skip: set[int]) -> None:
+            calls["n"] += 1
+            if calls["n"] > 1:
+                raise RuntimeError("interrupted")
+            original(self, chunk, skip)
+
+        monkeypatch.setattr(RecipeReplayer, "_apply_chunk", flaky_apply)
+        with pytest.raises(RuntimeError):
+            lab.run_recipe(recipe_path, batch_size=3)
+        committed = _count(lab, Sensor)
+
+        monkeypatch.setattr(RecipeReplayer, "_apply_chunk", original)
+        stats = lab.run_recipe(recipe_path, batch_size=3)
+
+        # open_lab + first batch (project and two sensors) were committed before the failure
+        assert stats.resumed_from == 1 + 1 + committed
+        assert _count(lab, Sensor) == SENSORS
+        assert lab.recipe_journal.step_count == stats.total
+
+
+def test_replay_skips_present_effects(tmp_path: Path) -> None:
+    """Skips define steps whose entity already exists and does not journal them again.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    recipe_path = _record_recipe(tmp_path / "source")
+
+    with Lab.open(workspace_root=tmp_path / "target") as lab:
+        lab.define_project(name="Alpha")
+        lab.define_sensor(name="S0", sensor_model_id=1, project_id=1)
+
+        stats = lab.run_recipe(recipe_path)
+
+        assert stats.skipped == len(["Alpha", "S0"])
+        assert _count(lab, Project) == 1
+        assert _count(lab, Sensor) == SENSORS
+        step_types = [s.step_type for s in lab.recipe_journal.load().steps]
+        assert step_types.count("define_project") == 1
+        assert step_types.count("define_sensor") == SENSORS
+
+
+def test_replaying_own_recipe_does_not_record_again(tmp_path: Path) -> None:
+    """Replays the workspace journal without appending to it.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    with Lab.open(workspace_root=tmp_path) as lab:
+        names = ["Alpha", "Beta"]
+        for name in names:
+            lab.define_project(name=name)
+        step_count = lab.recipe_journal.step_count
+
+        stats = lab.run_recipe()
+
+        assert stats.applied == 0
+        assert stats.resumed_from == stats.total
+        assert lab.recipe_journal.step_count == step_count
+        assert _count(lab, Project) == len(names)
+
+
+def test_every_commit_moves_the_applied_marker(tmp_path: Path) -> None:
+    """Records the applied-step marker with single steps and at batch boundaries.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    with Lab.open(workspace_root=tmp_path) as lab:
+        lab.define_project(name="Single")
+        assert RecipeExecutor.applied_step_id(lab) == lab.recipe_journal.load().steps[-1].step_id
+
+        with lab.batch() as batch:
+            lab.define_project(name="Batched")
+        assert RecipeExecutor.applied_step_id(lab) == batch.last_step_id
@@ -0,0 +1,201 @@
+"""Tests for recipe state snapshots."""
+
+from __future__ import annotations
+
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from arbolab.core.recipes.executor import RecipeExecutor
+from arbolab.lab import Lab
+from arbolab.models.core import (
+    Datastream,
+    DataVariant,
+    Experiment,
+    ExperimentalUnit,
+    Project,
+    Sensor,
+    SensorDeployment,
+    SensorModel,
+    Thing,
+)
+from sqlalchemy import func, select
+
+PROJECTS = 10
+
+
+@pytest.fixture
+def snapshot_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Snapshot every three steps and keep two snapshots.
+
+    Args:
+        monkeypatch: Pytest monkeypatch fixture.
+    """
+    monkeypatch.setenv("ARBO_RECIPE_SNAPSHOT_INTERVAL", "3")
+    monkeypatch.setenv("ARBO_RECIPE_SNAPSHOT_RETENTION", "2")
+
+
+def _project_names(lab: Lab) -> list[str]:
+    """Names of all projects, ordered by id.
+
+    Args:
+        lab: Lab to query.
+    """
+    with lab.database.session() as session:
+        return [name or "" for name in session.execute(select(Project.name).order_by(Project.id)).scalars()]
+
+
+def _register_variant(lab: Lab) -> None:
+    """Register a data variant (with its parent records) outside the recipe.
+
+    Args:
+        lab: Lab to write to.
+    """
+    start = datetime(2026, 1, 1)
+    with lab.database.session() as session:
+        project = session.scalars(select(Project).order_by(Project.id)).first()
+        assert project is not None
+        sensor_model = SensorModel(name="SM")
+        session.add(sensor_model)
+        session.flush()
+        experiment = Experiment(project_id=project.id, name="E", start_time=start)
+        sensor = Sensor(project_id=project.id, sensor_model_id=sensor_model.id, name="S")
+        thing = Thing(project_id=project.id, kind="tree", name="T")
+        session.add_all([experiment, sensor, thing])
+        session.flush()
+        unit = ExperimentalUnit(project_id=project.id, thing_id=thing.id, name="EU")
+        session.add(unit)
+        session.flush()
+        deployment = SensorDeployment(
+            experiment_id=experiment.id, experimental_unit_id=unit.id, sensor_id=sensor.id, start_time=start
+        )
+        session.add(deployment)
+        session.flush()
+        datastream = Datastream(sensor_deployment_id=deployment.id, name="DS")
+        session.add(datastream)
+        session.flush()
+        session.add(DataVariant(datastream_id=datastream.id, variant_name="raw"))
+        session.commit()
+
+
+def test_snapshots_are_taken_and_pruned(tmp_path: Path, snapshot_env: None) -> None:
+    """Takes a snapshot every interval steps and keeps only the newest ones.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        snapshot_env: Snapshot configuration fixture.
+    """
+    with Lab.open(workspace_root=tmp_path) as lab:
+        for i in range(PROJECTS):
+            lab.define_project(name=f"P{i}")
+            # Snapshots are written in the background; a running one defers the next
+            lab.recipe_snapshots.wait()
+
+        snapshots = lab.recipe_snapshots.list_snapshots()
+
+        # open_lab + 10 steps: snapshots after journal index 3, 6 and 9
+        assert [s.step_index for s in snapshots] == [6, 9]
+        assert (snapshots[-1].path / "schema.sql").exists()
+        assert lab.layout.snapshots_dir == lab.layout.recipes_dir / "snapshots"
+
+
+def test_rebuild_restores_snapshot_and_replays_tail(tmp_path: Path, snapshot_env: None) -> None:
+    """Rebuilds the database from the newest snapshot plus the remaining steps.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        snapshot_env: Snapshot configuration fixture.
+    """
+    with Lab.open(workspace_root=tmp_path) as lab:
+        for i in range(PROJECTS):
+            lab.define_project(name=f"P{i}")
+            lab.recipe_snapshots.wait()
+        lab.remove_project(id=1)
+        expected = _project_names(lab)
+
+        stats = lab.rebuild()
+
+        # Newest snapshot after journal index 9; P9 and the removal are replayed
+        assert stats.snapshot == "step-000000009"
+        assert stats.resumed_from == stats.total - len(["P9", "remove"])
+        assert stats.applied == len(["P9", "remove"])
+        assert _project_names(lab) == expected
+
+        # Sequences continue where the original database left off
+        project = lab.define_project(name="Next")
+        assert project.id == PROJECTS + 1
+
+
+def test_replay_without_applied_marker_keeps_database(tmp_path: Path, snapshot_env: None) -> None:
+    """Does not restore a snapshot over a database not known to match the recipe.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        snapshot_env: Snapshot configuration fixture.
+    """
+    with Lab.open(workspace_root=tmp_path / "workspace") as lab:
+        for i in range(PROJECTS):
+            lab.define_project(name=f"P{i}")
+            lab.recipe_snapshots.wait()
+        recipe_path = shutil.copy(lab.recipe_journal.materialize(), tmp_path / "recipe.json")
+        lab.modify_project(id=1, description="live state")
+
+        stats = lab.run_recipe(Path(recipe_path))
+
+        assert stats.snapshot is None
+        with lab.database.session() as session:
+            project = session.get(Project, 1)
+            assert project is not None
+            assert project.description == "live state"
+
+
+def test_run_recipe_refuses_snapshot_over_unrecorded_variants(tmp_path: Path, snapshot_env: None) -> None:
+    """Does not restore a snapshot that would drop data variants registered outside the recipe.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        snapshot_env: Snapshot configuration fixture.
+    """
+    with Lab.open(workspace_root=tmp_path) as lab:
+        for i in range(PROJECTS):
+            lab.define_project(name=f"P{i}")
+            lab.recipe_snapshots.wait()
+        # The database is known to hold the recipe up to journal index 2 only
+        steps = lab.recipe_journal.load().steps
+        with lab.database.transaction() as session:
+            RecipeExecutor._mark_applied(session, steps[2].step_id)
+        _register_variant(lab)
+
+        with pytest.raises(ValueError, match="restoring a snapshot"):
+            lab.run_recipe()
+        with lab.database.session() as session:
+            assert session.execute(select(func.count()).select_from(DataVariant)).scalar_one() == 1
+
+        stats = lab.run_recipe(discard_unrecorded=True)
+
+        assert stats.snapshot == "step-000000009"
+        with lab.database.session() as session:
+            assert session.execute(select(func.count()).select_from(DataVariant)).scalar_one() == 0
+
+
+def test_rebuild_without_snapshots_replays_everything(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Falls back to a full replay when snapshots are disabled.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+        monkeypatch: Pytest monkeypatch fixture.
+    """
+    monkeypatch.setenv("ARBO_RECIPE_SNAPSHOT_INTERVAL", "0")
+
+    with Lab.open(workspace_root=tmp_path) as lab:
+        lab.define_project(name="A")
+        lab.define_project(name="B")
+
+        stats = lab.rebuild()
+
+        assert stats.snapshot is None
+        assert stats.applied == len(["A", "B"])
+        assert lab.recipe_snapshots.list_snapshots() == []
+        with lab.database.session() as session:
+            assert session.execute(select(func.count()).select_from(Project)).scalar_one() == stats.applied
@@ -60,3 +60,75 @@ def test_lab_getattr_dispatch(lab):
     species = lab.define_tree_species(name="Quercus robur")
     assert species.id is not None
     assert species.name == "Quercus robur"
+
+def test_recipe_steps_are_journaled(lab: Lab) -> None:
+    # Every step is appended to the journal, headed by the implicit open_lab step
+    lab.define_project(name="Journaled")
+    lab.define_project(name="Journaled Too")
+
+    recipe = RecipeExecutor.load_recipe(lab)
+
+    assert [s.step_type for s in recipe.steps] == ["open_lab", "define_project", "define_project"]
+    assert lab.recipe_journal.step_count == len(recipe.steps)
+    assert lab.recipe_journal.manifest_path.exists()
+
+def test_open_lab_step_is_recorded_by_the_first_author(lab: Lab) -> None:
+    lab.execute_step("define_project", {"name": "Authored"}, author_id="alice")
+    lab.execute_step("define_project", {"name": "Other"}, author_id="bob")
+
+    steps = RecipeExecutor.load_recipe(lab).steps
+    assert [s.author_id for s in steps] == ["alice", "alice", "bob"]
+
+def test_batch_records_steps_with_single_append(lab: Lab) -> None:
+    # All steps of a batch land in the journal together, after the commit
+    with lab.batch() as batch:
+        project = lab.define_project(name="Batched")
+        lab.define_sensor(name="S1", sensor_model_id=1, project_id=project.id)
+        lab.define_sensor(name="S2", sensor_model_id=1, project_id=project.id)
+        assert lab.recipe_journal.step_count == 0
+
+    recipe = RecipeExecutor.load_recipe(lab)
+    assert [s.step_type for s in recipe.steps] == [
+        "open_lab", "define_project", "define_sensor", "define_sensor"
+    ]
+    assert len(batch) == len(recipe.steps) - 1
+
+
+def test_batch_failure_rolls_back_database_and_recipe(lab: Lab) -> None:
+    lab.define_project(name="Existing")
+
+    with pytest.raises(ValueError):
+        with lab.batch():
+            lab.define_project(name="Rolled Back")
+            lab.modify_project(id=999, name="Missing")
+
+    with lab.database.session() as session:
+        names = {p.name for p in session.query(Project).all()}
+    assert names == {"Existing"}
+    assert [s.step_type for s in RecipeExecutor.load_recipe(lab).steps] == ["open_lab", "define_project"]
+
+
+def test_execute_steps_runs_batch(lab: Lab) -> None:
+    results = lab.execute_steps([
+        ("define_project", {"name": "A"}),
+        ("define_project", {"name": "B"}),
+    ])
+
+    assert [p.name for p in results] == ["A", "B"]
+    assert lab.recipe_journal.step_count == len(results) + 1
+
+
+def test_batch_rejects_non_transactional_steps(lab: Lab) -> None:
+    with pytest.raises(ValueError):
+        with lab.batch():
+            lab.modify_config(enabled_plugins=[])
+
+
+def test_modify_step_reloads_server_fields(lab: Lab) -> None:
+    project = lab.define_project(name="Alpha")
+    lab.define_project(name="Beta")
+
+    modified = lab.modify_project(id=project.id, description="changed")
+
+    assert modified.description == "changed"
+    assert modified.updated_at is not None
@@ -2,10 +2,39 @@
 
 from __future__ import annotations
 
+import math
+from datetime import datetime, timedelta
 from pathlib import Path
 
+import duckdb
+import polars as pl
+import pyarrow.parquet as pq
 import pytest
-from arbolab.store import VariantStore
+from arbolab.models import (
+    Base,
+    Datastream,
+    DataVariant,
+    Experiment,
+    ExperimentalUnit,
+    Project,
+    Sensor,
+    SensorDeployment,
+    SensorModel,
+    Thing,
+)
+from arbolab.services.compaction import VariantCompactor
+from arbolab.services.derivation import VariantDeriver
+from arbolab.services.downsampling import Downsampler
+from arbolab.services.rollups import VariantRollups
+from arbolab.store import (
+    MERGED_FILE_INFIX,
+    ParquetLayout,
+    VariantStore,
+    content_hash,
+    stored_content_hash,
+)
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
 
 
 class DummyParquetWriter:
@@ -28,6 +57,54 @@ class DummyParquetWriter:
         path.write_bytes(self.payload)
 
 
+def _datastream(session: Session) -> Datastream:
+    """Create a datastream with the minimal parent records.
+
+    Args:
+        session: Session on an empty core schema.
+    """
+    project = Project(name="P1")
+    sensor_model = SensorModel(name="SM1")
+    session.add_all([project, sensor_model])
+    session.flush()
+    experiment = Experiment(project_id=project.id, name="E1", start_time=datetime(2026, 1, 1))
+    sensor = Sensor(project_id=project.id, sensor_model_id=sensor_model.id, name="S1")
+    thing = Thing(project_id=project.id, kind="tree", name="T1")
+    session.add_all([experiment, sensor, thing])
+    session.flush()
+    unit = ExperimentalUnit(project_id=project.id, thing_id=thing.id, name="EU1")
+    session.add(unit)
+    session.flush()
+    deployment = SensorDeployment(
+        experiment_id=experiment.id,
+        experimental_unit_id=unit.id,
+        sensor_id=sensor.id,
+        start_time=datetime(2026, 1, 1),
+    )
+    session.add(deployment)
+    session.flush()
+    datastream = Datastream(sensor_deployment_id=deployment.id, name="DS1")
+    session.add(datastream)
+    session.flush()
+    return datastream
+
+
+def _series(start: datetime, end: datetime, every: str = "1m") -> pl.DataFrame:
+    """Build a wide sensor series from start to end (inclusive).
+
+    Args:
+        start: First timestamp.
+        end: Last timestamp.
+        every: Sampling interval.
+    """
+    timestamps = pl.datetime_range(start, end, every, eager=True)
+    return pl.DataFrame({
+        "timestamp": timestamps,
+        "value": pl.int_range(len(timestamps), eager=True).cast(pl.Float64),
+        "flag": ["ok"] * len(timestamps),
+    })
+
+
 def test_variant_store_write_variant_creates_file(tmp_path: Path) -> None:
     """Writes a variant parquet file to the canonical path.
 
@@ -70,3 +147,425 @@ def test_variant_store_write_variant_requires_write_parquet(tmp_path: Path) -> N
 
     with pytest.raises(NotImplementedError):
         store.write_variant(project_id=1, datastream_id=2, variant_name="raw", data=object())
+
+
+def test_variant_store_scan_projects_and_filters_time_range(tmp_path: Path) -> None:
+    """Scans only the requested columns and time range of a variant.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path)
+    start = datetime(2026, 1, 1)
+    data = pl.DataFrame({
+        "timestamp": pl.datetime_range(start, start + timedelta(hours=23), "1h", eager=True),
+        "temperature": [float(i) for i in range(24)],
+        "humidity": [50.0] * 24,
+    })
+    store.write_variant(project_id=1, datastream_id=2, variant_name="raw", data=data)
+
+    lf = store.scan(
+        datastream_id=2,
+        variant_name="raw",
+        columns=["temperature"],
+        time_range=(start + timedelta(hours=3), start + timedelta(hours=6)),
+    )
+    result = lf.collect()
+
+    assert result.columns == ["timestamp", "temperature"]
+    assert result["temperature"].to_list() == [3.0, 4.0, 5.0]
+
+    with pytest.raises(FileNotFoundError):
+        store.scan(datastream_id=2, variant_name="missing")
+
+
+def test_variant_store_write_partitioned_splits_by_day(tmp_path: Path) -> None:
+    """Writes one sorted, row-group-tuned file per day and records them on the DataVariant.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path)
+    start = datetime(2026, 1, 1)
+    data = _series(start, start + timedelta(days=2, hours=23))
+    row_group_size = 600
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        datastream_id = _datastream(session).id
+        files = store.write_partitioned(
+            project_id=1,
+            datastream_id=datastream_id,
+            variant_name="raw",
+            data=data.sample(fraction=1.0, shuffle=True, seed=1),
+            layout=ParquetLayout(row_group_size=row_group_size),
+            session=session,
+        )
+        session.commit()
+
+        assert [f.name for f in files] == [
+            "2026-01-01T00-00-00.parquet",
+            "2026-01-02T00-00-00.parquet",
+            "2026-01-03T00-00-00.parquet",
+        ]
+        variant = session.scalars(select(DataVariant)).one()
+        assert variant.data_files == [f.relative_to(tmp_path).as_posix() for f in files]
+
+    metadata = pq.ParquetFile(files[0]).metadata
+    # One day of minutes per partition file
+    assert metadata.num_row_groups == math.ceil(24 * 60 / row_group_size)
+    first_group = metadata.row_group(0).column(0)
+    assert first_group.compression == "ZSTD"
+    assert first_group.statistics is not None
+    assert first_group.statistics.min == start
+    assert first_group.statistics.max == start + timedelta(minutes=row_group_size - 1)
+    assert store.scan(datastream_id, "raw").collect().equals(data)
+
+    assert store.write_partitioned(1, datastream_id, "raw", data) == []
+    with pytest.raises(FileExistsError):
+        store.write_partitioned(1, datastream_id, "raw", data.with_columns(pl.col("value") + 1))
+
+
+def test_variant_store_write_partitioned_append_touches_only_its_partitions(tmp_path: Path) -> None:
+    """Appends rows into the partitions they fall into and leaves the others untouched.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path)
+    start = datetime(2026, 1, 1)
+    first, second, _ = store.write_partitioned(1, 2, "raw", _series(start, start + timedelta(days=2, hours=23)))
+    untouched = first.stat().st_mtime_ns
+
+    late = _series(start + timedelta(days=1, hours=23, minutes=59, seconds=30), start + timedelta(days=3), "1d")
+    written = store.write_partitioned(1, 2, "raw", late, mode="append")
+
+    assert [f.name for f in written] == [second.name, "2026-01-03T00-00-00.parquet"]
+    assert first.stat().st_mtime_ns == untouched
+    merged = pl.read_parquet(second)
+    assert merged.height == 24 * 60 + 1
+    assert merged["timestamp"].is_sorted()
+
+
+def test_variant_store_write_registers_footer_statistics(tmp_path: Path) -> None:
+    """Upserts the DataVariant with statistics from the Parquet footers on every write.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path)
+    start = datetime(2026, 1, 1)
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+
+    data = _series(start, start + timedelta(hours=1))
+
+    with Session(engine) as session:
+        datastream_id = _datastream(session).id
+        path = store.write_variant(
+            1, datastream_id, "raw", data,
+            session=session,
+            column_specs=[{"name": "value", "unit": "Cel", "description": "Air temperature"}],
+        )
+        session.commit()
+
+        variant = session.scalars(select(DataVariant)).one()
+        assert variant.row_count == data.height
+        assert variant.column_count == data.width
+        assert variant.file_size_bytes == path.stat().st_size
+        assert variant.properties == {"content_hashes": {path.relative_to(tmp_path).as_posix(): stored_content_hash(path)}}
+        assert (variant.first_timestamp, variant.last_timestamp) == (start, start + timedelta(hours=1))
+        assert variant.column_specs == [
+            {"name": "timestamp", "dtype": "datetime"},
+            {"name": "value", "unit": "Cel", "description": "Air temperature", "dtype": "float64"},
+            {"name": "flag", "dtype": "string"},
+        ]
+
+        store.write_partitioned(1, datastream_id, "daily", _series(start, start + timedelta(days=1, hours=1)), session=session)
+        store.write_partitioned(
+            1, datastream_id, "daily", _series(start + timedelta(days=3), start + timedelta(days=3)),
+            mode="append", session=session,
+        )
+        session.commit()
+
+        daily = session.scalars(select(DataVariant).filter_by(variant_name="daily")).one()
+        assert [Path(f).name for f in daily.data_files or []] == [
+            "2026-01-01T00-00-00.parquet",
+            "2026-01-02T00-00-00.parquet",
+            "2026-01-04T00-00-00.parquet",
+        ]
+        assert daily.row_count == 25 * 60 + 2
+        assert (daily.first_timestamp, daily.last_timestamp) == (start, start + timedelta(days=3))
+
+
+def test_variant_store_write_is_idempotent_by_content_hash(tmp_path: Path) -> None:
+    """Skips identical rewrites, rejects differing data and leaves no temp files behind.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path)
+    start = datetime(2026, 1, 1)
+    data = _series(start, start + timedelta(hours=1))
+
+    path = store.write_variant(1, 2, "raw", data)
+    written = path.stat().st_mtime_ns
+    rechunked = pl.concat([data[:10], data[10:]], rechunk=False)
+
+    assert store.write_variant(1, 2, "raw", rechunked.to_arrow()) == path
+    assert path.stat().st_mtime_ns == written
+    assert stored_content_hash(path) == content_hash(data)
+
+    changed = data.with_columns(pl.col("value") * 2)
+    with pytest.raises(FileExistsError):
+        store.write_variant(1, 2, "raw", changed)
+    store.write_variant(1, 2, "raw", changed, clobber=True)
+
+    assert pl.read_parquet(path).equals(changed)
+    assert [p.name for p in path.parent.iterdir()] == ["raw.parquet"]
+
+
+def test_variant_store_open_writer_streams_chunks(tmp_path: Path) -> None:
+    """Streams Arrow and Polars chunks into one variant file with a consistent schema.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path)
+    start = datetime(2026, 1, 1)
+    data = _series(start, start + timedelta(hours=2))
+    chunks = [data[:50].to_arrow().to_batches()[0], data[50:100], data[100:].select("flag", "value", "timestamp")]
+    engine = create_engine("duckdb:///:memory:")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        datastream_id = _datastream(session).id
+        with store.open_writer(1, datastream_id, "raw", session=session) as writer:
+            writer.write_all(iter(chunks))
+        session.commit()
+
+        variant = session.scalars(select(DataVariant)).one()
+        assert variant.row_count == data.height
+        assert variant.last_timestamp == start + timedelta(hours=2)
+
+    path = writer.file_path
+    assert pl.read_parquet(path).equals(data)
+    assert stored_content_hash(path) == content_hash(data)
+    assert store.write_variant(1, datastream_id, "raw", data) == path
+
+    with pytest.raises(ValueError, match="columns"), store.open_writer(1, datastream_id, "other") as writer:
+        writer.write(data)
+        writer.write(data.drop("flag"))
+    assert sorted(p.name for p in path.parent.iterdir()) == ["raw.parquet"]
+
+
+def test_variant_compactor_merges_small_partitions(tmp_path: Path) -> None:
+    """Reports the expected reduction on a dry run, then merges small partition files.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path / "variants")
+    start = datetime(2026, 1, 1)
+    data = _series(start, start + timedelta(days=9, hours=23), "10m")
+    engine = create_engine(f"duckdb:///{tmp_path / 'arbolab.duckdb'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        datastream_id = _datastream(session).id
+        store.write_partitioned(1, datastream_id, "raw", data, session=session)
+        session.commit()
+    files = store.variant_files(datastream_id, "raw")
+    compactor = VariantCompactor(store, engine, target_file_bytes=4 * files[0].stat().st_size)
+
+    report = compactor.compact(dry_run=True)
+
+    assert report["files_before"] == len(files)
+    # Runs of four files reach the target size
+    assert report["files_after"] == len(files[::4])
+    assert report["bytes_after"] < report["bytes_before"]
+    assert store.variant_files(datastream_id, "raw") == files
+
+    assert compactor.compact()["files_after"] == report["files_after"]
+    compacted = store.variant_files(datastream_id, "raw")
+    # Merged files are named after their first partition, but are no partition files
+    assert [f.name.split(".")[0] for f in compacted] == [files[0].stem, files[4].stem, files[8].stem]
+    assert all(MERGED_FILE_INFIX in f.name for f in compacted)
+    assert store.scan(datastream_id, "raw").collect().equals(data)
+    with Session(engine) as session:
+        variant = session.scalars(select(DataVariant)).one()
+        assert variant.data_files == [f.relative_to(store.root).as_posix() for f in compacted]
+        assert variant.row_count == data.height
+    assert VariantCompactor(store, engine, small_file_ratio=0.0).compact()["variants"] == []
+
+
+def test_partitioned_writes_split_merged_files(tmp_path: Path) -> None:
+    """Overwriting or appending to a compacted partition keeps the other merged partitions.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path / "variants")
+    start = datetime(2026, 1, 1)
+    data = _series(start, start + timedelta(days=2, hours=23), "1h")
+    engine = create_engine(f"duckdb:///{tmp_path / 'arbolab.duckdb'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        datastream_id = _datastream(session).id
+        store.write_partitioned(1, datastream_id, "raw", data, session=session)
+        session.commit()
+    files = store.variant_files(datastream_id, "raw")
+    VariantCompactor(store, engine, target_file_bytes=4 * files[0].stat().st_size).compact()
+    assert len(store.variant_files(datastream_id, "raw")) == 1
+
+    day = data.filter(pl.col("timestamp") < start + timedelta(days=1))
+    with Session(engine) as session:
+        store.write_partitioned(1, datastream_id, "raw", day.with_columns(pl.col("value") * -1),
+                                mode="overwrite", session=session)
+        session.commit()
+
+        # The merged file is split into partition files again; no rows are lost
+        assert [f.name for f in store.variant_files(datastream_id, "raw")] == [f.name for f in files]
+        stored = store.scan(datastream_id, "raw").collect()
+        assert stored.height == data.height
+        assert stored.head(day.height)["value"].to_list() == (day["value"] * -1).to_list()
+        assert session.scalars(select(DataVariant.row_count)).one() == data.height
+
+    VariantCompactor(store, engine, target_file_bytes=4 * files[0].stat().st_size).compact()
+    extra = _series(start + timedelta(days=1, minutes=30), start + timedelta(days=1, minutes=30))
+    with Session(engine) as session:
+        store.write_partitioned(1, datastream_id, "raw", extra, mode="append", session=session)
+        session.commit()
+    assert store.scan(datastream_id, "raw").collect().height == data.height + extra.height
+
+
+def test_compactor_skips_variants_with_uncommitted_writes(tmp_path: Path) -> None:
+    """Leaves a variant alone while its files on disk differ from the committed file list.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path / "variants")
+    start = datetime(2026, 1, 1)
+    data = _series(start, start + timedelta(days=2, hours=23), "1h")
+    engine = create_engine(f"duckdb:///{tmp_path / 'arbolab.duckdb'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        datastream_id = _datastream(session).id
+        store.write_partitioned(1, datastream_id, "raw", data, session=session)
+        session.commit()
+    files = store.variant_files(datastream_id, "raw")
+    # Written, but not registered yet
+    store.write_partitioned(1, datastream_id, "raw", _series(start + timedelta(days=3), start + timedelta(days=3)),
+                            mode="append")
+    compactor = VariantCompactor(store, engine, target_file_bytes=4 * files[0].stat().st_size)
+
+    assert compactor.compact()["variants"] == []
+    assert store.variant_files(datastream_id, "raw") == [*files, files[0].with_name("2026-01-04T00-00-00.parquet")]
+
+
+def _smooth(lf: pl.LazyFrame, window: int) -> pl.LazyFrame:
+    """Rolling mean of the value column.
+
+    Args:
+        lf: Parent variant.
+        window: Window size in rows.
+    """
+    return lf.with_columns(pl.col("value").rolling_mean(window))
+
+
+def test_variant_deriver_records_lineage_and_memoizes(tmp_path: Path) -> None:
+    """Materializes a derivation chain once and recomputes only after a change.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path / "variants")
+    start = datetime(2026, 1, 1)
+    engine = create_engine(f"duckdb:///{tmp_path / 'arbolab.duckdb'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        datastream_id = _datastream(session).id
+        store.write_variant(1, datastream_id, "raw", _series(start, start + timedelta(hours=1)), session=session)
+        session.commit()
+        raw_id = session.scalars(select(DataVariant.id)).one()
+    deriver = VariantDeriver(store, engine)
+    query = "SELECT * FROM parent WHERE value >= 10 ORDER BY timestamp"
+
+    filtered = deriver.derive(raw_id, query, "filtered")
+    smoothed = deriver.derive(filtered["variant_id"], _smooth, "smoothed", params={"window": 3})
+
+    minutes = 60
+    assert filtered["skipped"] is False
+    assert filtered["row_count"] == minutes + 1 - 10
+    assert store.scan(datastream_id, "smoothed").collect()["value"][2] == (10 + 11 + 12) / 3
+    with Session(engine) as session:
+        properties = session.get_one(DataVariant, smoothed["variant_id"]).properties
+        assert properties is not None
+        lineage = properties["lineage"]
+    assert lineage["parent_variant_name"] == "filtered"
+    assert lineage["transform"]["params"] == {"window": 3}
+
+    assert deriver.derive(raw_id, query, "filtered")["skipped"] is True
+    assert deriver.derive(filtered["variant_id"], _smooth, "smoothed", params={"window": 3})["skipped"] is True
+    assert deriver.derive(filtered["variant_id"], _smooth, "smoothed", params={"window": 5})["skipped"] is False
+
+    with Session(engine) as session:
+        store.write_variant(
+            1, datastream_id, "raw", _series(start, start + timedelta(hours=2)), clobber=True, session=session
+        )
+        session.commit()
+    assert deriver.derive(raw_id, query, "filtered")["row_count"] == 2 * minutes + 1 - 10
+
+
+def test_variant_rollups_cascade_and_serve_downsampling(tmp_path: Path) -> None:
+    """Builds cascaded rollups once and downsamples from the coarsest sufficient one.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path / "variants")
+    start = datetime(2026, 1, 1)
+    data = _series(start, start + timedelta(hours=3), "10s")
+    engine = create_engine(f"duckdb:///{tmp_path / 'arbolab.duckdb'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        datastream_id = _datastream(session).id
+        store.write_variant(1, datastream_id, "raw", data, session=session)
+        session.commit()
+        raw_id = session.scalars(select(DataVariant.id)).one()
+    rollups = VariantRollups(store, engine, resolutions=["1h", "1m"])
+
+    results = rollups.build(raw_id)
+
+    assert [r["variant_name"] for r in results] == ["raw__1m", "raw__1h"]
+    hourly = store.scan(datastream_id, "raw__1h").collect()
+    assert hourly.columns == ["timestamp", "value_min", "value_max", "value_mean", "value_count"]
+    assert hourly["value_count"].to_list() == [360, 360, 360, 1]
+    assert hourly["value_mean"][0] == data["value"][:360].mean()
+    assert hourly["value_max"].max() == data["value"].max()
+    assert all(r["skipped"] for r in rollups.build(raw_id))
+
+    def selected(variant: DataVariant, resolution: timedelta) -> str | None:
+        rollup = rollups.select(variant, resolution)
+        return rollup.variant_name if rollup is not None else None
+
+    with Session(engine) as session:
+        raw = session.get_one(DataVariant, raw_id)
+        session.expunge(raw)
+    assert selected(raw, timedelta(minutes=45)) == "raw__1m"
+    assert selected(raw, timedelta(hours=2)) == "raw__1h"
+    assert selected(raw, timedelta(seconds=30)) is None
+
+    plot = Downsampler(store, duckdb.connect, rollups=rollups).downsample(raw, width=4)["value"]
+    assert plot["value"].min() == data["value"].min()
+    assert plot["value"].max() == data["value"].max()
+
+    with Session(engine) as session:
+        store.write_variant(1, datastream_id, "raw", data.head(100), clobber=True, session=session)
+        session.commit()
+        raw = session.get_one(DataVariant, raw_id)
+        session.expunge(raw)
+    assert selected(raw, timedelta(hours=2)) is None
+    assert not any(r["skipped"] for r in rollups.build(raw_id))
+    assert selected(raw, timedelta(hours=2)) == "raw__1h"
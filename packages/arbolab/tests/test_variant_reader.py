@@ -0,0 +1,121 @@
+"""Tests for the DuckDB variant read path."""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import duckdb
+import polars as pl
+import pyarrow as pa
+import pytest
+from arbolab.models import DataVariant
+from arbolab.services.downsampling import Downsampler
+from arbolab.services.variant_reader import VariantReader, arrow_ipc_chunks
+from arbolab.store import VariantStore
+
+START = datetime(2026, 1, 1)
+
+
+def _variant(tmp_path: Path) -> tuple[VariantStore, DataVariant, pl.DataFrame]:
+    """Write a two-day, one-minute variant and describe it.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store = VariantStore(tmp_path)
+    data = pl.DataFrame({
+        "timestamp": pl.datetime_range(START, START + timedelta(days=2), "1m", eager=True),
+    }).with_columns(value=pl.int_range(pl.len()).cast(pl.Float64), flag=pl.lit("ok"))
+    files = store.write_partitioned(1, 2, "raw", data)
+    variant = DataVariant(
+        datastream_id=2,
+        variant_name="raw",
+        time_column="timestamp",
+        data_files=[f.relative_to(tmp_path).as_posix() for f in files],
+    )
+    return store, variant, data
+
+
+def test_variant_reader_streams_projected_slice_as_arrow_ipc(tmp_path: Path) -> None:
+    """Streams the projected time slice as record batches and Arrow IPC bytes.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store, variant, data = _variant(tmp_path)
+    reader = VariantReader(store, duckdb.connect())
+    time_range = (START + timedelta(hours=23), START + timedelta(days=1, hours=1))
+
+    batch_size = 50
+    batches = reader.record_batches(variant, ["value"], time_range, batch_size=batch_size)
+    chunks = list(arrow_ipc_chunks(batches))
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+
+    expected = data.filter(pl.col("timestamp").is_between(*time_range, closed="left")).select("timestamp", "value")
+    assert table.column_names == ["timestamp", "value"]
+    assert pl.DataFrame(table).equals(expected)
+    # One chunk per batch plus the end-of-stream marker
+    assert len(chunks) == math.ceil(expected.height / batch_size) + 1
+
+    with pytest.raises(ValueError, match="Unknown columns"):
+        reader.record_batches(variant, ['value" FROM x; --'])
+
+
+def test_variant_reader_sample_caps_points(tmp_path: Path) -> None:
+    """Returns small slices as-is and downsamples large ones to at most max_points.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store, variant, data = _variant(tmp_path)
+    reader = VariantReader(store, duckdb.connect())
+
+    minutes, max_points = 10, 100
+    small, downsampled = reader.sample(
+        variant, time_range=(START, START + timedelta(minutes=minutes)), max_points=max_points
+    )
+    assert not downsampled
+    assert small.height == minutes
+
+    sampled, downsampled = reader.sample(variant, ["value"], max_points=max_points)
+    assert downsampled
+    assert 0 < sampled.height <= max_points
+    assert sampled["timestamp"].is_sorted()
+    assert sampled["timestamp"][0] == data["timestamp"][0]
+
+
+def test_downsampler_reduces_per_pixel_and_caches(tmp_path: Path) -> None:
+    """Keeps per-bucket extremes (min-max) or width points (LTTB) and caches results.
+
+    Args:
+        tmp_path: Temporary directory fixture.
+    """
+    store, variant, data = _variant(tmp_path)
+    variant.id = 1
+    connections = []
+
+    def connect() -> duckdb.DuckDBPyConnection:
+        connections.append(duckdb.connect())
+        return connections[-1]
+
+    downsampler = Downsampler(store, connect)
+    width = 100
+
+    minmax = downsampler.downsample(variant, width=width)
+    lttb = downsampler.downsample(variant, ["value"], width=width, method="lttb")
+
+    assert list(minmax) == ["value"]
+    # Up to two points (min and max) per pixel
+    assert width < minmax["value"].height <= 2 * width
+    assert minmax["value"]["value"].min() == data["value"].min()
+    assert minmax["value"]["value"].max() == data["value"].max()
+    assert lttb["value"].height == width
+    assert lttb["value"]["timestamp"][0] == data["timestamp"][0]
+    assert lttb["value"]["timestamp"][-1] == data["timestamp"][-1]
+
+    assert downsampler.downsample(variant, width=width) is minmax
+    assert len(connections) == len([minmax, lttb])
+    with pytest.raises(ValueError, match="numeric"):
+        downsampler.downsample(variant, ["flag"])